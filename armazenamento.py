@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from config import PASTA_ARMAZENAMENTO, MODO_LIGACAO_ARMAZENAMENTO, REQUEST_TIMEOUT
+from logger_config import logger
+from manifesto_compactacao import _sha256_arquivo
+from sessao_http import obter_sessao
+
+# Modos aceitos em MODO_LIGACAO_ARMAZENAMENTO
+MODOS_LIGACAO = ["auto", "reflink", "hardlink", "copia"]
+
+# ioctl FICLONE do Linux (cópia por referência em Btrfs, XFS, etc.)
+_FICLONE = 0x40049409
+
+
+class ArmazenamentoConteudo:
+    """
+    Armazenamento local dos downloads endereçado por conteúdo.
+
+    Estrutura da pasta:
+        blobs/<2 primeiros caracteres>/<sha256>  -> conteúdo de cada arquivo, uma única vez
+        indice.json                              -> URL -> {etag, last_modified, tamanho, content_type, sha256}
+
+    A cada execução a URL é revalidada com um HEAD condicional; se o servidor confirmar que nada
+    mudou, o blob é ligado (reflink, hardlink ou cópia) na pasta de downloads sem baixar de novo.
+    Conteúdos idênticos vindos de URLs ou nomes diferentes ocupam um único blob.
+    """
+
+    def __init__(self, pasta=PASTA_ARMAZENAMENTO, modo_ligacao=MODO_LIGACAO_ARMAZENAMENTO):
+        if modo_ligacao not in MODOS_LIGACAO:
+            raise ValueError(
+                f"Modo de ligação inválido: {modo_ligacao}. Modos suportados: {', '.join(MODOS_LIGACAO)}"
+            )
+        self.pasta = Path(pasta)
+        self.modo_ligacao = modo_ligacao
+        self._indice = None
+        self._lock = threading.Lock()
+
+    @property
+    def caminho_indice(self):
+        return self.pasta / "indice.json"
+
+    def caminho_blob(self, sha256):
+        return self.pasta / "blobs" / sha256[:2] / sha256
+
+    def _carregar_indice(self):
+        if self._indice is None:
+            try:
+                with open(self.caminho_indice, "r", encoding="utf-8") as arquivo:
+                    self._indice = json.load(arquivo)
+            except FileNotFoundError:
+                self._indice = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Índice do armazenamento inválido ({e}); começando um novo.")
+                self._indice = {}
+        return self._indice
+
+    def _salvar_indice(self):
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho_indice.with_name("indice.json.tmp")
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self._indice, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(temporario, self.caminho_indice)
+
+    def revalidar(self, url, headers):
+        """
+        Consulta o servidor (HEAD, condicional quando a URL já está no índice) para saber se o
+        conteúdo armazenado para a URL ainda é o atual.
+
+        Returns:
+            dict: {"inalterado": bool, "etag", "last_modified", "tamanho", "content_type"}. Os
+            validadores são os do HEAD; após um novo download, o índice recebe os da resposta
+            que produziu os bytes (ver registrar).
+        """
+        with self._lock:
+            entrada = self._carregar_indice().get(url)
+        if entrada and not self.caminho_blob(entrada["sha256"]).exists():
+            entrada = None
+
+        headers_requisicao = dict(headers)
+        if entrada and entrada.get("etag"):
+            headers_requisicao["If-None-Match"] = entrada["etag"]
+        if entrada and entrada.get("last_modified"):
+            headers_requisicao["If-Modified-Since"] = entrada["last_modified"]
+
+        validacao = {"inalterado": False, "etag": None, "last_modified": None, "tamanho": None, "content_type": None}
+        try:
+            response = obter_sessao().head(url, headers=headers_requisicao, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+            response.close()
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Falha ao revalidar {url}: {e}")
+            return validacao
+
+        if response.status_code == 304 and entrada:
+            validacao.update({chave: entrada.get(chave) for chave in ("etag", "last_modified", "tamanho", "content_type")})
+            validacao["inalterado"] = True
+            return validacao
+        if not response.ok:
+            return validacao
+
+        content_length = response.headers.get("Content-Length", "")
+        validacao.update({
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "tamanho": int(content_length) if content_length.isdigit() else None,
+            "content_type": response.headers.get("Content-Type"),
+        })
+        if entrada:
+            # Servidores que ignoram os cabeçalhos condicionais: compara os validadores diretamente
+            mesmo_validador = (
+                (validacao["etag"] and validacao["etag"] == entrada.get("etag"))
+                or (not validacao["etag"] and validacao["last_modified"]
+                    and validacao["last_modified"] == entrada.get("last_modified"))
+            )
+            mesmo_tamanho = validacao["tamanho"] is None or validacao["tamanho"] == entrada.get("tamanho")
+            validacao["inalterado"] = bool(mesmo_validador and mesmo_tamanho)
+        return validacao
+
+    def materializar(self, url, caminho_destino):
+        """
+        Liga o blob armazenado para a URL em caminho_destino.
+
+        Returns:
+            str: Caminho completo do arquivo na pasta de destino.
+        """
+        with self._lock:
+            entrada = self._carregar_indice()[url]
+            entrada["usado_em"] = time.time()
+            self._salvar_indice()
+        self._ligar(self.caminho_blob(entrada["sha256"]), Path(caminho_destino))
+        return str(Path(caminho_destino).resolve())
+
+    def registrar(self, url, caminho_arquivo, validacao, validadores):
+        """
+        Guarda no armazenamento um arquivo recém-baixado e associa a URL ao seu conteúdo.
+        Se o mesmo conteúdo já existir (outra URL ou outro nome), o arquivo baixado é substituído
+        por uma ligação ao blob existente.
+
+        Args:
+            validacao (dict): Resultado de revalidar (usado para o Content-Type).
+            validadores (dict): ETag / Last-Modified da resposta que produziu os bytes (baixados do
+                byte 0 ou retomados com If-Range sob esses mesmos validadores). São eles que vão
+                para o índice, e não os do HEAD, que podem ser de uma versão mais nova do arquivo.
+        """
+        caminho_arquivo = Path(caminho_arquivo)
+        sha256 = _sha256_arquivo(caminho_arquivo)
+        blob = self.caminho_blob(sha256)
+        if blob.exists():
+            logger.info(f"Conteúdo de '{caminho_arquivo.name}' já estava armazenado; reaproveitando o blob.")
+            self._ligar(blob, caminho_arquivo)
+        else:
+            self._ligar(caminho_arquivo, blob)
+
+        with self._lock:
+            self._carregar_indice()[url] = {
+                "sha256": sha256,
+                "etag": validadores.get("etag"),
+                "last_modified": validadores.get("last_modified"),
+                "tamanho": caminho_arquivo.stat().st_size,
+                "content_type": validacao.get("content_type"),
+                "usado_em": time.time(),
+            }
+            self._salvar_indice()
+
+    def descartar(self, url):
+        """
+        Remove a URL do índice (ex.: conteúdo reprovado na validação), de modo que a próxima
+        revalidação não o reaproveite e o arquivo seja baixado de novo. O blob não é apagado,
+        pois pode ser compartilhado por outras URLs.
+        """
+        with self._lock:
+            if self._carregar_indice().pop(url, None) is not None:
+                self._salvar_indice()
+
+    def _ligar(self, origem, destino):
+        """Faz 'destino' apontar para o conteúdo de 'origem', conforme o modo de ligação."""
+        if destino.exists() and os.path.samefile(origem, destino):
+            return
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_name(f".{destino.name}.ligacao")
+        temporario.unlink(missing_ok=True)
+
+        modos = ["reflink", "hardlink", "copia"] if self.modo_ligacao == "auto" else [self.modo_ligacao]
+        for modo in modos:
+            try:
+                if modo == "reflink":
+                    _reflink(origem, temporario)
+                elif modo == "hardlink":
+                    os.link(origem, temporario)
+                else:
+                    shutil.copyfile(origem, temporario)
+                break
+            except OSError as e:
+                temporario.unlink(missing_ok=True)
+                if modo == modos[-1]:
+                    raise
+                logger.debug(f"Ligação por {modo} indisponível para {destino} ({e}); tentando a próxima.")
+        os.replace(temporario, destino)
+
+
+def _reflink(origem, destino):
+    """Cria 'destino' como cópia por referência (copy-on-write) de 'origem'."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink não suportado nesta plataforma")
+
+    with open(origem, "rb") as entrada, open(destino, "wb") as saida:
+        fcntl.ioctl(saida.fileno(), _FICLONE, entrada.fileno())
+
+
+armazenamento = ArmazenamentoConteudo()
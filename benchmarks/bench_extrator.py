@@ -0,0 +1,122 @@
+"""
+Micro-benchmark da extração de links.
+
+Gera uma página sintética com muitos links (por padrão 50 mil) e muitos anexos configurados
+e compara o algoritmo original de extrair_links (laço links x anexos x padrões) com o
+classificador compilado atual.
+
+Uso:
+    python benchmarks/bench_extrator.py [--links 50000] [--anexos 40] [--repeticoes 3]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from extractor import ClassificadorLinks, extrair_links, iterar_ancoras  # noqa: E402
+from logger_config import logger  # noqa: E402
+
+ROMANOS = ["i", "ii", "iii", "iv", "v", "vi", "vii", "viii", "ix", "x"]
+
+
+def gerar_config(quantidade):
+    """Gera uma configuração com 'quantidade' anexos, três padrões cada."""
+    config = {}
+    for indice in range(quantidade):
+        sufixo = ROMANOS[indice % len(ROMANOS)] + ("" if indice < len(ROMANOS) else str(indice))
+        config[f"Anexo_{sufixo.upper()}.pdf"] = {
+            "patterns": [f"anexo {sufixo}", f"anexo_{sufixo}", f"anexo-{sufixo}"],
+            "required_extension": ".pdf",
+        }
+    return config
+
+
+def gerar_pagina(quantidade_links, config, semente=42):
+    """Gera HTML com 'quantidade_links' âncoras, das quais poucas apontam para anexos."""
+    aleatorio = random.Random(semente)
+    nomes = list(config)
+    partes = ["<html><body>"]
+    for indice in range(quantidade_links):
+        sorteio = aleatorio.random()
+        if sorteio < 0.001:
+            nome = aleatorio.choice(nomes)
+            padrao = config[nome]["patterns"][0]
+            partes.append(f'<a href="https://www.gov.br/ans/arquivos/{padrao.replace(" ", "_")}.pdf">{padrao}</a>')
+        elif sorteio < 0.3:
+            partes.append(f'<a href="https://www.gov.br/ans/documentos/relatorio_{indice}.pdf">Relatório {indice}</a>')
+        else:
+            partes.append(f'<a href="https://www.gov.br/ans/pt-br/noticias/pagina-{indice}">Notícia {indice}</a>')
+    partes.append("</body></html>")
+    return "".join(partes)
+
+
+def extrair_links_original(pares, config):
+    """Algoritmo original: para cada link, percorre todos os anexos e todos os padrões."""
+    links_anexos = {}
+    for url, texto in pares:
+        for nome_arquivo, config_anexo in config.items():
+            if nome_arquivo in links_anexos:
+                continue
+            if not url.lower().endswith(config_anexo["required_extension"]):
+                continue
+            for pattern in config_anexo["patterns"]:
+                if (pattern in texto) or (f"/{pattern}" in url.lower()) or (f"_{pattern}" in url.lower()):
+                    links_anexos[nome_arquivo] = url
+                    break
+    return links_anexos
+
+
+def extrair_links_compilado(pares, config):
+    """Classificação com o classificador compilado (regra "primeiro", como o original)."""
+    classificador = ClassificadorLinks(config, "primeiro")
+    links_anexos = {}
+    for url, texto in pares:
+        for nome_arquivo, _ in classificador.classificar(url, texto):
+            links_anexos.setdefault(nome_arquivo, url)
+    return links_anexos
+
+
+def medir(funcao, *args, repeticoes):
+    melhor = float("inf")
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=50000)
+    parser.add_argument("--anexos", type=int, default=40)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    config = gerar_config(args.anexos)
+    soup = BeautifulSoup(gerar_pagina(args.links, config), "lxml")
+    pares = list(iterar_ancoras(soup))
+
+    tempo_original, links_original = medir(extrair_links_original, pares, config, repeticoes=args.repeticoes)
+    tempo_compilado, links_compilado = medir(extrair_links_compilado, pares, config, repeticoes=args.repeticoes)
+    tempo_completo, _ = medir(extrair_links, soup, config, repeticoes=args.repeticoes)
+
+    print(f"Página sintética: {len(pares)} links, {len(config)} anexos configurados")
+    print(f"{'Etapa':<40}{'Tempo (s)':>12}")
+    print(f"{'Classificação original':<40}{tempo_original:>12.4f}")
+    print(f"{'Classificação compilada':<40}{tempo_compilado:>12.4f}")
+    print(f"{'extrair_links (inclui leitura do DOM)':<40}{tempo_completo:>12.4f}")
+    print(f"Aceleração da classificação: {tempo_original / tempo_compilado:.1f}x")
+    if links_original != links_compilado:
+        print("ATENÇÃO: os resultados dos dois algoritmos diferem.")
+
+
+if __name__ == "__main__":
+    main()
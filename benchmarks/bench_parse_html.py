@@ -0,0 +1,117 @@
+"""
+Benchmark dos modos de parse do HTML (MODO_PARSE_HTML).
+
+Gera uma página sintética grande, no estilo dos portais gov.br (muito conteúdo aninhado e
+relativamente poucos links), e mede para cada modo o tempo de parse + extração dos links e o
+pico de memória residente (RSS). Cada modo roda em um subprocesso próprio, para que o pico de
+um não contamine a medição do outro.
+
+Uso:
+    python benchmarks/bench_parse_html.py [--blocos 20000] [--repeticoes 3]
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MODOS = ["completo", "ancoras", "incremental"]
+
+
+def gerar_pagina(blocos):
+    """Gera HTML com 'blocos' seções de conteúdo, cada uma com um link; dois deles são os anexos."""
+    partes = ["<html><head><meta charset=\"utf-8\"><title>Rol de procedimentos</title></head><body>"]
+    for indice in range(blocos):
+        if indice == blocos // 3:
+            link = '<a href="https://www.gov.br/ans/arquivos/Anexo_I_Rol.pdf"><span>Anexo I</span></a>'
+        elif indice == 2 * blocos // 3:
+            link = '<a href="https://www.gov.br/ans/arquivos/Anexo_II_DUT.pdf"><span>Anexo II</span></a>'
+        else:
+            link = f'<a href="https://www.gov.br/ans/pt-br/noticias/pagina-{indice}">Notícia {indice}</a>'
+        partes.append(
+            f'<div class="tile"><div class="conteudo"><h3>Seção {indice}</h3>'
+            f'<p>Atualização do rol de procedimentos e eventos em saúde, item {indice}. '
+            f'<strong>Consulta pública</strong> com <em>contribuições</em> da sociedade.</p>'
+            f'<ul><li>Item A</li><li>Item B</li><li>{link}</li></ul></div></div>'
+        )
+    partes.append("</body></html>")
+    return "".join(partes).encode("utf-8")
+
+
+def medir_modo(modo, caminho, repeticoes):
+    """Executado no subprocesso: analisa a página no modo indicado e imprime as medições em JSON."""
+    from logger_config import logger
+    from extractor import extrair_links
+    from siteConnector import analisar_html
+
+    logger.setLevel(logging.WARNING)
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+
+    rss_base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    melhor = float("inf")
+    links = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        links = extrair_links(analisar_html(conteudo, modo))
+        melhor = min(melhor, time.perf_counter() - inicio)
+    rss_pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss é dado em KiB no Linux
+    print(json.dumps({
+        "tempo": melhor,
+        "rss_pico_mib": rss_pico / 1024,
+        "rss_parse_mib": (rss_pico - rss_base) / 1024,
+        "links": links,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocos", type=int, default=20000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--arquivo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        medir_modo(args.modo, args.arquivo, args.repeticoes)
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "pagina.html")
+        pagina = gerar_pagina(args.blocos)
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(pagina)
+
+        resultados = {}
+        for modo in MODOS:
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--modo", modo, "--arquivo", caminho,
+                 "--repeticoes", str(args.repeticoes)],
+                check=True, capture_output=True, text=True, cwd=RAIZ,
+            )
+            resultados[modo] = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    print(f"Página sintética: {len(pagina) / (1024 * 1024):.1f} MiB, {args.blocos} links")
+    print(f"{'Modo':<14}{'Tempo (s)':>12}{'RSS pico (MiB)':>18}{'RSS do parse (MiB)':>22}")
+    for modo in MODOS:
+        resultado = resultados[modo]
+        print(f"{modo:<14}{resultado['tempo']:>12.3f}{resultado['rss_pico_mib']:>18.1f}"
+              f"{resultado['rss_parse_mib']:>22.1f}")
+
+    referencia = resultados["completo"]["links"]
+    for modo in MODOS:
+        if resultados[modo]["links"] != referencia:
+            print(f"ATENÇÃO: os links extraídos no modo '{modo}' diferem do modo 'completo'.")
+
+
+if __name__ == "__main__":
+    main()
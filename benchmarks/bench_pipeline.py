@@ -0,0 +1,249 @@
+"""
+Benchmark de ponta a ponta do scraper, sem acessar o gov.br.
+
+Sobe o servidor local de benchmarks/servidor_ans.py (página sintética + anexos em PDF, com
+latência, limite de banda, falhas e Range configuráveis) e executa o scraper.py real contra ele
+em cada cenário: motor de download (sequencial, threads, asyncio) x formato de compactação
+(todos os SUPPORTED_FORMATS por padrão), opcionalmente variando qualquer constante do config.py.
+
+Cada execução roda em um subprocesso com pasta de trabalho própria; os tempos vêm do relatório
+de métricas do próprio scraper (relatorio_execucao.json) e o pico de memória do ru_maxrss do
+subprocesso. Com --repeticoes > 1 a tabela mostra a mediana.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--arquivos 4] [--tamanho-mib 5] [--latencia-ms 20]
+        [--banda-mibps 50] [--falhas 0.1] [--sem-range] [--motores threads,asyncio]
+        [--formatos zip,tar.gz] [--pipeline] [--repeticoes 3]
+        [--config SEGMENTOS_POR_ARQUIVO=1] [--variar MAX_PARALELO=1,2,4,8]
+"""
+import argparse
+import ast
+import importlib.util
+import itertools
+import json
+import os
+import resource
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servidor_ans import adicionar_argumentos, criar_servidor, nome_anexo, padrao_anexo  # noqa: E402
+
+MOTORES = {
+    "sequencial": {"DOWNLOAD_PARALELO": False},
+    "threads": {"DOWNLOAD_PARALELO": True, "MOTOR_DOWNLOAD": "threads"},
+    "asyncio": {"DOWNLOAD_PARALELO": True, "MOTOR_DOWNLOAD": "asyncio"},
+}
+
+# Nome do arquivo, na pasta de trabalho, onde o subprocesso grava o pico de memória
+ARQUIVO_RSS = "rss_pico.json"
+
+
+def executar_cenario(configuracoes):
+    """Executado no subprocesso: aplica as configurações no módulo config e roda o scraper.py."""
+    import config
+
+    for nome, valor in configuracoes.items():
+        setattr(config, nome, valor)
+    # Constantes derivadas de outras no config.py são recalculadas quando só a origem foi alterada
+    if "TAMANHO_POOL_CONEXOES" not in configuracoes:
+        config.TAMANHO_POOL_CONEXOES = config.MAX_PARALELO * config.SEGMENTOS_POR_ARQUIVO
+    if "CAMINHO_RELATORIO_METRICAS" not in configuracoes:
+        config.CAMINHO_RELATORIO_METRICAS = config.PASTA_DOWNLOADS + "/relatorio_execucao.json"
+
+    codigo = 0
+    try:
+        runpy.run_path(os.path.join(RAIZ, "scraper.py"), run_name="__main__")
+    except SystemExit as e:
+        codigo = e.code or 0
+    finally:
+        # ru_maxrss é dado em KiB no Linux
+        with open(ARQUIVO_RSS, "w", encoding="utf-8") as arquivo:
+            json.dump({"rss_pico_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}, arquivo)
+    sys.exit(codigo)
+
+
+def configuracoes_base(servidor, quantidade_arquivos):
+    """Configurações comuns a todos os cenários: alvo local e nenhum reaproveitamento entre execuções."""
+    return {
+        "URL_BASE_ANS": servidor.url_pagina,
+        "PREFIXOS_CRAWLER": [servidor.url_base],
+        "ANEXOS_CONFIG": {
+            nome_anexo(indice): {"patterns": [padrao_anexo(indice)], "required_extension": ".pdf"}
+            for indice in range(quantidade_arquivos)
+        },
+        "USAR_CACHE_PAGINA": False,
+        "USAR_ARMAZENAMENTO": False,
+        "COMPACTACAO_INCREMENTAL": False,
+        "SOBRESCREVER_ARQUIVOS": True,
+        # O servidor local não precisa de cortesia: o limitador não deve dominar as medições
+        "TAXA_INICIAL_REQUISICOES": 1000.0,
+        "TAXA_MAXIMA_REQUISICOES": 1000.0,
+        "RAJADA_REQUISICOES": 100,
+        "BACKOFF_BASE_TENTATIVAS": 0.1,
+    }
+
+
+def medir(configuracoes):
+    """Roda um cenário em um subprocesso e retorna as medições extraídas do relatório de métricas."""
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as pasta:
+        processo = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--executar", json.dumps(configuracoes)],
+            cwd=pasta, capture_output=True, text=True,
+        )
+        caminho_relatorio = os.path.join(pasta, configuracoes.get("PASTA_DOWNLOADS", "downloads"), "relatorio_execucao.json")
+        try:
+            with open(caminho_relatorio, "r", encoding="utf-8") as arquivo:
+                relatorio = json.load(arquivo)
+            with open(os.path.join(pasta, ARQUIVO_RSS), "r", encoding="utf-8") as arquivo:
+                rss = json.load(arquivo)["rss_pico_mib"]
+        except (OSError, ValueError):
+            ultimas_linhas = "\n".join(processo.stderr.strip().splitlines()[-5:])
+            raise RuntimeError(f"execução sem relatório (código {processo.returncode}):\n{ultimas_linhas}")
+
+    if relatorio.get("status") != "sucesso":
+        raise RuntimeError(f"status da execução: {relatorio.get('status')}")
+
+    etapas = relatorio["etapas"]
+    contadores = relatorio["contadores"]
+
+    def parede(*nomes):
+        return sum(etapas[nome]["tempo_parede_s"] for nome in nomes if nome in etapas)
+
+    if "baixar_para_compactado" in etapas:
+        tempo_download = parede("baixar_para_compactado")
+        tempo_compactacao = sum(compactacao["segundos"] for compactacao in relatorio["compactacoes"])
+    elif "baixar_e_compactar" in etapas:
+        tempo_download = parede("baixar_e_compactar")
+        tempo_compactacao = sum(compactacao["segundos"] for compactacao in relatorio["compactacoes"])
+    else:
+        tempo_download = parede("baixar_arquivos")
+        tempo_compactacao = parede("compactar_arquivos")
+    bytes_baixados = contadores.get("bytes_baixados", 0)
+    compactacao = relatorio["compactacoes"][-1] if relatorio["compactacoes"] else {}
+    return {
+        "total": relatorio["duracao_s"],
+        "pagina": parede("rastrear_anexos", "obter_links_site"),
+        "download": tempo_download,
+        "compactacao": tempo_compactacao,
+        "mb_s": bytes_baixados / (1024 * 1024) / tempo_download if tempo_download else 0.0,
+        "razao": compactacao.get("razao") or 0.0,
+        "rss": rss,
+        "tentativas": contadores.get("tentativas_repetidas", 0) + contadores.get("repeticoes_sobrecarga", 0),
+    }
+
+
+def interpretar_valor(texto):
+    """Converte o texto de --config/--variar em valor Python (número, bool, None, lista...) ou mantém a string."""
+    try:
+        return ast.literal_eval(texto)
+    except (ValueError, SyntaxError):
+        return texto
+
+
+def interpretar_atribuicoes(itens, varios_valores=False):
+    atribuicoes = {}
+    for item in itens:
+        nome, separador, valor = item.partition("=")
+        if not separador:
+            raise SystemExit(f"Formato inválido: '{item}' (esperado NOME=valor)")
+        valores = [interpretar_valor(v) for v in valor.split(",")] if varios_valores else interpretar_valor(valor)
+        atribuicoes[nome.strip()] = valores
+    return atribuicoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos(parser)
+    parser.add_argument("--motores", default="sequencial,threads,asyncio",
+                        help=f"Motores de download, separados por vírgula ({', '.join(MOTORES)})")
+    parser.add_argument("--formatos", help="Formatos de compactação, separados por vírgula (padrão: todos)")
+    parser.add_argument("--pipeline", action="store_true", help="Usa PIPELINE_COMPACTACAO em todos os cenários")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Execuções por cenário (a tabela mostra a mediana)")
+    parser.add_argument("--config", action="append", default=[], metavar="NOME=valor",
+                        help="Constante do config.py aplicada a todos os cenários (pode repetir)")
+    parser.add_argument("--variar", action="append", default=[], metavar="NOME=v1,v2",
+                        help="Constante do config.py variada como dimensão extra dos cenários (pode repetir)")
+    parser.add_argument("--executar", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        executar_cenario(json.loads(args.executar))
+        return
+
+    # Importado só no processo principal: no subprocesso, o config precisa ser alterado antes dos módulos do scraper
+    from compressor import SUPPORTED_FORMATS
+
+    args.formatos = args.formatos or ",".join(SUPPORTED_FORMATS)
+    motores = [motor.strip() for motor in args.motores.split(",") if motor.strip()]
+    formatos = [formato.strip() for formato in args.formatos.split(",") if formato.strip()]
+    for motor in motores:
+        if motor not in MOTORES:
+            parser.error(f"Motor desconhecido: {motor}")
+    for formato in formatos:
+        if formato not in SUPPORTED_FORMATS:
+            parser.error(f"Formato desconhecido: {formato}")
+    if "asyncio" in motores and importlib.util.find_spec("aiohttp") is None:
+        print("aiohttp não instalado: motor 'asyncio' ignorado.")
+        motores.remove("asyncio")
+    if "7z" in formatos and importlib.util.find_spec("py7zr") is None:
+        print("py7zr não instalado: formato '7z' ignorado.")
+        formatos.remove("7z")
+
+    fixas = interpretar_atribuicoes(args.config)
+    variacoes = interpretar_atribuicoes(args.variar, varios_valores=True)
+    nomes_variacoes = list(variacoes)
+
+    with criar_servidor(args) as servidor:
+        base = configuracoes_base(servidor, args.arquivos)
+        base["PIPELINE_COMPACTACAO"] = args.pipeline
+        total_mib = args.arquivos * args.tamanho_mib
+        print(
+            f"Servidor local: {args.arquivos} anexo(s) de {args.tamanho_mib:g} MiB ({total_mib:g} MiB), "
+            f"latência {args.latencia_ms:g} ms, banda {f'{args.banda_mibps:g} MiB/s' if args.banda_mibps else 'livre'}, "
+            f"falhas {args.falhas:.0%}, Range {'não' if args.sem_range else 'sim'}"
+            f"{', pipeline' if args.pipeline else ''}"
+        )
+
+        colunas = ["Cenário", "Total s", "Página s", "Download s", "Compact. s", "MB/s", "Razão", "RSS MiB", "Repet."]
+        linhas = []
+        for motor, formato, *valores in itertools.product(motores, formatos, *variacoes.values()):
+            cenario = f"{motor}/{formato}" + "".join(
+                f" {nome}={valor}" for nome, valor in zip(nomes_variacoes, valores)
+            )
+            configuracoes = {**base, **MOTORES[motor], "FORMATO_COMPACTACAO": formato,
+                             **fixas, **dict(zip(nomes_variacoes, valores))}
+            try:
+                medicoes = [medir(configuracoes) for _ in range(args.repeticoes)]
+            except RuntimeError as e:
+                print(f"{cenario}: falhou ({e})")
+                continue
+            mediana = {chave: statistics.median(m[chave] for m in medicoes) for chave in medicoes[0]}
+            linhas.append([
+                cenario, f"{mediana['total']:.2f}", f"{mediana['pagina']:.2f}", f"{mediana['download']:.2f}",
+                f"{mediana['compactacao']:.2f}", f"{mediana['mb_s']:.1f}", f"{mediana['razao']:.3f}",
+                f"{mediana['rss']:.1f}", f"{mediana['tentativas']:g}",
+            ])
+            print(f"{cenario}: {mediana['total']:.2f} s")
+
+    larguras = [max(len(linha[i]) for linha in [colunas] + linhas) for i in range(len(colunas))]
+    print()
+    print("  ".join(
+        coluna.ljust(largura) if i == 0 else coluna.rjust(largura)
+        for i, (coluna, largura) in enumerate(zip(colunas, larguras))
+    ))
+    for linha in linhas:
+        print("  ".join(
+            valor.ljust(largura) if i == 0 else valor.rjust(largura)
+            for i, (valor, largura) in enumerate(zip(linha, larguras))
+        ))
+
+
+if __name__ == "__main__":
+    main()
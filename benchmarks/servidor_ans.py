@@ -0,0 +1,272 @@
+"""
+Servidor HTTP local que imita o site da ANS para benchmarks offline.
+
+Serve uma página sintética com links para N anexos em PDF de tamanho configurável e permite
+injetar latência, limite de banda, falhas (conexão cortada no meio do corpo) e desligar o
+suporte a Range. Página e arquivos têm ETag e respondem 304 a GETs condicionais.
+
+Rotas:
+    /ans/rol                     -> página HTML com os links
+    /arquivos/arquivo_NNN.pdf    -> anexos (GET e HEAD, com ou sem Range)
+
+Uso isolado:
+    python benchmarks/servidor_ans.py [--porta 8765] [--arquivos 4] [--tamanho-mib 5] [--latencia-ms 20] ...
+"""
+import argparse
+import hashlib
+import http.server
+import random
+import socket
+import threading
+import time
+
+CAMINHO_PAGINA = "/ans/rol"
+PREFIXO_ARQUIVOS = "/arquivos/"
+TAMANHO_BLOCO_ENVIO = 64 * 1024
+
+
+def nome_anexo(indice):
+    return f"arquivo_{indice:03d}.pdf"
+
+
+def padrao_anexo(indice):
+    """Texto do link de cada anexo, usado também como padrão em ANEXOS_CONFIG."""
+    return f"documento {indice:03d}"
+
+
+def gerar_pdf(tamanho, semente, fracao_texto=0.2):
+    """
+    Gera um PDF com cerca de 'tamanho' bytes: estrutura mínima válida (catálogo, uma página,
+    tabela xref e trailer, que passam pela validação do validador.py) e um fluxo com uma fração
+    de texto repetitivo (compressível) e o restante aleatório, como os fluxos já comprimidos de
+    um PDF real.
+    """
+    frase = b"Rol de Procedimentos e Eventos em Saude - Anexo - Diretrizes de Utilizacao. "
+    tamanho_texto = int(tamanho * fracao_texto)
+    texto = (frase * (tamanho_texto // len(frase) + 1))[:tamanho_texto]
+    aleatorio = random.Random(semente).randbytes(max(tamanho - tamanho_texto, 0))
+    # A estrutura ocupa algumas centenas de bytes, que saem da parte aleatória do fluxo
+    estrutura = len(_montar_pdf(b"")) + len(str(tamanho))
+    return _montar_pdf(texto + aleatorio[:max(len(aleatorio) - estrutura, 0)])
+
+
+def _montar_pdf(fluxo):
+    objetos = [
+        b"<</Type/Catalog/Pages 2 0 R>>",
+        b"<</Type/Pages/Count 1/Kids[3 0 R]>>",
+        b"<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]/Contents 4 0 R>>",
+        b"<</Length %d>>\nstream\n" % len(fluxo) + fluxo + b"\nendstream",
+    ]
+    pdf = b"%PDF-1.4\n"
+    deslocamentos = []
+    for numero, objeto in enumerate(objetos, 1):
+        deslocamentos.append(len(pdf))
+        pdf += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % deslocamento for deslocamento in deslocamentos)
+    pdf += b"trailer\n<</Size %d/Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return pdf
+
+
+def gerar_pagina(url_base, quantidade_arquivos, links_extras=2000):
+    """
+    Página no estilo gov.br: muitos links de navegação e os links dos anexos, absolutos como no
+    site real, espalhados pelo conteúdo.
+    """
+    passo = max(links_extras // (quantidade_arquivos + 1), 1)
+    posicoes_anexos = {passo * (anexo + 1): anexo for anexo in range(quantidade_arquivos)}
+    partes = ["<html><head><meta charset=\"utf-8\"><title>Atualização do Rol</title></head><body>"]
+    for indice in range(max(links_extras, passo * quantidade_arquivos + 1)):
+        partes.append(
+            f'<div class="item"><p>Notícia {indice}: atualização do rol de procedimentos.</p>'
+            f'<a href="/ans/noticias/{indice}">Leia mais {indice}</a></div>'
+        )
+        if indice in posicoes_anexos:
+            anexo = posicoes_anexos[indice]
+            partes.append(f'<p><a href="{url_base}{PREFIXO_ARQUIVOS}{nome_anexo(anexo)}">{padrao_anexo(anexo).title()}</a></p>')
+    partes.append("</body></html>")
+    return "".join(partes).encode("utf-8")
+
+
+class ServidorAnsLocal:
+    """
+    Servidor local em uma thread própria. Pode ser usado como gerenciador de contexto:
+
+        with ServidorAnsLocal(arquivos=4, tamanho=5 * 1024 * 1024) as servidor:
+            servidor.url_pagina  # http://127.0.0.1:<porta>/ans/rol
+    """
+
+    def __init__(self, porta=0, arquivos=4, tamanho=5 * 1024 * 1024, latencia=0.0, banda=None,
+                 probabilidade_falha=0.0, suporta_range=True, semente=42):
+        self.arquivos = {
+            PREFIXO_ARQUIVOS + nome_anexo(indice): gerar_pdf(tamanho, semente + indice)
+            for indice in range(arquivos)
+        }
+        self._http = http.server.ThreadingHTTPServer(("127.0.0.1", porta), self._criar_handler())
+        self._http.daemon_threads = True
+        self._thread = None
+        self.pagina = gerar_pagina(self.url_base, arquivos)
+        self.etags = {caminho: f'"{hashlib.md5(dados).hexdigest()}"' for caminho, dados in self.arquivos.items()}
+        self.etags[CAMINHO_PAGINA] = f'"{hashlib.md5(self.pagina).hexdigest()}"'
+        self.latencia = latencia
+        self.banda = banda
+        self.probabilidade_falha = probabilidade_falha
+        self.suporta_range = suporta_range
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.requisicoes = 0
+        self.falhas_injetadas = 0
+
+    @property
+    def porta(self):
+        return self._http.server_address[1]
+
+    @property
+    def url_base(self):
+        return f"http://127.0.0.1:{self.porta}"
+
+    @property
+    def url_pagina(self):
+        return self.url_base + CAMINHO_PAGINA
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._http.serve_forever, name="servidor-ans", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    def _deve_falhar(self):
+        with self._lock:
+            self.requisicoes += 1
+            falhar = self._aleatorio.random() < self.probabilidade_falha
+            if falhar:
+                self.falhas_injetadas += 1
+            return falhar
+
+    def _criar_handler(self):
+        servidor = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._responder(corpo=False)
+
+            def do_GET(self):
+                self._responder(corpo=True)
+
+            def _responder(self, corpo):
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                caminho = self.path.split("?", 1)[0]
+                dados = servidor.pagina if caminho == CAMINHO_PAGINA else servidor.arquivos.get(caminho)
+                if dados is None:
+                    self._cabecalhos(404, {"Content-Length": "0"})
+                    return
+
+                etag = servidor.etags[caminho]
+                if self.headers.get("If-None-Match") == etag:
+                    self._cabecalhos(304, {"ETag": etag, "Content-Length": "0"})
+                    return
+
+                tipo = "text/html; charset=utf-8" if caminho == CAMINHO_PAGINA else "application/pdf"
+                cabecalhos = {"ETag": etag, "Content-Type": tipo}
+                inicio, fim, status = 0, len(dados) - 1, 200
+                intervalo = self.headers.get("Range")
+                if servidor.suporta_range and caminho != CAMINHO_PAGINA:
+                    cabecalhos["Accept-Ranges"] = "bytes"
+                    if intervalo and intervalo.startswith("bytes="):
+                        primeiro, _, ultimo = intervalo[6:].partition("-")
+                        inicio = int(primeiro)
+                        fim = min(int(ultimo), len(dados) - 1) if ultimo else len(dados) - 1
+                        if inicio >= len(dados):
+                            self._cabecalhos(416, {"Content-Range": f"bytes */{len(dados)}", "Content-Length": "0"})
+                            return
+                        status = 206
+                        cabecalhos["Content-Range"] = f"bytes {inicio}-{fim}/{len(dados)}"
+                cabecalhos["Content-Length"] = str(fim - inicio + 1)
+                self._cabecalhos(status, cabecalhos)
+                if corpo:
+                    falhar = caminho != CAMINHO_PAGINA and servidor._deve_falhar()
+                    self._enviar(dados, inicio, fim + 1, falhar)
+
+            def _cabecalhos(self, status, cabecalhos):
+                self.send_response(status)
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.end_headers()
+
+            def _enviar(self, dados, inicio, fim, falhar):
+                # Com falha injetada, só metade do corpo é enviada antes de cortar a conexão
+                limite = inicio + (fim - inicio) // 2 if falhar else fim
+                posicao = inicio
+                try:
+                    while posicao < limite:
+                        bloco = dados[posicao:min(posicao + TAMANHO_BLOCO_ENVIO, limite)]
+                        self.wfile.write(bloco)
+                        posicao += len(bloco)
+                        if servidor.banda:
+                            time.sleep(len(bloco) / servidor.banda)
+                    if falhar:
+                        self.wfile.flush()
+                        self.connection.shutdown(socket.SHUT_RDWR)
+                        self.close_connection = True
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+        return Handler
+
+
+def adicionar_argumentos(parser):
+    """Argumentos do servidor, compartilhados com o harness de benchmark."""
+    parser.add_argument("--arquivos", type=int, default=4, help="Número de anexos na página")
+    parser.add_argument("--tamanho-mib", type=float, default=5, help="Tamanho de cada anexo (MiB)")
+    parser.add_argument("--latencia-ms", type=float, default=20, help="Latência antes de cada resposta (ms)")
+    parser.add_argument("--banda-mibps", type=float, default=None, help="Limite de banda por conexão (MiB/s)")
+    parser.add_argument("--falhas", type=float, default=0.0, help="Probabilidade de cortar o corpo de um anexo")
+    parser.add_argument("--sem-range", action="store_true", help="Desliga o suporte a Range")
+
+
+def criar_servidor(args, porta=0):
+    return ServidorAnsLocal(
+        porta=porta,
+        arquivos=args.arquivos,
+        tamanho=int(args.tamanho_mib * 1024 * 1024),
+        latencia=args.latencia_ms / 1000,
+        banda=args.banda_mibps * 1024 * 1024 if args.banda_mibps else None,
+        probabilidade_falha=args.falhas,
+        suporta_range=not args.sem_range,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8765)
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args, args.porta)
+    print(f"Servindo {servidor.url_pagina} (Ctrl+C para encerrar)")
+    try:
+        servidor._http.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor._http.server_close()
+
+
+if __name__ == "__main__":
+    main()
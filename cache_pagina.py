@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from config import PASTA_CACHE, CACHE_IDADE_MAXIMA, CACHE_TAMANHO_MAXIMO
+from logger_config import logger
+
+
+def assinatura_config(config):
+    """
+    Gera uma assinatura estável (SHA-256) de uma estrutura de configuração.
+    Usada para invalidar links em cache quando ANEXOS_CONFIG é alterado.
+
+    Args:
+        config (dict): Configuração a ser assinada.
+
+    Returns:
+        str: Hash hexadecimal da configuração serializada.
+    """
+    serializado = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+class CachePagina:
+    """
+    Cache em disco de páginas HTML com validadores HTTP (ETag / Last-Modified).
+
+    Cada entrada é composta por dois arquivos em 'pasta':
+        <hash>.json  -> metadados (URL, validadores, data, links já extraídos)
+        <hash>.html  -> corpo da página
+
+    A política de expiração remove entradas mais antigas que 'idade_maxima' segundos
+    e, se o tamanho total ultrapassar 'tamanho_maximo' bytes, remove as entradas
+    menos recentemente usadas até voltar ao limite.
+    """
+
+    def __init__(self, pasta=PASTA_CACHE, idade_maxima=CACHE_IDADE_MAXIMA, tamanho_maximo=CACHE_TAMANHO_MAXIMO):
+        self.pasta = Path(pasta)
+        self.idade_maxima = idade_maxima
+        self.tamanho_maximo = tamanho_maximo
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _caminhos(self, url):
+        chave = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.pasta / f"{chave}.json", self.pasta / f"{chave}.html"
+
+    def obter(self, url):
+        """
+        Retorna os metadados da entrada em cache para a URL, ou None se não existir ou estiver expirada.
+        """
+        caminho_meta, caminho_html = self._caminhos(url)
+        if not caminho_meta.exists() or not caminho_html.exists():
+            return None
+
+        try:
+            with open(caminho_meta, "r", encoding="utf-8") as arquivo:
+                entrada = json.load(arquivo)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache corrompida para {url}: {e}")
+            self._remover(caminho_meta, caminho_html)
+            return None
+
+        if time.time() - entrada.get("salvo_em", 0) > self.idade_maxima:
+            logger.debug(f"Entrada de cache expirada para {url}")
+            self._remover(caminho_meta, caminho_html)
+            return None
+
+        return entrada
+
+    def cabecalhos_condicionais(self, entrada):
+        """
+        Monta os cabeçalhos If-None-Match / If-Modified-Since a partir de uma entrada de cache.
+        """
+        if not entrada:
+            return {}
+        cabecalhos = {}
+        if entrada.get("etag"):
+            cabecalhos["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = entrada["last_modified"]
+        return cabecalhos
+
+    def ler_html(self, url):
+        """Lê o corpo HTML (bytes, como recebido do servidor) armazenado para a URL e atualiza a data de último uso."""
+        _, caminho_html = self._caminhos(url)
+        html = caminho_html.read_bytes()
+        os.utime(caminho_html)
+        return html
+
+    def salvar(self, url, html, etag=None, last_modified=None, charset=None):
+        """
+        Armazena o corpo da página (bytes) e seus validadores. Links extraídos anteriormente são
+        descartados, pois pertencem a uma versão anterior da página.
+        """
+        caminho_meta, caminho_html = self._caminhos(url)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        entrada = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "charset": charset,
+            "salvo_em": time.time(),
+            "links": None,
+            "assinatura_links": None,
+        }
+        with self._lock:
+            caminho_html.write_bytes(html)
+            self._gravar_meta(caminho_meta, entrada)
+        self.aplicar_politica()
+
+    def renovar(self, url, entrada):
+        """Atualiza a data de uma entrada revalidada pelo servidor (HTTP 304)."""
+        caminho_meta, _ = self._caminhos(url)
+        entrada["salvo_em"] = time.time()
+        with self._lock:
+            self._gravar_meta(caminho_meta, entrada)
+
+    def salvar_links(self, url, links, assinatura):
+        """
+        Associa à entrada em cache os links extraídos da página, junto com a assinatura
+        da configuração usada na extração.
+        """
+        entrada = self.obter(url)
+        if entrada is None:
+            return
+        caminho_meta, _ = self._caminhos(url)
+        entrada["links"] = links
+        entrada["assinatura_links"] = assinatura
+        with self._lock:
+            self._gravar_meta(caminho_meta, entrada)
+
+    def aplicar_politica(self):
+        """Remove entradas expiradas e, se necessário, as menos recentemente usadas até respeitar o tamanho máximo."""
+        if not self.pasta.exists():
+            return
+
+        agora = time.time()
+        entradas = []
+        with self._lock:
+            for caminho_meta in self.pasta.glob("*.json"):
+                caminho_html = caminho_meta.with_suffix(".html")
+                try:
+                    stat_meta = caminho_meta.stat()
+                    stat_html = caminho_html.stat() if caminho_html.exists() else None
+                except OSError:
+                    continue
+
+                if stat_html is None or agora - stat_meta.st_mtime > self.idade_maxima:
+                    self._remover(caminho_meta, caminho_html)
+                    continue
+
+                ultimo_uso = max(stat_meta.st_mtime, stat_html.st_mtime)
+                entradas.append((ultimo_uso, stat_meta.st_size + stat_html.st_size, caminho_meta, caminho_html))
+
+            tamanho_total = sum(tamanho for _, tamanho, _, _ in entradas)
+            for _, tamanho, caminho_meta, caminho_html in sorted(entradas):
+                if tamanho_total <= self.tamanho_maximo:
+                    break
+                logger.debug(f"Removendo entrada de cache por limite de tamanho: {caminho_meta.name}")
+                self._remover(caminho_meta, caminho_html)
+                tamanho_total -= tamanho
+
+    def registrar_hit(self):
+        with self._lock:
+            self.hits += 1
+        self._log_contadores()
+
+    def registrar_miss(self):
+        with self._lock:
+            self.misses += 1
+        self._log_contadores()
+
+    def _log_contadores(self):
+        logger.info(f"Cache de páginas: {self.hits} hit(s), {self.misses} miss(es)")
+
+    @staticmethod
+    def _gravar_meta(caminho_meta, entrada):
+        temporario = caminho_meta.with_suffix(".json.tmp")
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(entrada, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho_meta)
+
+    @staticmethod
+    def _remover(*caminhos):
+        for caminho in caminhos:
+            try:
+                caminho.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# Instância compartilhada usada pelo conector
+cache_pagina = CachePagina()
@@ -0,0 +1,270 @@
+import bz2
+import struct
+import tarfile
+import time
+import zlib
+from pathlib import Path
+
+from compactacao_paralela import (
+    _MembroZip, _cabecalho_local, _cabecalho_central, _gravar_fim_diretorio, _data_dos,
+    _METODO_STORE, _METODO_DEFLATE, _LIMITE_ZIP64
+)
+from config import FORMATO_COMPACTACAO, NIVEL_COMPACTACAO
+from logger_config import logger
+from metricas import metricas
+
+# Formatos que podem ser gravados a partir de um fluxo de dados (o 7z precisa dos arquivos)
+FORMATOS_FLUXO = ["zip", "tar", "tar.gz", "tar.bz2"]
+
+# Flag ZIP (bit 3): CRC e tamanhos gravados em um data descriptor após os dados do membro
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+# Permissões dos membros criados a partir de um fluxo (arquivo regular, rw-r--r--)
+_MODO_MEMBRO = 0o100644
+
+
+# =============================================================================
+# Escritores de fluxo: cada membro é gravado a partir de blocos de dados (ex.: a
+# resposta de um download), sem arquivo de origem. Um membro em andamento pode ser
+# descartado, truncando o compactado no ponto onde ele começou.
+# =============================================================================
+
+class EscritorZipFluxo:
+    """
+    Escreve um ZIP cujos membros chegam em blocos. Cada membro usa data descriptor: o cabeçalho
+    local vai sem CRC e tamanhos, que são gravados logo após os dados, então o conteúdo não
+    precisa ser conhecido de antemão nem o cabeçalho reescrito. O diretório central é montado ao fechar.
+    """
+
+    # O ZIP não precisa do tamanho do membro antes dos dados
+    exige_tamanho = False
+
+    def __init__(self, caminho, nivel=NIVEL_COMPACTACAO):
+        self._arquivo = open(caminho, "wb")
+        self._nivel = zlib.Z_DEFAULT_COMPRESSION if nivel is None else nivel
+        self._membros = []
+        self._membro = None
+        self._compressor = None
+
+    def iniciar_membro(self, arcname, tamanho=None, armazenar=False):
+        """
+        Inicia um membro; os dados são passados depois a escrever().
+
+        Args:
+            arcname (str): Nome do membro no compactado.
+            tamanho (int, opcional): Tamanho esperado, usado só para decidir pelas extensões ZIP64.
+            armazenar (bool): Se True, o membro é gravado sem compressão (ZIP_STORED).
+        """
+        if self._membro is not None:
+            raise ValueError(f"Membro {self._membro.nome} ainda em andamento no ZIP")
+        # Sem o tamanho, usa ZIP64 por precaução; com ele, deixa margem para o deflate expandir os dados
+        zip64 = tamanho is None or tamanho + tamanho // 100 + 1024 >= _LIMITE_ZIP64
+        membro = _MembroZip(Path(arcname).as_posix(), _data_dos(time.time()), _MODO_MEMBRO, zip64)
+        membro.flags = _FLAG_DATA_DESCRIPTOR
+        membro.metodo = _METODO_STORE if armazenar else _METODO_DEFLATE
+        membro.offset = self._arquivo.tell()
+        self._arquivo.write(_cabecalho_local(membro))
+        membro.inicio_dados = self._arquivo.tell()
+        self._compressor = None if armazenar else zlib.compressobj(self._nivel, zlib.DEFLATED, -15)
+        self._membro = membro
+
+    def escrever(self, dados):
+        membro = self._membro
+        membro.crc = zlib.crc32(dados, membro.crc)
+        membro.tamanho += len(dados)
+        self._arquivo.write(self._compressor.compress(dados) if self._compressor else dados)
+
+    def concluir_membro(self):
+        membro = self._membro
+        if self._compressor:
+            self._arquivo.write(self._compressor.flush())
+        membro.tamanho_comprimido = self._arquivo.tell() - membro.inicio_dados
+        if not membro.zip64 and max(membro.tamanho, membro.tamanho_comprimido) >= _LIMITE_ZIP64:
+            raise ValueError(f"Membro {membro.nome} excedeu o limite do ZIP sem extensões ZIP64")
+        formato = "<IIQQ" if membro.zip64 else "<IIII"
+        self._arquivo.write(struct.pack(formato, 0x08074B50, membro.crc, membro.tamanho_comprimido, membro.tamanho))
+        self._membros.append(membro)
+        self._membro = None
+        self._compressor = None
+        if membro.metodo == _METODO_STORE:
+            metricas.incrementar("membros_zip_sem_compressao")
+        logger.debug(f"Membro {membro.nome} gravado no ZIP a partir do fluxo")
+
+    def descartar_membro(self):
+        """Desfaz o membro em andamento (se houver), truncando o ZIP no início dele."""
+        if self._membro is None:
+            return
+        self._arquivo.seek(self._membro.offset)
+        self._arquivo.truncate()
+        logger.debug(f"Membro {self._membro.nome} descartado do ZIP")
+        self._membro = None
+        self._compressor = None
+
+    def adicionar_bytes(self, arcname, dados, armazenar=False):
+        """Grava um membro inteiro a partir de dados já em memória."""
+        self.iniciar_membro(arcname, len(dados), armazenar)
+        self.escrever(dados)
+        self.concluir_membro()
+
+    def fechar(self):
+        if self._arquivo.closed:
+            return
+        try:
+            self.descartar_membro()
+            inicio_diretorio = self._arquivo.tell()
+            for membro in self._membros:
+                self._arquivo.write(_cabecalho_central(membro))
+            fim_diretorio = self._arquivo.tell()
+            _gravar_fim_diretorio(self._arquivo, len(self._membros), inicio_diretorio, fim_diretorio - inicio_diretorio)
+        finally:
+            self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class EscritorTarFluxo:
+    """
+    Escreve um TAR (opcionalmente gz/bz2) cujos membros chegam em blocos. O cabeçalho TAR leva
+    o tamanho do membro, que precisa ser conhecido ao iniciá-lo (exige_tamanho).
+
+    Nos formatos comprimidos, cada membro é um fluxo gzip/bzip2 próprio: a concatenação é um
+    .gz/.bz2 multi-stream válido para o tarfile e as ferramentas padrão, e um membro em andamento
+    pode ser descartado sem afetar o estado de compressão dos anteriores.
+    """
+
+    exige_tamanho = True
+
+    def __init__(self, caminho, formato, nivel=NIVEL_COMPACTACAO):
+        self._arquivo = open(caminho, "wb")
+        self._formato = formato
+        self._nivel = nivel
+        # Posição no TAR descomprimido (para o preenchimento dos blocos) e onde o membro atual começou
+        self._offset_tar = 0
+        self._offset_tar_membro = 0
+        self._inicio_membro = None
+        self._nome_membro = None
+        self._restante = 0
+        self._compressor = None
+
+    def _novo_compressor(self):
+        if self._formato == "tar.gz":
+            nivel = zlib.Z_DEFAULT_COMPRESSION if self._nivel is None else self._nivel
+            # wbits 31: fluxo deflate com cabeçalho e trailer gzip
+            return zlib.compressobj(nivel, zlib.DEFLATED, 31)
+        if self._formato == "tar.bz2":
+            # bz2 não aceita nível 0
+            return bz2.BZ2Compressor(9 if self._nivel is None else max(1, self._nivel))
+        return None
+
+    def _gravar(self, dados):
+        self._arquivo.write(self._compressor.compress(dados) if self._compressor else dados)
+
+    def _finalizar_fluxo(self):
+        if self._compressor:
+            self._arquivo.write(self._compressor.flush())
+        self._compressor = None
+
+    def iniciar_membro(self, arcname, tamanho, armazenar=False):
+        """
+        Inicia um membro de 'tamanho' bytes; os dados são passados depois a escrever().
+        'armazenar' existe só por compatibilidade com EscritorZipFluxo e é ignorado.
+        """
+        if self._inicio_membro is not None:
+            raise ValueError(f"Membro {self._nome_membro} ainda em andamento no TAR")
+        if tamanho is None:
+            raise ValueError(f"O TAR exige o tamanho do membro {arcname} antes dos dados")
+        info = tarfile.TarInfo(Path(arcname).as_posix())
+        info.size = tamanho
+        info.mtime = int(time.time())
+        info.mode = _MODO_MEMBRO & 0o7777
+        cabecalho = info.tobuf(tarfile.DEFAULT_FORMAT, tarfile.ENCODING, "surrogateescape")
+
+        self._inicio_membro = self._arquivo.tell()
+        self._offset_tar_membro = self._offset_tar
+        self._nome_membro = info.name
+        self._restante = tamanho
+        self._compressor = self._novo_compressor()
+        self._gravar(cabecalho)
+        self._offset_tar += len(cabecalho)
+
+    def escrever(self, dados):
+        if len(dados) > self._restante:
+            raise ValueError(f"Membro {self._nome_membro} recebeu mais dados que o tamanho informado")
+        self._restante -= len(dados)
+        self._offset_tar += len(dados)
+        self._gravar(dados)
+
+    def concluir_membro(self):
+        if self._restante:
+            raise ValueError(f"Membro {self._nome_membro} terminou com {self._restante} bytes faltando")
+        resto = self._offset_tar % tarfile.BLOCKSIZE
+        if resto:
+            self._gravar(tarfile.NUL * (tarfile.BLOCKSIZE - resto))
+            self._offset_tar += tarfile.BLOCKSIZE - resto
+        self._finalizar_fluxo()
+        logger.debug(f"Membro {self._nome_membro} gravado no TAR a partir do fluxo")
+        self._inicio_membro = None
+        self._nome_membro = None
+
+    def descartar_membro(self):
+        """Desfaz o membro em andamento (se houver), truncando o TAR no início dele."""
+        if self._inicio_membro is None:
+            return
+        self._compressor = None
+        self._arquivo.seek(self._inicio_membro)
+        self._arquivo.truncate()
+        self._offset_tar = self._offset_tar_membro
+        logger.debug(f"Membro {self._nome_membro} descartado do TAR")
+        self._inicio_membro = None
+        self._nome_membro = None
+
+    def adicionar_bytes(self, arcname, dados, armazenar=False):
+        """Grava um membro inteiro a partir de dados já em memória."""
+        self.iniciar_membro(arcname, len(dados))
+        self.escrever(dados)
+        self.concluir_membro()
+
+    def fechar(self):
+        if self._arquivo.closed:
+            return
+        try:
+            self.descartar_membro()
+            # Fim do TAR: dois blocos vazios, completando o último registro (como o tarfile)
+            fim = 2 * tarfile.BLOCKSIZE
+            resto = (self._offset_tar + fim) % tarfile.RECORDSIZE
+            if resto:
+                fim += tarfile.RECORDSIZE - resto
+            self._compressor = self._novo_compressor()
+            self._gravar(tarfile.NUL * fim)
+            self._finalizar_fluxo()
+        finally:
+            self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def abrir_escritor_fluxo(caminho, formato=FORMATO_COMPACTACAO):
+    """
+    Abre um escritor de fluxo para o formato de compactação informado.
+
+    Args:
+        caminho (str | Path): Caminho do arquivo compactado a ser criado.
+        formato (str): Um dos FORMATOS_FLUXO.
+
+    Returns:
+        Objeto com os métodos iniciar_membro, escrever, concluir_membro, descartar_membro,
+        adicionar_bytes e fechar, e o atributo exige_tamanho.
+    """
+    if formato == "zip":
+        return EscritorZipFluxo(caminho)
+    if formato in ("tar", "tar.gz", "tar.bz2"):
+        return EscritorTarFluxo(caminho, formato)
+    raise ValueError(f"Formato sem gravação em fluxo: {formato}. Formatos suportados: {', '.join(FORMATOS_FLUXO)}")
@@ -0,0 +1,424 @@
+import bz2
+import concurrent.futures
+import os
+import struct
+import tarfile
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+
+from config import NIVEL_COMPACTACAO, WORKERS_COMPACTACAO, TAMANHO_BLOCO_COMPACTACAO
+from copia_direta import copiar_arquivo, copiar_intervalo, crc32_arquivo, deve_armazenar
+from logger_config import logger
+from metricas import metricas
+
+# Janela do deflate: cada bloco usa os últimos 32 KiB do bloco anterior como dicionário
+_JANELA_DEFLATE = 32 * 1024
+
+# Bloco final vazio de um fluxo deflate (BFINAL=1, tipo fixo, sem dados)
+_FIM_DEFLATE = b"\x03\x00"
+
+# Métodos de compressão "store" (sem compressão) e "deflate" no formato ZIP
+_METODO_STORE = 0
+_METODO_DEFLATE = 8
+
+# Acima deste valor, tamanhos e deslocamentos exigem as extensões ZIP64,
+# e o campo de 32 bits recebe o valor sentinela
+_LIMITE_ZIP64 = 0xFFFFFFFF
+_SENTINELA_ZIP64 = 0xFFFFFFFF
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def obter_pool_compactacao():
+    """
+    Retorna o pool de workers compartilhado pela compactação paralela.
+    Usa threads: zlib e bz2 liberam o GIL durante a compressão, então os blocos são
+    comprimidos em vários núcleos sem o custo de copiar os dados entre processos.
+
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: Pool criado na primeira chamada.
+    """
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            workers = WORKERS_COMPACTACAO or os.cpu_count() or 1
+            _pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compactacao")
+            logger.debug(f"Pool de compactação criado com {workers} workers.")
+        return _pool
+
+
+def _max_pendentes():
+    return 2 * (WORKERS_COMPACTACAO or os.cpu_count() or 1)
+
+
+def _deflate_bloco(bloco, dicionario, nivel):
+    """
+    Comprime um bloco em deflate bruto terminado por Z_SYNC_FLUSH (alinhado em byte),
+    de modo que blocos comprimidos separadamente possam ser concatenados em um único fluxo.
+    """
+    if dicionario:
+        compressor = zlib.compressobj(nivel, zlib.DEFLATED, -15, zdict=dicionario)
+    else:
+        compressor = zlib.compressobj(nivel, zlib.DEFLATED, -15)
+    return compressor.compress(bloco) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _bz2_bloco(bloco, _dicionario, nivel):
+    """Comprime um bloco como um fluxo bzip2 independente (concatenação multi-stream, como o pbzip2)."""
+    return bz2.compress(bloco, nivel)
+
+
+class _FilaBlocosOrdenada:
+    """
+    Envia blocos para o pool de compactação e grava os resultados em 'destino' na ordem de envio.
+    Além dos blocos, aceita ações (callables) que são executadas na mesma ordem, quando todos os
+    blocos anteriores já foram gravados. A quantidade de blocos em memória é limitada.
+    """
+
+    def __init__(self, destino):
+        self._destino = destino
+        self._pendentes = deque()
+        self._blocos_em_voo = 0
+        self.bytes_gravados = 0
+
+    def enviar(self, funcao, *args):
+        self._pendentes.append(("bloco", obter_pool_compactacao().submit(funcao, *args)))
+        self._blocos_em_voo += 1
+        while self._blocos_em_voo > _max_pendentes():
+            self._processar_proximo()
+
+    def acao(self, funcao):
+        self._pendentes.append(("acao", funcao))
+
+    def gravar(self, dados):
+        """Grava dados já prontos, respeitando a ordem dos blocos enviados antes."""
+        self.acao(lambda: self._escrever(dados))
+
+    def esvaziar(self):
+        while self._pendentes:
+            self._processar_proximo()
+
+    def _processar_proximo(self):
+        tipo, item = self._pendentes.popleft()
+        if tipo == "bloco":
+            self._blocos_em_voo -= 1
+            self._escrever(item.result())
+        else:
+            item()
+
+    def _escrever(self, dados):
+        self._destino.write(dados)
+        self.bytes_gravados += len(dados)
+
+
+# =============================================================================
+# ZIP paralelo
+# =============================================================================
+
+class _MembroZip:
+    def __init__(self, nome, hora_data, modo, zip64):
+        self.nome = nome
+        self.hora_data = hora_data
+        self.modo = modo
+        self.zip64 = zip64
+        self.metodo = _METODO_DEFLATE
+        # Bits de flag além do UTF-8 do nome (ex.: 0x08, data descriptor após os dados)
+        self.flags = 0
+        self.crc = 0
+        self.tamanho = 0
+        self.tamanho_comprimido = 0
+        self.offset = 0
+        self.inicio_dados = 0
+
+
+class EscritorZipParalelo:
+    """
+    Escreve um arquivo ZIP cujos membros são comprimidos (deflate) em blocos paralelos.
+    Os blocos de um mesmo arquivo formam um único fluxo deflate válido, e blocos de arquivos
+    diferentes também são comprimidos simultaneamente. O diretório central é montado ao fechar.
+    Arquivos que já parecem comprimidos (METODO_ZIP) entram sem compressão, copiados diretamente.
+    """
+
+    def __init__(self, caminho, nivel=NIVEL_COMPACTACAO):
+        self._arquivo = open(caminho, "wb")
+        self._fila = _FilaBlocosOrdenada(self._arquivo)
+        self._nivel = zlib.Z_DEFAULT_COMPRESSION if nivel is None else nivel
+        self._membros = []
+
+    def adicionar(self, caminho_arquivo, arcname):
+        stat = os.stat(caminho_arquivo)
+        # Margem para o caso de o deflate expandir dados incompressíveis
+        zip64 = stat.st_size + stat.st_size // 100 + 1024 >= _LIMITE_ZIP64
+        membro = _MembroZip(Path(arcname).as_posix(), _data_dos(stat.st_mtime), stat.st_mode, zip64)
+        self._membros.append(membro)
+
+        if deve_armazenar(caminho_arquivo):
+            membro.metodo = _METODO_STORE
+            membro.crc = crc32_arquivo(caminho_arquivo)
+            membro.tamanho = membro.tamanho_comprimido = stat.st_size
+            self._fila.acao(lambda: self._copiar_armazenado(membro, caminho_arquivo))
+            metricas.incrementar("membros_zip_sem_compressao")
+            logger.debug(f"Arquivo {arcname} enviado sem compressão (ZIP)")
+            return
+
+        self._fila.acao(lambda: self._iniciar_membro(membro))
+        anterior = b""
+        with open(caminho_arquivo, "rb") as origem:
+            while True:
+                bloco = origem.read(TAMANHO_BLOCO_COMPACTACAO)
+                if not bloco:
+                    break
+                membro.crc = zlib.crc32(bloco, membro.crc)
+                membro.tamanho += len(bloco)
+                self._fila.enviar(_deflate_bloco, bloco, anterior[-_JANELA_DEFLATE:], self._nivel)
+                anterior = bloco
+        self._fila.gravar(_FIM_DEFLATE)
+        self._fila.acao(lambda: self._finalizar_membro(membro))
+        logger.debug(f"Arquivo {arcname} enviado para compactação paralela (ZIP)")
+
+    def copiar_membro(self, origem, info):
+        """
+        Copia um membro de outro ZIP sem descomprimir nem recomprimir os dados.
+
+        Args:
+            origem: Arquivo ZIP de origem aberto em modo binário (deve permanecer aberto até fechar()).
+            info (zipfile.ZipInfo): Membro a ser copiado.
+        """
+        zip64 = info.file_size >= _LIMITE_ZIP64 or info.compress_size >= _LIMITE_ZIP64
+        membro = _MembroZip(info.filename, _data_dos_tupla(info.date_time), info.external_attr >> 16, zip64)
+        membro.metodo = info.compress_type
+        membro.crc = info.CRC
+        membro.tamanho = info.file_size
+        membro.tamanho_comprimido = info.compress_size
+        self._membros.append(membro)
+        self._fila.acao(lambda: self._copiar_bruto(membro, origem, info.header_offset))
+        logger.debug(f"Membro {info.filename} copiado sem recompressão (ZIP)")
+
+    def _copiar_bruto(self, membro, origem, offset_origem):
+        membro.offset = self._arquivo.tell()
+        self._arquivo.write(_cabecalho_local(membro))
+        # Pula o cabeçalho local de origem (30 bytes + nome + extra) até o início dos dados
+        origem.seek(offset_origem)
+        cabecalho = origem.read(30)
+        tamanho_nome, tamanho_extra = struct.unpack("<HH", cabecalho[26:30])
+        inicio_dados = offset_origem + 30 + tamanho_nome + tamanho_extra
+        if os.fstat(origem.fileno()).st_size < inicio_dados + membro.tamanho_comprimido:
+            raise ValueError(f"Membro {membro.nome} truncado no ZIP de origem")
+        copiar_intervalo(origem, inicio_dados, membro.tamanho_comprimido, self._arquivo)
+
+    def _copiar_armazenado(self, membro, caminho_arquivo):
+        membro.offset = self._arquivo.tell()
+        self._arquivo.write(_cabecalho_local(membro))
+        if copiar_arquivo(caminho_arquivo, self._arquivo) != membro.tamanho:
+            raise ValueError(f"Arquivo {caminho_arquivo} mudou de tamanho durante a compactação")
+
+    def fechar(self):
+        if self._arquivo.closed:
+            return
+        try:
+            self._fila.esvaziar()
+            self._gravar_diretorio_central()
+        finally:
+            self._arquivo.close()
+
+    def _iniciar_membro(self, membro):
+        membro.offset = self._arquivo.tell()
+        self._arquivo.write(_cabecalho_local(membro))
+        membro.inicio_dados = self._arquivo.tell()
+
+    def _finalizar_membro(self, membro):
+        fim = self._arquivo.tell()
+        membro.tamanho_comprimido = fim - membro.inicio_dados
+        if not membro.zip64 and membro.tamanho_comprimido >= _LIMITE_ZIP64:
+            raise ValueError(f"Membro {membro.nome} excedeu o limite do ZIP sem extensões ZIP64")
+        # Reescreve o cabeçalho local com CRC e tamanhos finais
+        self._arquivo.seek(membro.offset)
+        self._arquivo.write(_cabecalho_local(membro))
+        self._arquivo.seek(fim)
+
+    def _gravar_diretorio_central(self):
+        inicio_diretorio = self._arquivo.tell()
+        for membro in self._membros:
+            self._arquivo.write(_cabecalho_central(membro))
+        fim_diretorio = self._arquivo.tell()
+        _gravar_fim_diretorio(self._arquivo, len(self._membros), inicio_diretorio, fim_diretorio - inicio_diretorio)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def _data_dos(mtime):
+    return _data_dos_tupla(time.localtime(mtime)[:6])
+
+
+def _data_dos_tupla(data_hora):
+    """Converte (ano, mês, dia, hora, minuto, segundo) para os campos de hora e data do formato DOS."""
+    ano, mes, dia, hora, minuto, segundo = data_hora
+    if ano < 1980:
+        return 0, (1 << 5) | 1
+    return (hora << 11) | (minuto << 5) | (segundo // 2), ((ano - 1980) << 9) | (mes << 5) | dia
+
+
+def _nome_e_flags(nome):
+    try:
+        return nome.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return nome.encode("utf-8"), 0x800
+
+
+def _cabecalho_local(membro):
+    nome, flags = _nome_e_flags(membro.nome)
+    flags |= membro.flags
+    hora, data = membro.hora_data
+    if membro.zip64:
+        extra = struct.pack("<HHQQ", 0x0001, 16, membro.tamanho, membro.tamanho_comprimido)
+        tamanho, tamanho_comprimido, versao = _SENTINELA_ZIP64, _SENTINELA_ZIP64, 45
+    else:
+        extra = b""
+        tamanho, tamanho_comprimido, versao = membro.tamanho, membro.tamanho_comprimido, 20
+    return struct.pack(
+        "<IHHHHHIIIHH", 0x04034B50, versao, flags, membro.metodo, hora, data,
+        membro.crc, tamanho_comprimido, tamanho, len(nome), len(extra)
+    ) + nome + extra
+
+
+def _cabecalho_central(membro):
+    nome, flags = _nome_e_flags(membro.nome)
+    flags |= membro.flags
+    hora, data = membro.hora_data
+
+    campos_zip64 = []
+    tamanho, tamanho_comprimido, offset = membro.tamanho, membro.tamanho_comprimido, membro.offset
+    if membro.zip64 or tamanho >= _LIMITE_ZIP64:
+        campos_zip64.append(tamanho)
+        tamanho = _SENTINELA_ZIP64
+    if membro.zip64 or tamanho_comprimido >= _LIMITE_ZIP64:
+        campos_zip64.append(tamanho_comprimido)
+        tamanho_comprimido = _SENTINELA_ZIP64
+    if offset >= _LIMITE_ZIP64:
+        campos_zip64.append(offset)
+        offset = _SENTINELA_ZIP64
+
+    extra = b""
+    versao = 20
+    if campos_zip64:
+        extra = struct.pack(f"<HH{len(campos_zip64)}Q", 0x0001, 8 * len(campos_zip64), *campos_zip64)
+        versao = 45
+
+    # Versão "feita por": sistema Unix (3), especificação 2.0/4.5
+    return struct.pack(
+        "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | versao, versao, flags, membro.metodo, hora, data,
+        membro.crc, tamanho_comprimido, tamanho, len(nome), len(extra), 0, 0, 0,
+        (membro.modo & 0xFFFF) << 16, offset
+    ) + nome + extra
+
+
+def _gravar_fim_diretorio(arquivo, quantidade, inicio_diretorio, tamanho_diretorio):
+    """Grava o registro de fim do diretório central, com os registros ZIP64 quando necessário."""
+    if quantidade >= 0xFFFF or inicio_diretorio >= _LIMITE_ZIP64 or tamanho_diretorio >= _LIMITE_ZIP64:
+        inicio_zip64 = arquivo.tell()
+        arquivo.write(struct.pack(
+            "<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0,
+            quantidade, quantidade, tamanho_diretorio, inicio_diretorio
+        ))
+        arquivo.write(struct.pack("<IIQI", 0x07064B50, 0, inicio_zip64, 1))
+        quantidade = min(quantidade, 0xFFFF)
+        inicio_diretorio = _SENTINELA_ZIP64
+        tamanho_diretorio = min(tamanho_diretorio, _SENTINELA_ZIP64)
+    arquivo.write(struct.pack(
+        "<IHHHHIIH", 0x06054B50, 0, 0, quantidade, quantidade, tamanho_diretorio, inicio_diretorio, 0
+    ))
+
+
+# =============================================================================
+# TAR.GZ / TAR.BZ2 paralelos
+# =============================================================================
+
+class _FluxoComprimidoParalelo:
+    """
+    Objeto de arquivo (somente escrita) que recebe o fluxo TAR e o comprime em blocos paralelos.
+    - gz: blocos deflate encadeados (com dicionário do bloco anterior) em um único membro gzip,
+          como o pigz; o resultado é um .gz padrão.
+    - bz2: cada bloco é um fluxo bzip2 independente; a concatenação é um .bz2 multi-stream válido,
+           como o pbzip2.
+    """
+
+    def __init__(self, caminho, formato, nivel):
+        self._arquivo = open(caminho, "wb")
+        self._fila = _FilaBlocosOrdenada(self._arquivo)
+        self._formato = formato
+        self._buffer = bytearray()
+        self._anterior = b""
+        self._crc = 0
+        self._tamanho = 0
+        if formato == "gz":
+            self._funcao = _deflate_bloco
+            self._nivel = zlib.Z_DEFAULT_COMPRESSION if nivel is None else nivel
+            # Cabeçalho gzip: método deflate, sem flags, mtime atual, SO Unix
+            self._arquivo.write(struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, 0, int(time.time()), 0, 3))
+        else:
+            self._funcao = _bz2_bloco
+            self._nivel = 9 if nivel is None else max(1, nivel)
+
+    def write(self, dados):
+        self._buffer += dados
+        while len(self._buffer) >= TAMANHO_BLOCO_COMPACTACAO:
+            bloco = bytes(self._buffer[:TAMANHO_BLOCO_COMPACTACAO])
+            del self._buffer[:TAMANHO_BLOCO_COMPACTACAO]
+            self._enviar(bloco)
+        return len(dados)
+
+    def _enviar(self, bloco):
+        if self._formato == "gz":
+            self._crc = zlib.crc32(bloco, self._crc)
+            self._tamanho += len(bloco)
+        self._fila.enviar(self._funcao, bloco, self._anterior[-_JANELA_DEFLATE:], self._nivel)
+        self._anterior = bloco
+
+    def close(self):
+        if self._arquivo.closed:
+            return
+        try:
+            if self._buffer:
+                self._enviar(bytes(self._buffer))
+                self._buffer.clear()
+            self._fila.esvaziar()
+            if self._formato == "gz":
+                self._arquivo.write(_FIM_DEFLATE)
+                self._arquivo.write(struct.pack("<II", self._crc, self._tamanho & 0xFFFFFFFF))
+        finally:
+            self._arquivo.close()
+
+
+class EscritorTarParalelo:
+    """Escreve um TAR.GZ ou TAR.BZ2 com a compressão do fluxo distribuída entre os workers."""
+
+    def __init__(self, caminho, formato, nivel=NIVEL_COMPACTACAO):
+        self._fluxo = _FluxoComprimidoParalelo(caminho, formato.split(".")[1], nivel)
+        self._tar = tarfile.open(fileobj=self._fluxo, mode="w|")
+
+    def adicionar(self, caminho_arquivo, arcname):
+        self._tar.add(str(caminho_arquivo), arcname=str(arcname))
+        logger.debug(f"Arquivo {arcname} adicionado ao TAR (compactação paralela)")
+
+    def fechar(self):
+        if self._tar is None:
+            return
+        try:
+            self._tar.close()
+        finally:
+            self._tar = None
+            self._fluxo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
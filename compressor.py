@@ -1,39 +1,63 @@
 import os
 import tarfile
+import time
 import zipfile
 from pathlib import Path
 
-import py7zr
-
+from compactacao_paralela import EscritorZipParalelo, EscritorTarParalelo
 from config import PASTA_DOWNLOADS, PASTA_ARQUIVOS, FORMATO_COMPACTACAO, NOME_ARQUIVO_COMPACTADO, \
-    SOBRESCREVER_COMPACTACAO
+    SOBRESCREVER_COMPACTACAO, NIVEL_COMPACTACAO, COMPACTACAO_PARALELA, COMPACTACAO_INCREMENTAL
+from copia_direta import copiar_arquivo, copiar_intervalo, gravar_mapeado, deve_armazenar
 from logger_config import logger
+from metricas import metricas
+from manifesto_compactacao import (
+    carregar_manifesto, gerar_manifesto, salvar_manifesto, membros_inalterados, manifestos_equivalentes
+)
 
 # Formatos de compactação suportados (RAR removido)
 SUPPORTED_FORMATS = ["zip", "tar", "tar.gz", "tar.bz2", "7z"]
 
+# Modo de abertura do tarfile para cada formato TAR
+MODOS_TAR = {"tar": "w", "tar.gz": "w:gz", "tar.bz2": "w:bz2"}
+
+# Formatos em que membros inalterados podem ser copiados sem recompressão
+FORMATOS_INCREMENTAIS = ["zip", "tar"]
+
+# Sufixos de arquivos temporários de download, que nunca devem ser compactados
+SUFIXOS_TEMPORARIOS = (".part", ".segmentos", ".ligacao", ".validador")
 
+
+@metricas.medir()
 def compactar_arquivos(
         pasta_origem=os.path.join(PASTA_DOWNLOADS, PASTA_ARQUIVOS),
-        pasta_destino=PASTA_DOWNLOADS
+        pasta_destino=PASTA_DOWNLOADS,
+        formato=FORMATO_COMPACTACAO,
+        nome_compactado=NOME_ARQUIVO_COMPACTADO
 ):
     """
     Compacta todos os arquivos contidos em 'pasta_origem' e salva o arquivo compactado em 'pasta_destino'.
-    Não há filtro por extensão; serão compactados todos os arquivos presentes em PASTA_ARQUIVOS.
+    Não há filtro por extensão; serão compactados todos os arquivos presentes em PASTA_ARQUIVOS
+    (exceto downloads ainda em andamento).
+
+    Se COMPACTACAO_INCREMENTAL estiver ativo, um manifesto (caminho, tamanho, mtime, SHA-256) é
+    gravado ao lado do arquivo compactado. Na execução seguinte, se nada mudou a compactação é
+    pulada; em ZIP e TAR, os membros inalterados são copiados do arquivo anterior sem recompressão.
 
     Args:
         pasta_origem (str): Pasta que contém os arquivos a serem compactados.
                               Por padrão: os.path.join(PASTA_DOWNLOADS, PASTA_ARQUIVOS)
         pasta_destino (str): Pasta onde o arquivo compactado será salvo. Por padrão: PASTA_DOWNLOADS.
+        formato (str): Formato de compactação. Por padrão: FORMATO_COMPACTACAO.
+        nome_compactado (str): Nome base do arquivo compactado. Por padrão: NOME_ARQUIVO_COMPACTADO.
 
     Returns:
         str: Caminho do arquivo compactado gerado ou None em caso de erro.
     """
     try:
         # Verifica se o formato de compactação é suportado
-        if FORMATO_COMPACTACAO not in SUPPORTED_FORMATS:
+        if formato not in SUPPORTED_FORMATS:
             logger.error(
-                f"Formato de compactação não suportado: {FORMATO_COMPACTACAO}. "
+                f"Formato de compactação não suportado: {formato}. "
                 f"Formatos suportados: {', '.join(SUPPORTED_FORMATS)}"
             )
             return None
@@ -54,19 +78,16 @@ def compactar_arquivos(
             return None
 
         # Define o nome do arquivo compactado e o caminho completo dele
-        nome_arquivo = f"{NOME_ARQUIVO_COMPACTADO}.{FORMATO_COMPACTACAO}"
+        nome_arquivo = f"{nome_compactado}.{formato}"
         caminho_completo = pasta_destino / nome_arquivo
 
         # Se o arquivo já existir, verifica a flag de sobrescrita
-        if caminho_completo.exists():
-            if not SOBRESCREVER_COMPACTACAO:
-                logger.info(f"Arquivo {caminho_completo} já existe e não será sobrescrito.")
-                return str(caminho_completo)
-            else:
-                logger.info(f"Arquivo {caminho_completo} será sobrescrito.")
-                caminho_completo.unlink()
+        if caminho_completo.exists() and not SOBRESCREVER_COMPACTACAO:
+            logger.info(f"Arquivo {caminho_completo} já existe e não será sobrescrito.")
+            return str(caminho_completo)
 
-        logger.info(f"Iniciando compactação dos arquivos em formato {FORMATO_COMPACTACAO}")
+        logger.info(f"Iniciando compactação dos arquivos em formato {formato}")
+        inicio = time.perf_counter()
 
         # Obtém a lista de arquivos presentes em pasta_origem (todos, sem filtro)
         arquivos = []
@@ -74,8 +95,8 @@ def compactar_arquivos(
             root_path = Path(root)
             for file in files:
                 file_path = root_path / file
-                # Evita incluir o próprio arquivo compactado
-                if file_path == caminho_completo:
+                # Evita incluir o próprio arquivo compactado e downloads incompletos
+                if file_path == caminho_completo or file.endswith(SUFIXOS_TEMPORARIOS):
                     continue
                 arquivos.append(str(file_path))
 
@@ -83,17 +104,45 @@ def compactar_arquivos(
             logger.warning(f"Nenhum arquivo encontrado em {pasta_origem} para compactar.")
             return None
 
+        manifesto = None
+        if COMPACTACAO_INCREMENTAL:
+            anterior = carregar_manifesto(caminho_completo) if caminho_completo.exists() else None
+            manifesto = gerar_manifesto(arquivos, pasta_origem, formato, anterior)
+
+            if manifestos_equivalentes(anterior, manifesto):
+                logger.info(f"Nenhum arquivo foi alterado; mantendo {caminho_completo} sem recompactar.")
+                salvar_manifesto(caminho_completo, manifesto)
+                return str(caminho_completo)
+
+            inalterados = membros_inalterados(anterior, manifesto)
+            if inalterados and formato in FORMATOS_INCREMENTAIS:
+                resultado = _atualizar_incremental(arquivos, caminho_completo, pasta_origem, inalterados, formato)
+                if resultado:
+                    salvar_manifesto(resultado, manifesto)
+                    registrar_metricas_compactacao(arquivos, resultado, inicio, formato=formato)
+                return resultado
+
+        if caminho_completo.exists():
+            logger.info(f"Arquivo {caminho_completo} será sobrescrito.")
+            caminho_completo.unlink()
+
         # Compacta conforme o formato escolhido
-        if FORMATO_COMPACTACAO == "zip":
-            return _criar_zip(arquivos, str(caminho_completo), str(pasta_origem))
-        elif FORMATO_COMPACTACAO in ["tar", "tar.gz", "tar.bz2"]:
-            return _criar_tar(arquivos, str(caminho_completo), str(pasta_origem))
-        elif FORMATO_COMPACTACAO == "7z":
-            return _criar_7z(arquivos, str(caminho_completo), str(pasta_origem))
+        if formato == "zip":
+            resultado = _criar_zip(arquivos, str(caminho_completo), str(pasta_origem))
+        elif formato in ["tar", "tar.gz", "tar.bz2"]:
+            resultado = _criar_tar(arquivos, str(caminho_completo), str(pasta_origem), formato)
+        elif formato == "7z":
+            resultado = _criar_7z(arquivos, str(caminho_completo), str(pasta_origem))
         else:
-            logger.error(f"Formato de compactação não suportado: {FORMATO_COMPACTACAO}")
+            logger.error(f"Formato de compactação não suportado: {formato}")
             return None
 
+        if resultado and manifesto:
+            salvar_manifesto(resultado, manifesto)
+        if resultado:
+            registrar_metricas_compactacao(arquivos, resultado, inicio, formato=formato)
+        return resultado
+
     except PermissionError as e:
         logger.error(f"Erro de permissão ao compactar arquivos: {e}")
         return None
@@ -102,17 +151,82 @@ def compactar_arquivos(
         return None
 
 
+def registrar_metricas_compactacao(arquivos, caminho_compactado, inicio, bytes_entrada=None, formato=FORMATO_COMPACTACAO):
+    """
+    Registra nas métricas os tamanhos de entrada e saída e a duração de uma compactação.
+    'bytes_entrada' substitui a soma dos tamanhos de 'arquivos' quando não há arquivos em disco
+    (download direto para o compactado).
+    """
+    if bytes_entrada is None:
+        bytes_entrada = sum(os.path.getsize(arquivo) for arquivo in arquivos)
+    bytes_saida = os.path.getsize(caminho_compactado)
+    segundos = time.perf_counter() - inicio
+    metricas.registrar_compactacao(formato, bytes_entrada, bytes_saida, segundos, pasta=Path(caminho_compactado).parent)
+    if bytes_entrada:
+        logger.info(
+            f"Compactação: {bytes_entrada} -> {bytes_saida} bytes "
+            f"({bytes_saida / bytes_entrada:.1%} do original) em {segundos:.2f} s"
+        )
+
+
+def _atualizar_incremental(arquivos, caminho_completo, pasta_origem, inalterados, formato=FORMATO_COMPACTACAO):
+    """
+    Recria um ZIP ou TAR copiando sem recompressão os membros inalterados do arquivo anterior
+    e compactando apenas os arquivos novos ou alterados. O resultado é montado em um arquivo
+    temporário que substitui o anterior apenas ao final.
+
+    Args:
+        arquivos (list): Caminhos dos arquivos a compactar.
+        caminho_completo (Path): Arquivo compactado existente (e destino do novo).
+        pasta_origem (Path): Pasta base dos caminhos relativos.
+        inalterados (set): Caminhos relativos cujo conteúdo não mudou.
+        formato (str): "zip" ou "tar".
+
+    Returns:
+        str: Caminho do arquivo compactado ou None em caso de erro.
+    """
+    caminho_temporario = caminho_completo.with_name(f"{caminho_completo.name}.tmp")
+    copiados = 0
+    try:
+        with open(caminho_completo, "rb") as origem:
+            if formato == "zip":
+                membros_anteriores = {info.filename: info for info in zipfile.ZipFile(origem).infolist()}
+                escritor = EscritorZipParalelo(caminho_temporario)
+            else:
+                membros_anteriores = {info.name: info for info in tarfile.open(fileobj=origem).getmembers()}
+                escritor = EscritorTar(caminho_temporario, "tar")
+
+            with escritor:
+                for arquivo in arquivos:
+                    arquivo_path = Path(arquivo)
+                    arcname = arquivo_path.relative_to(pasta_origem).as_posix()
+                    if arcname in inalterados and arcname in membros_anteriores:
+                        escritor.copiar_membro(origem, membros_anteriores[arcname])
+                        copiados += 1
+                    else:
+                        escritor.adicionar(arquivo_path, arcname)
+
+        os.replace(caminho_temporario, caminho_completo)
+        logger.info(
+            f"Arquivo {caminho_completo} atualizado: {copiados} membro(s) reaproveitado(s), "
+            f"{len(arquivos) - copiados} compactado(s)."
+        )
+        return str(caminho_completo)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar incrementalmente {caminho_completo}: {e}", exc_info=True)
+        caminho_temporario.unlink(missing_ok=True)
+        return None
+
+
 def _criar_zip(arquivos, nome_arquivo, pasta_origem):
     """Cria arquivo ZIP com os arquivos selecionados."""
     try:
         nome_arquivo_path = Path(nome_arquivo)
         pasta_origem_path = Path(pasta_origem)
-        with zipfile.ZipFile(nome_arquivo_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        with abrir_escritor(nome_arquivo_path, "zip") as escritor:
             for arquivo in arquivos:
                 arquivo_path = Path(arquivo)
-                arcname = arquivo_path.relative_to(pasta_origem_path)
-                zipf.write(arquivo_path, arcname)
-                logger.debug(f"Arquivo {arcname} adicionado ao ZIP")
+                escritor.adicionar(arquivo_path, arquivo_path.relative_to(pasta_origem_path))
         logger.info(f"Arquivo ZIP criado com sucesso: {nome_arquivo_path}")
         return str(nome_arquivo_path)
     except Exception as e:
@@ -120,34 +234,26 @@ def _criar_zip(arquivos, nome_arquivo, pasta_origem):
         return None
 
 
-def _criar_tar(arquivos, nome_arquivo, pasta_origem):
+def _criar_tar(arquivos, nome_arquivo, pasta_origem, formato=FORMATO_COMPACTACAO):
     """Cria arquivo TAR (ou comprimido) com os arquivos selecionados."""
-    if FORMATO_COMPACTACAO == "tar":
-        modo = "w"
-    elif FORMATO_COMPACTACAO == "tar.gz":
-        modo = "w:gz"
-    elif FORMATO_COMPACTACAO == "tar.bz2":
-        modo = "w:bz2"
-    else:
-        logger.error(f"Formato TAR não suportado: {FORMATO_COMPACTACAO}")
+    if formato not in MODOS_TAR:
+        logger.error(f"Formato TAR não suportado: {formato}")
         return None
 
     try:
         nome_arquivo_path = Path(nome_arquivo)
         pasta_origem_path = Path(pasta_origem)
         # Ajusta a extensão se necessário
-        if FORMATO_COMPACTACAO == "tar.gz" and not nome_arquivo_path.suffix == ".gz":
+        if formato == "tar.gz" and not nome_arquivo_path.suffix == ".gz":
             nome_arquivo_path = nome_arquivo_path.with_suffix(".tar.gz")
-        elif FORMATO_COMPACTACAO == "tar.bz2" and not nome_arquivo_path.suffix == ".bz2":
+        elif formato == "tar.bz2" and not nome_arquivo_path.suffix == ".bz2":
             nome_arquivo_path = nome_arquivo_path.with_suffix(".tar.bz2")
-        elif FORMATO_COMPACTACAO == "tar" and not nome_arquivo_path.suffix == ".tar":
+        elif formato == "tar" and not nome_arquivo_path.suffix == ".tar":
             nome_arquivo_path = nome_arquivo_path.with_suffix(".tar")
-        with tarfile.open(nome_arquivo_path, modo) as tarf:
+        with abrir_escritor(nome_arquivo_path, formato) as escritor:
             for arquivo in arquivos:
-                arquivo_path = Path(arquivo).resolve()
-                arcname = arquivo_path.relative_to(pasta_origem_path)
-                tarf.add(str(arquivo_path), arcname=str(arcname))
-                logger.debug(f"Arquivo {arcname} adicionado ao TAR")
+                arquivo_path = Path(arquivo)
+                escritor.adicionar(arquivo_path, arquivo_path.relative_to(pasta_origem_path))
         logger.info(f"Arquivo TAR criado com sucesso: {nome_arquivo_path}")
         return str(nome_arquivo_path)
     except Exception as e:
@@ -161,15 +267,167 @@ def _criar_7z(arquivos, nome_arquivo, pasta_origem):
     """
     try:
         nome_arquivo_path = Path(nome_arquivo)
-        pasta_origem_path = Path(pasta_origem).resolve()
-        with py7zr.SevenZipFile(str(nome_arquivo_path), 'w') as archive:
+        pasta_origem_path = Path(pasta_origem)
+        with abrir_escritor(nome_arquivo_path, "7z") as escritor:
             for arquivo in arquivos:
-                arquivo_path = Path(arquivo).resolve()
-                arcname = arquivo_path.relative_to(pasta_origem_path)
-                archive.write(str(arquivo_path), arcname=str(arcname))
-                logger.debug(f"Arquivo {arcname} adicionado ao 7Z")
+                arquivo_path = Path(arquivo)
+                escritor.adicionar(arquivo_path, arquivo_path.relative_to(pasta_origem_path))
         logger.info(f"Arquivo 7Z criado com sucesso: {nome_arquivo_path}")
         return str(nome_arquivo_path)
     except Exception as e:
         logger.error(f"Erro ao criar arquivo 7Z: {e}", exc_info=True)
         return None
+
+
+# =============================================================================
+# Escritores incrementais: permitem adicionar arquivos ao compactado um a um,
+# à medida que ficam disponíveis (usados também pelo pipeline de compactação).
+# =============================================================================
+
+class EscritorZip:
+    """
+    Escreve um arquivo ZIP, adicionando um membro por vez.
+
+    Arquivos que já parecem comprimidos (METODO_ZIP) entram sem compressão: os dados vão para o
+    membro aberto por ZipFile.open em fatias de um mmap, sem cópias em objetos Python (copia_direta).
+    """
+
+    def __init__(self, caminho):
+        self._zip = zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED, compresslevel=NIVEL_COMPACTACAO)
+
+    def adicionar(self, caminho_arquivo, arcname):
+        if os.path.isfile(caminho_arquivo) and deve_armazenar(caminho_arquivo):
+            self._adicionar_armazenado(caminho_arquivo, arcname)
+            return
+        self._zip.write(caminho_arquivo, arcname)
+        logger.debug(f"Arquivo {arcname} adicionado ao ZIP")
+
+    def _adicionar_armazenado(self, caminho_arquivo, arcname):
+        """Grava o membro como ZIP_STORED por ZipFile.open, alimentado diretamente por um mmap do arquivo."""
+        info = zipfile.ZipInfo.from_file(caminho_arquivo, arcname)
+        info.compress_type = zipfile.ZIP_STORED
+        with self._zip.open(info, 'w') as membro:
+            if gravar_mapeado(caminho_arquivo, membro) != info.file_size:
+                raise ValueError(f"Arquivo {caminho_arquivo} mudou de tamanho durante a compactação")
+        metricas.incrementar("membros_zip_sem_compressao")
+        logger.debug(f"Arquivo {arcname} adicionado ao ZIP sem compressão")
+
+    def fechar(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class EscritorTar:
+    """Escreve um arquivo TAR (opcionalmente gz/bz2), adicionando um membro por vez."""
+
+    def __init__(self, caminho, formato):
+        self._formato = formato
+        if formato == "tar" or NIVEL_COMPACTACAO is None:
+            self._tar = tarfile.open(caminho, MODOS_TAR[formato])
+        else:
+            # bz2 não aceita nível 0
+            nivel = max(1, NIVEL_COMPACTACAO) if formato == "tar.bz2" else NIVEL_COMPACTACAO
+            self._tar = tarfile.open(caminho, MODOS_TAR[formato], compresslevel=nivel)
+
+    def adicionar(self, caminho_arquivo, arcname):
+        info = self._tar.gettarinfo(str(caminho_arquivo), arcname=str(arcname))
+        if self._formato != "tar" or not info.isreg():
+            self._tar.add(str(caminho_arquivo), arcname=str(arcname))
+            logger.debug(f"Arquivo {arcname} adicionado ao TAR")
+            return
+
+        # TAR sem compressão: cabeçalho pelo tarfile e dados copiados diretamente para o arquivo
+        cabecalho = info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors)
+        self._tar.fileobj.write(cabecalho)
+        if copiar_arquivo(caminho_arquivo, self._tar.fileobj) != info.size:
+            raise ValueError(f"Arquivo {caminho_arquivo} mudou de tamanho durante a compactação")
+        blocos, resto = divmod(info.size, tarfile.BLOCKSIZE)
+        if resto:
+            self._tar.fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - resto))
+            blocos += 1
+        self._tar.offset += len(cabecalho) + blocos * tarfile.BLOCKSIZE
+        self._tar.members.append(info)
+        logger.debug(f"Arquivo {arcname} adicionado ao TAR (cópia direta)")
+
+    def copiar_membro(self, origem, info):
+        """
+        Copia um membro de outro TAR sem compressão (cabeçalhos e dados), sem passar pelos buffers do Python.
+
+        Args:
+            origem: Arquivo TAR de origem aberto em modo binário.
+            info (tarfile.TarInfo): Membro a ser copiado.
+        """
+        fim = info.offset_data + -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        if os.fstat(origem.fileno()).st_size < fim:
+            raise ValueError(f"Membro {info.name} truncado no TAR de origem")
+        copiar_intervalo(origem, info.offset, fim - info.offset, self._tar.fileobj)
+        self._tar.offset += fim - info.offset
+        self._tar.members.append(info)
+        logger.debug(f"Membro {info.name} copiado sem reempacotamento (TAR)")
+
+    def fechar(self):
+        self._tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class Escritor7z:
+    """Escreve um arquivo 7Z com py7zr, adicionando um membro por vez."""
+
+    def __init__(self, caminho):
+        # py7zr é pesado de importar; só é carregado quando o formato 7z é usado
+        import py7zr
+
+        filtros = None
+        if NIVEL_COMPACTACAO is not None:
+            filtros = [{"id": py7zr.FILTER_LZMA2, "preset": NIVEL_COMPACTACAO}]
+        self._archive = py7zr.SevenZipFile(str(caminho), 'w', filters=filtros)
+
+    def adicionar(self, caminho_arquivo, arcname):
+        self._archive.write(str(caminho_arquivo), arcname=str(arcname))
+        logger.debug(f"Arquivo {arcname} adicionado ao 7Z")
+
+    def fechar(self):
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def abrir_escritor(caminho, formato=FORMATO_COMPACTACAO):
+    """
+    Abre um escritor incremental para o formato de compactação informado.
+
+    Args:
+        caminho (str | Path): Caminho do arquivo compactado a ser criado.
+        formato (str): Um dos SUPPORTED_FORMATS.
+
+    Se COMPACTACAO_PARALELA estiver ativo, ZIP, TAR.GZ e TAR.BZ2 usam os escritores paralelos
+    de compactacao_paralela (o TAR sem compressão e o 7Z não têm etapa paralelizável aqui).
+
+    Returns:
+        Objeto com os métodos adicionar(caminho, arcname) e fechar().
+    """
+    if COMPACTACAO_PARALELA and formato == "zip":
+        return EscritorZipParalelo(caminho)
+    if COMPACTACAO_PARALELA and formato in ("tar.gz", "tar.bz2"):
+        return EscritorTarParalelo(caminho, formato)
+    if formato == "zip":
+        return EscritorZip(caminho)
+    if formato in MODOS_TAR:
+        return EscritorTar(caminho, formato)
+    if formato == "7z":
+        return Escritor7z(caminho)
+    raise ValueError(f"Formato de compactação não suportado: {formato}")
@@ -21,14 +21,56 @@ ANEXOS_CONFIG = {
     }
 }
 
+# Regra usada quando vários links correspondem ao mesmo anexo: "primeiro", "ultimo" ou "texto"
+# (prefere links cujo texto contém o padrão). Pode ser sobrescrita por anexo com a chave "prioridade".
+REGRA_PRIORIDADE_LINKS = "primeiro"
+
+# Como o HTML da página é analisado:
+#   "completo"   - árvore BeautifulSoup inteira
+#   "ancoras"    - BeautifulSoup apenas com as tags <a> (SoupStrainer)
+#   "incremental" - parser lxml alimentado pelo fluxo da resposta, sem montar o DOM
+MODO_PARSE_HTML = "ancoras"
+TAMANHO_CHUNK_HTML = 64 * 1024  # Tamanho dos blocos lidos da resposta no modo "incremental" (em bytes)
+
 
 # =============================================================================
 # Configurações de Requisições
 # =============================================================================
 
-DELAY_ENTRE_REQUESTS = 1        # Delay entre requisições (em segundos)
 REQUEST_TIMEOUT = 30           # Timeout para requisições (em segundos)
 
+# Limitador de taxa adaptativo por host (token bucket com aumento aditivo e redução multiplicativa)
+TAXA_INICIAL_REQUISICOES = 1.0   # Requisições por segundo a cada host no início da execução
+TAXA_MINIMA_REQUISICOES = 0.1    # Limite inferior da taxa após reduções
+TAXA_MAXIMA_REQUISICOES = 20.0   # Limite superior da taxa após aumentos
+RAJADA_REQUISICOES = 4           # Requisições que podem ser enviadas de uma vez (capacidade do balde)
+INCREMENTO_TAXA = 0.5            # Aumento da taxa a cada resposta bem-sucedida (em req/s)
+FATOR_REDUCAO_TAXA = 0.5         # Fator aplicado à taxa em respostas 429/503 e falhas de conexão
+
+
+# =============================================================================
+# Configurações de Cache da Página
+# =============================================================================
+
+USAR_CACHE_PAGINA = True                    # Se True, usa cache em disco com GET condicional (ETag / Last-Modified)
+PASTA_CACHE = ".cache"                      # Pasta onde as páginas em cache são armazenadas
+CACHE_IDADE_MAXIMA = 7 * 24 * 60 * 60       # Idade máxima de uma entrada em cache (em segundos)
+CACHE_TAMANHO_MAXIMO = 50 * 1024 * 1024     # Tamanho máximo total do cache (em bytes)
+
+
+# =============================================================================
+# Configurações do Crawler
+# =============================================================================
+
+# Com MODO_CRAWLER ativo, as páginas ligadas a URL_BASE_ANS também são visitadas e os anexos de todas
+# elas são baixados juntos
+MODO_CRAWLER = False
+PREFIXOS_CRAWLER = [URL_BASE_ANS]  # Só páginas cujo endereço começa com um destes prefixos são visitadas
+PROFUNDIDADE_MAXIMA_CRAWLER = 2    # Distância máxima (em links) a partir da página inicial
+MAX_PAGINAS_CRAWLER = 100          # Número máximo de páginas visitadas
+TAMANHO_FRONTEIRA_CRAWLER = 1000   # Máximo de páginas aguardando visita; as excedentes são descartadas
+MAX_PARALELO_CRAWLER = 4           # Páginas buscadas simultaneamente
+
 
 # =============================================================================
 # Configurações de Download
@@ -41,12 +83,52 @@ PASTA_ARQUIVOS = "arquivos"      # Subpasta onde os arquivos serão salvos
 # Parâmetros de download
 MAX_PARALELO = 2               # Número máximo de downloads paralelos
 MAX_TENTATIVAS = 3             # Número máximo de tentativas de download
-DELAY_ENTRE_TENTATIVAS = 5     # Delay entre tentativas de download (em segundos)
+BACKOFF_BASE_TENTATIVAS = 2.0  # Base do backoff exponencial (com jitter) entre tentativas (em segundos)
+BACKOFF_MAXIMO_TENTATIVAS = 60.0  # Espera máxima entre tentativas (em segundos)
+TAMANHO_CHUNK_DOWNLOAD = 1024 * 1024  # Tamanho dos blocos lidos da resposta e gravados em disco (em bytes)
+SEGMENTOS_POR_ARQUIVO = 4      # Conexões simultâneas por arquivo quando o servidor aceita Range (1 desativa)
+TAMANHO_MINIMO_SEGMENTO = 8 * 1024 * 1024  # Tamanho mínimo de cada segmento (em bytes)
+
+# Pool de conexões HTTP compartilhado pelo conector e pelo downloader
+TAMANHO_POOL_CONEXOES = MAX_PARALELO * SEGMENTOS_POR_ARQUIVO  # Conexões keep-alive mantidas por host
+TENTATIVAS_TRANSPORTE = 2      # Tentativas automáticas em falhas de conexão e respostas 429/502/503/504
+BACKOFF_TRANSPORTE = 0.5       # Fator de backoff exponencial entre tentativas de transporte (em segundos)
 
 # Flags de comportamento no download
 LIMPAR_PASTA_DOWNLOADS = False   # Se True, limpa a pasta de downloads antes de iniciar
 SOBRESCREVER_ARQUIVOS = False     # Se True, sobrescreve arquivos existentes
 DOWNLOAD_PARALELO = True         # Se True, realiza downloads em paralelo
+MOTOR_DOWNLOAD = "threads"       # Motor do download paralelo: "threads" (ThreadPoolExecutor) ou "asyncio"
+CLIENTE_HTTP_ASYNC = "aiohttp"   # Cliente HTTP do motor asyncio: "aiohttp" ou "httpx" (instalar à parte)
+MAX_CONCORRENCIA_ASYNC = 50      # Número máximo de downloads simultâneos no motor asyncio
+
+# Orçamento global, somando todos os downloads do processo (inclusive os alvos executados juntos pelo lote.py)
+BANDA_MAXIMA_DOWNLOAD = None     # Limite de banda dos downloads (em bytes por segundo); None não limita
+MAX_DOWNLOADS_SIMULTANEOS = None  # Máximo de arquivos sendo baixados ao mesmo tempo; None não limita
+
+
+# =============================================================================
+# Configurações do Armazenamento de Downloads
+# =============================================================================
+
+# Com o armazenamento ativo, um arquivo existente só é mantido se o servidor confirmar (HEAD condicional)
+# que a URL não mudou; nesse caso ele é ligado a partir do armazenamento sem novo download
+USAR_ARMAZENAMENTO = True             # Se True, guarda os downloads em um armazenamento endereçado por SHA-256
+PASTA_ARMAZENAMENTO = ".armazenamento"  # Pasta dos blobs e do índice URL -> conteúdo
+MODO_LIGACAO_ARMAZENAMENTO = "auto"   # Como os blobs chegam à pasta de downloads: "auto", "reflink", "hardlink" ou "copia"
+
+
+# =============================================================================
+# Configurações da Validação dos Arquivos
+# =============================================================================
+
+# Após o download, cada arquivo é validado em um pool de processos (cabeçalho e trailer PDF, tabela xref,
+# número de páginas, tamanho informado pelo servidor) e seus metadados são extraídos
+VALIDAR_ARQUIVOS = True            # Se True, valida os arquivos baixados antes da compactação
+WORKERS_VALIDACAO = None           # Número de processos da validação; None usa todos os núcleos
+REDOWNLOADS_VALIDACAO = 2          # Quantas vezes um arquivo inválido é baixado de novo antes de ser descartado
+PASTA_INVALIDOS = "invalidos"      # Subpasta de PASTA_DOWNLOADS para onde vão os arquivos que continuam inválidos
+NOME_MANIFESTO_ARQUIVOS = "manifesto_arquivos.json"  # Manifesto gravado em PASTA_ARQUIVOS (entra no compactado)
 
 
 # =============================================================================
@@ -56,3 +138,50 @@ DOWNLOAD_PARALELO = True         # Se True, realiza downloads em paralelo
 SOBRESCREVER_COMPACTACAO = True  # Se True, sobrescreve arquivo compactado existente
 FORMATO_COMPACTACAO = "zip"      # Formato de compactação: opções suportadas ("zip", "tar", "tar.gz", "tar.bz2", "7z")
 NOME_ARQUIVO_COMPACTADO = "anexos"  # Nome base para o arquivo compactado
+NIVEL_COMPACTACAO = None         # Nível de compressão (0-9); None usa o padrão de cada biblioteca
+COMPACTACAO_PARALELA = False     # Se True, comprime ZIP / TAR.GZ / TAR.BZ2 em blocos paralelos (vários núcleos)
+WORKERS_COMPACTACAO = None       # Número de workers da compactação paralela; None usa todos os núcleos
+TAMANHO_BLOCO_COMPACTACAO = 1024 * 1024  # Tamanho dos blocos comprimidos em paralelo (em bytes)
+METODO_ZIP = "auto"               # Membros ZIP: "deflate", "store" (sem compressão) ou "auto" (store para dados já comprimidos)
+LIMIAR_ENTROPIA_ZIP = 7.5        # No modo "auto", entropia amostrada (bits/byte, máx. 8) a partir da qual o arquivo não é comprimido
+COPIA_DIRETA_ARQUIVOS = True     # Se True, dados sem compressão (TAR, ZIP store) são copiados no kernel (copy_file_range / sendfile)
+COMPACTACAO_INCREMENTAL = True   # Se True, usa um manifesto (SHA-256) para reaproveitar membros inalterados
+PIPELINE_COMPACTACAO = False     # Se True, compacta cada arquivo assim que seu download termina
+TAMANHO_FILA_COMPACTACAO = 4     # Máximo de arquivos concluídos aguardando compactação no pipeline
+
+# Com DOWNLOAD_DIRETO_COMPACTADO, as respostas são gravadas diretamente no compactado (zip, tar, tar.gz,
+# tar.bz2), sem arquivos em PASTA_ARQUIVOS; o 7z usa o pipeline. O armazenamento de downloads, a
+# compactação incremental e o download segmentado não se aplicam nesse modo
+DOWNLOAD_DIRETO_COMPACTADO = False
+MEMORIA_DOWNLOAD_DIRETO = 32 * 1024 * 1024  # Teto dos buffers dos downloads que aguardam a vez de gravar no compactado (em bytes)
+
+
+# =============================================================================
+# Configurações de Métricas
+# =============================================================================
+
+SALVAR_RELATORIO_METRICAS = True  # Se True, grava ao final da execução um relatório com as métricas coletadas
+CAMINHO_RELATORIO_METRICAS = PASTA_DOWNLOADS + "/relatorio_execucao.json"  # Relatório em JSON
+CAMINHO_METRICAS_PROMETHEUS = None  # Se definido (ex.: "metricas.prom"), grava também no formato texto do Prometheus
+
+
+# =============================================================================
+# Configurações do Lote
+# =============================================================================
+
+# Usadas por lote.py, que executa vários alvos (páginas, anexos, pasta e compactado próprios) descritos
+# em um manifesto JSON ou YAML, no mesmo processo e com a mesma sessão HTTP e pools de workers
+MAX_ALVOS_SIMULTANEOS = 4         # Alvos executados ao mesmo tempo
+CAMINHO_RELATORIO_LOTE = PASTA_DOWNLOADS + "/relatorio_lote.json"  # Relatório do lote (métricas e resultado de cada alvo)
+
+
+# =============================================================================
+# Configurações do Serviço
+# =============================================================================
+
+# Usadas por servico.py, que mantém o processo ativo (sessão HTTP, caches e limitador aquecidos) e
+# executa o fluxo periodicamente ou quando acionado pelo gatilho HTTP local
+INTERVALO_SERVICO = 24 * 60 * 60  # Intervalo entre execuções agendadas (em segundos); None executa só sob demanda
+EXECUTAR_AO_INICIAR = True        # Se True, executa uma vez assim que o serviço inicia
+HOST_SERVICO = "127.0.0.1"        # Endereço do gatilho HTTP (mantenha em uma interface local)
+PORTA_SERVICO = 8787              # Porta do gatilho HTTP
@@ -0,0 +1,203 @@
+import errno
+import math
+import mmap
+import os
+import zlib
+from collections import Counter
+
+from config import COPIA_DIRETA_ARQUIVOS, METODO_ZIP, LIMIAR_ENTROPIA_ZIP
+from logger_config import logger
+
+# Métodos aceitos em METODO_ZIP
+METODOS_ZIP = ["deflate", "store", "auto"]
+
+# Amostras lidas para estimar a entropia de um arquivo (quantidade e tamanho de cada uma)
+AMOSTRAS_ENTROPIA = 8
+TAMANHO_AMOSTRA_ENTROPIA = 16 * 1024
+
+# Máximo de bytes por chamada de copy_file_range / sendfile / pwrite
+_TAMANHO_MAXIMO_COPIA = 64 * 1024 * 1024
+
+# Erros de copy_file_range / sendfile que indicam apenas que o caminho não é suportado
+# (sistema de arquivos, kernel ou tipo de descritor) e levam à próxima alternativa
+_ERROS_SEM_SUPORTE = {"EXDEV", "ENOSYS", "EINVAL", "EOPNOTSUPP", "ENOTSUP", "EBADF", "ESPIPE"}
+
+
+def copiar_intervalo(origem, inicio, tamanho, destino):
+    """
+    Copia 'tamanho' bytes de 'origem' a partir de 'inicio' para a posição atual de 'destino'
+    sem passar os dados pelos buffers do Python: usa os.copy_file_range (dentro do kernel, com
+    reflink em sistemas de arquivos que suportam), depois os.sendfile e, por fim, um mmap da
+    origem gravado com os.pwrite.
+
+    Args:
+        origem: Arquivo de origem aberto em modo binário (só o descritor é usado).
+        inicio (int): Deslocamento inicial na origem.
+        tamanho (int): Quantidade de bytes a copiar.
+        destino: Arquivo de destino aberto em modo binário; ao final fica posicionado após os dados.
+    """
+    destino.flush()
+    fd_origem = origem.fileno()
+    fd_destino = destino.fileno()
+    posicao = destino.tell()
+    copiados = 0
+    if COPIA_DIRETA_ARQUIVOS:
+        for copiar in (_copy_file_range, _sendfile):
+            try:
+                copiados = copiar(fd_origem, inicio, fd_destino, posicao, tamanho, copiados)
+                break
+            except OSError as e:
+                if errno.errorcode.get(e.errno) not in _ERROS_SEM_SUPORTE:
+                    raise
+                logger.debug(f"{copiar.__name__.lstrip('_')} indisponível ({e}); tentando a próxima alternativa.")
+    if copiados < tamanho:
+        copiados = _pwrite_mmap(fd_origem, inicio, fd_destino, posicao, tamanho, copiados)
+    destino.seek(posicao + copiados)
+
+
+def copiar_arquivo(caminho, destino):
+    """
+    Copia o conteúdo inteiro do arquivo 'caminho' para a posição atual de 'destino' (ver copiar_intervalo).
+
+    Returns:
+        int: Quantidade de bytes copiados.
+    """
+    with open(caminho, "rb") as origem:
+        tamanho = os.fstat(origem.fileno()).st_size
+        copiar_intervalo(origem, 0, tamanho, destino)
+    return tamanho
+
+
+def gravar_mapeado(caminho, destino):
+    """
+    Grava o conteúdo inteiro do arquivo 'caminho' em 'destino' (qualquer objeto com write(), como
+    um membro aberto por ZipFile.open em modo 'w') em fatias de um mmap, sem copiar os dados para
+    objetos Python.
+
+    Returns:
+        int: Quantidade de bytes gravados.
+    """
+    with open(caminho, "rb") as origem:
+        tamanho = os.fstat(origem.fileno()).st_size
+        if tamanho == 0:
+            return 0
+        with mmap.mmap(origem.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            visao = memoryview(mapa)
+            try:
+                for inicio in range(0, tamanho, _TAMANHO_MAXIMO_COPIA):
+                    destino.write(visao[inicio:inicio + _TAMANHO_MAXIMO_COPIA])
+            finally:
+                visao.release()
+    return tamanho
+
+
+def crc32_arquivo(caminho):
+    """Calcula o CRC-32 do arquivo lendo-o por um mmap, sem copiar o conteúdo para objetos Python."""
+    with open(caminho, "rb") as arquivo:
+        if os.fstat(arquivo.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            return zlib.crc32(mapa)
+
+
+def entropia_amostrada(caminho):
+    """
+    Estima a entropia do arquivo (em bits por byte, de 0 a 8) pela média da entropia de Shannon
+    de AMOSTRAS_ENTROPIA trechos espalhados pelo conteúdo. Valores próximos de 8 indicam dados
+    já comprimidos ou aleatórios, em que o deflate gasta CPU sem reduzir o tamanho.
+    """
+    with open(caminho, "rb") as arquivo:
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        if tamanho == 0:
+            return 0.0
+        quantidade = max(1, min(AMOSTRAS_ENTROPIA, tamanho // TAMANHO_AMOSTRA_ENTROPIA))
+        passo = max(tamanho - TAMANHO_AMOSTRA_ENTROPIA, 0) // max(quantidade - 1, 1)
+        entropias = []
+        for indice in range(quantidade):
+            arquivo.seek(indice * passo)
+            entropias.append(_entropia(arquivo.read(TAMANHO_AMOSTRA_ENTROPIA)))
+    return sum(entropias) / len(entropias)
+
+
+def entropia_dados(dados):
+    """Como entropia_amostrada, mas sobre dados já em memória (ex.: o início de um download)."""
+    if not dados:
+        return 0.0
+    quantidade = max(1, min(AMOSTRAS_ENTROPIA, len(dados) // TAMANHO_AMOSTRA_ENTROPIA))
+    passo = max(len(dados) - TAMANHO_AMOSTRA_ENTROPIA, 0) // max(quantidade - 1, 1)
+    visao = memoryview(dados)
+    entropias = [
+        _entropia(visao[indice * passo:indice * passo + TAMANHO_AMOSTRA_ENTROPIA]) for indice in range(quantidade)
+    ]
+    return sum(entropias) / len(entropias)
+
+
+def _entropia(amostra):
+    """Entropia de Shannon da amostra, em bits por byte."""
+    return -sum(
+        contagem / len(amostra) * math.log2(contagem / len(amostra))
+        for contagem in Counter(amostra).values()
+    )
+
+
+def deve_armazenar(caminho, metodo=METODO_ZIP, dados=None):
+    """
+    Indica se o arquivo deve entrar no ZIP sem compressão (ZIP_STORED), conforme METODO_ZIP:
+    "store" sempre, "deflate" nunca e "auto" quando a entropia amostrada atinge LIMIAR_ENTROPIA_ZIP.
+    Se 'dados' for informado, a entropia é estimada sobre eles em vez do conteúdo de 'caminho'
+    (que então serve só para o log).
+    """
+    if metodo not in METODOS_ZIP:
+        raise ValueError(f"Método ZIP inválido: {metodo}. Métodos suportados: {', '.join(METODOS_ZIP)}")
+    if metodo != "auto":
+        return metodo == "store"
+    entropia = entropia_amostrada(caminho) if dados is None else entropia_dados(dados)
+    armazenar = entropia >= LIMIAR_ENTROPIA_ZIP
+    logger.debug(
+        f"Entropia de {os.path.basename(caminho)}: {entropia:.2f} bits/byte "
+        f"({'sem compressão' if armazenar else 'deflate'})"
+    )
+    return armazenar
+
+
+def _copy_file_range(fd_origem, inicio, fd_destino, posicao, tamanho, copiados):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range não disponível")
+    while copiados < tamanho:
+        quantidade = os.copy_file_range(
+            fd_origem, fd_destino, min(tamanho - copiados, _TAMANHO_MAXIMO_COPIA),
+            inicio + copiados, posicao + copiados
+        )
+        if quantidade == 0:
+            raise ValueError("Arquivo de origem terminou antes do esperado durante a cópia")
+        copiados += quantidade
+    return copiados
+
+
+def _sendfile(fd_origem, inicio, fd_destino, posicao, tamanho, copiados):
+    # sendfile grava na posição atual do descritor de destino
+    os.lseek(fd_destino, posicao + copiados, os.SEEK_SET)
+    while copiados < tamanho:
+        quantidade = os.sendfile(fd_destino, fd_origem, inicio + copiados, min(tamanho - copiados, _TAMANHO_MAXIMO_COPIA))
+        if quantidade == 0:
+            raise ValueError("Arquivo de origem terminou antes do esperado durante a cópia")
+        copiados += quantidade
+    return copiados
+
+
+def _pwrite_mmap(fd_origem, inicio, fd_destino, posicao, tamanho, copiados):
+    # O mmap precisa começar em um múltiplo de ALLOCATIONGRANULARITY
+    base = (inicio + copiados) // mmap.ALLOCATIONGRANULARITY * mmap.ALLOCATIONGRANULARITY
+    with mmap.mmap(fd_origem, inicio + tamanho - base, access=mmap.ACCESS_READ, offset=base) as mapa:
+        visao = memoryview(mapa)
+        try:
+            while copiados < tamanho:
+                deslocamento = inicio + copiados - base
+                quantidade = os.pwrite(
+                    fd_destino, visao[deslocamento:deslocamento + min(tamanho - copiados, _TAMANHO_MAXIMO_COPIA)],
+                    posicao + copiados
+                )
+                copiados += quantidade
+        finally:
+            visao.release()
+    return copiados
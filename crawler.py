@@ -0,0 +1,187 @@
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from urllib.parse import urljoin, urldefrag, urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+from config import (
+    URL_BASE_ANS, ANEXOS_CONFIG, PREFIXOS_CRAWLER, PROFUNDIDADE_MAXIMA_CRAWLER, MAX_PAGINAS_CRAWLER,
+    TAMANHO_FRONTEIRA_CRAWLER, MAX_PARALELO_CRAWLER
+)
+from extractor import extrair_links, iterar_ancoras
+from logger_config import logger
+from metricas import metricas
+from siteConnector import entrar_site
+
+# Extensões de caminho tratadas como páginas HTML (as demais são arquivos e não entram na fronteira)
+EXTENSOES_PAGINA = ("", ".html", ".htm", ".php", ".aspx")
+
+
+def canonicalizar_url(url):
+    """
+    Normaliza a URL para comparação: esquema e host em minúsculas, sem porta padrão, sem fragmento,
+    sem barra final e com os parâmetros da query ordenados.
+    """
+    partes = urlsplit(url.strip())
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or "").lower()
+    if partes.port and (esquema, partes.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{partes.port}"
+    caminho = partes.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return urlunsplit((esquema, host, caminho, query, ""))
+
+
+class IndiceUrls:
+    """
+    Conjunto de URLs já vistas, guardando só um resumo de 8 bytes (BLAKE2b) de cada URL canônica.
+    """
+
+    def __init__(self):
+        self._resumos = set()
+
+    @staticmethod
+    def _resumo(url):
+        return hashlib.blake2b(canonicalizar_url(url).encode("utf-8"), digest_size=8).digest()
+
+    def adicionar(self, url):
+        """Registra a URL e retorna True se ela ainda não tinha sido vista."""
+        resumo = self._resumo(url)
+        if resumo in self._resumos:
+            return False
+        self._resumos.add(resumo)
+        return True
+
+    def __contains__(self, url):
+        return self._resumo(url) in self._resumos
+
+    def __len__(self):
+        return len(self._resumos)
+
+
+@metricas.medir()
+def rastrear_anexos(
+        url_inicial=URL_BASE_ANS,
+        prefixos=PREFIXOS_CRAWLER,
+        profundidade_maxima=PROFUNDIDADE_MAXIMA_CRAWLER,
+        max_paginas=MAX_PAGINAS_CRAWLER,
+        anexos_config=ANEXOS_CONFIG
+):
+    """
+    Percorre as páginas a partir de url_inicial (busca em largura) e reúne os anexos de todas elas.
+
+    Só são visitadas páginas cujo endereço começa com um dos prefixos, até profundidade_maxima
+    links de distância e no máximo max_paginas páginas. As páginas são buscadas em paralelo
+    (MAX_PARALELO_CRAWLER); o ritmo de requisições por host é controlado pelo limitador de taxa da
+    sessão HTTP.
+
+    Args:
+        url_inicial (str): Página inicial. Por padrão: URL_BASE_ANS.
+        prefixos (list): Prefixos de URL permitidos. Por padrão: PREFIXOS_CRAWLER.
+        profundidade_maxima (int): Profundidade máxima. Por padrão: PROFUNDIDADE_MAXIMA_CRAWLER.
+        max_paginas (int): Número máximo de páginas visitadas. Por padrão: MAX_PAGINAS_CRAWLER.
+        anexos_config (dict): Configuração dos anexos. Por padrão: ANEXOS_CONFIG.
+
+    Returns:
+        dict: Dicionário com os nomes dos arquivos como chaves e URLs como valores, pronto para
+        baixar_arquivos. Anexos de mesmo nome encontrados em páginas diferentes recebem o nome do
+        arquivo na URL.
+    """
+    prefixos = [canonicalizar_url(prefixo).rstrip("/") for prefixo in prefixos]
+    vistas = IndiceUrls()
+    fronteira = deque()
+    descartadas = 0
+    visitadas = 0
+    falhas = 0
+    anexos = {}
+    urls_anexos = IndiceUrls()
+
+    vistas.adicionar(url_inicial)
+    fronteira.append((url_inicial, 0))
+    logger.info(f"Iniciando rastreamento a partir de {url_inicial} (profundidade máxima {profundidade_maxima})")
+    inicio = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALELO_CRAWLER) as executor:
+        em_andamento = {}
+        while fronteira or em_andamento:
+            while fronteira and len(em_andamento) < MAX_PARALELO_CRAWLER and visitadas + len(em_andamento) < max_paginas:
+                url, profundidade = fronteira.popleft()
+                em_andamento[executor.submit(_visitar_pagina, url, anexos_config)] = (url, profundidade)
+            if not em_andamento:
+                break
+
+            concluidas, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in concluidas:
+                url, profundidade = em_andamento.pop(futuro)
+                try:
+                    links_pagina, anexos_pagina = futuro.result()
+                except Exception as e:
+                    falhas += 1
+                    logger.warning(f"Falha ao visitar {url}: {e}")
+                    continue
+                visitadas += 1
+
+                for nome_arquivo, url_anexo in anexos_pagina.items():
+                    if urls_anexos.adicionar(url_anexo):
+                        anexos[_nome_unico(nome_arquivo, url_anexo, anexos)] = url_anexo
+
+                if profundidade >= profundidade_maxima:
+                    continue
+                for link in links_pagina:
+                    if not _dentro_do_escopo(link, prefixos) or not vistas.adicionar(link):
+                        continue
+                    if len(fronteira) >= TAMANHO_FRONTEIRA_CRAWLER:
+                        descartadas += 1
+                        continue
+                    fronteira.append((link, profundidade + 1))
+
+    if not visitadas:
+        logger.error("Nenhuma página pôde ser visitada pelo crawler.")
+        raise Exception(f"Falha ao rastrear as páginas a partir de {url_inicial}")
+
+    logger.info(
+        f"Rastreamento concluído em {time.perf_counter() - inicio:.2f} s: {visitadas} páginas visitadas, "
+        f"{falhas} falhas, {len(vistas)} URLs conhecidas, {len(fronteira)} não visitadas, "
+        f"{descartadas} descartadas por fronteira cheia, {len(anexos)} anexos encontrados"
+    )
+    return anexos
+
+
+def _visitar_pagina(url, anexos_config):
+    """Busca a página e retorna (links absolutos da página, anexos encontrados nela)."""
+    pagina = entrar_site(url)
+    pares = [(urldefrag(urljoin(url, href))[0], texto) for href, texto in iterar_ancoras(pagina)]
+    return [link for link, _ in pares], extrair_links(pares, anexos_config)
+
+
+def _dentro_do_escopo(url, prefixos):
+    partes = urlsplit(url)
+    if partes.scheme not in ("http", "https"):
+        return False
+    if os.path.splitext(partes.path.rstrip("/"))[1].lower() not in EXTENSOES_PAGINA:
+        return False
+    canonica = canonicalizar_url(url)
+    return any(canonica == prefixo or canonica.startswith(prefixo + "/") for prefixo in prefixos)
+
+
+def _nome_unico(nome_arquivo, url, anexos):
+    """Evita colisões entre anexos de mesmo nome vindos de páginas diferentes."""
+    if nome_arquivo not in anexos:
+        return nome_arquivo
+    # O nome vem do conteúdo remoto: sem separadores ('%2F' decodificado) nem '.'/'..'
+    nome_url = Path(unquote(os.path.basename(urlsplit(url).path))).name
+    if not _nome_arquivo_seguro(nome_url):
+        nome_url = nome_arquivo
+    base, extensao = os.path.splitext(nome_url)
+    candidato, contador = nome_url, 2
+    while candidato in anexos:
+        candidato = f"{base}_{contador}{extensao}"
+        contador += 1
+    return candidato
+
+
+def _nome_arquivo_seguro(nome):
+    """Indica se 'nome' pode ser usado como nome de arquivo dentro da pasta de downloads."""
+    return bool(nome) and nome not in (".", "..") and not any(caractere in nome for caractere in "/\\\0")
@@ -0,0 +1,357 @@
+import concurrent.futures
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from compactacao_fluxo import FORMATOS_FLUXO, abrir_escritor_fluxo
+from compressor import registrar_metricas_compactacao
+from config import (
+    PASTA_DOWNLOADS, PASTA_ARQUIVOS, FORMATO_COMPACTACAO, NOME_ARQUIVO_COMPACTADO, SOBRESCREVER_COMPACTACAO,
+    DOWNLOAD_PARALELO, MAX_PARALELO, MAX_TENTATIVAS, REQUEST_TIMEOUT, TAMANHO_CHUNK_DOWNLOAD,
+    MEMORIA_DOWNLOAD_DIRETO, VALIDAR_ARQUIVOS, NOME_MANIFESTO_ARQUIVOS
+)
+from copia_direta import deve_armazenar
+from downloader import DownloadIncompletoError, _tamanho_total
+from limitador import espera_entre_tentativas, limitador_banda, vagas_download
+from logger_config import logger
+from manifesto_compactacao import caminho_manifesto
+from metricas import metricas
+from pipeline import baixar_e_compactar
+from sessao_http import obter_sessao, HEADERS_DOWNLOAD
+from validador import (
+    TAMANHO_CABECALHO, TAMANHO_CAUDA, novo_resultado, verificar_cabecalho, verificar_cauda_pdf,
+    gerar_manifesto_arquivos
+)
+
+
+class ConteudoInvalidoError(requests.exceptions.RequestException):
+    """Indica que o conteúdo recebido não é o arquivo esperado (ex.: página HTML de erro)."""
+
+
+@metricas.medir()
+def baixar_para_compactado(
+        links_arquivos,
+        pasta_destino=PASTA_DOWNLOADS,
+        formato=FORMATO_COMPACTACAO,
+        nome_compactado=NOME_ARQUIVO_COMPACTADO
+):
+    """
+    Baixa os arquivos gravando as respostas diretamente no compactado, sem arquivos intermediários
+    em PASTA_ARQUIVOS: o compactado (montado em um temporário e renomeado ao final) é o único
+    arquivo gravado.
+
+    Os downloads rodam em paralelo, mas só um grava no compactado por vez. Enquanto aguardam,
+    os demais guardam o que recebem em memória, até MEMORIA_DOWNLOAD_DIRETO no total; com o
+    buffer cheio, a leitura da resposta para até chegar a vez. Após uma falha, o download é
+    retomado via Range no ponto onde parou (se o servidor aceitar e informar ETag ou
+    Last-Modified); caso contrário, o membro parcial é descartado do compactado e o download
+    recomeça do início.
+
+    Cada arquivo passa pelas verificações possíveis sobre o fluxo (página HTML no lugar do
+    arquivo, cabeçalho %PDF-, marcador %%EOF e tamanho informado pelo servidor); com
+    VALIDAR_ARQUIVOS, o manifesto dos arquivos entra no compactado.
+
+    O formato 7z não pode ser gravado em fluxo e usa baixar_e_compactar.
+
+    Args:
+        links_arquivos (dict): Dicionário com nomes dos arquivos como chaves e URLs como valores.
+        pasta_destino (str): Pasta onde o arquivo compactado será salvo.
+        formato (str): Formato de compactação. Por padrão: FORMATO_COMPACTACAO.
+        nome_compactado (str): Nome base do arquivo compactado. Por padrão: NOME_ARQUIVO_COMPACTADO.
+
+    Returns:
+        tuple: (lista dos nomes dos arquivos gravados no compactado, caminho do compactado ou None em caso de erro).
+    """
+    if formato not in FORMATOS_FLUXO:
+        logger.warning(
+            f"O formato {formato} não pode ser gravado durante o download; "
+            f"usando o download com compactação em pipeline."
+        )
+        return baixar_e_compactar(
+            links_arquivos, os.path.join(pasta_destino, PASTA_ARQUIVOS), pasta_destino, formato, nome_compactado
+        )
+
+    pasta_destino = Path(pasta_destino).resolve()
+    caminho_completo = pasta_destino / f"{nome_compactado}.{formato}"
+
+    if caminho_completo.exists() and not SOBRESCREVER_COMPACTACAO:
+        logger.info(f"Arquivo {caminho_completo} já existe e não será sobrescrito.")
+        return [], str(caminho_completo)
+
+    workers = max(1, min(MAX_PARALELO, len(links_arquivos))) if DOWNLOAD_PARALELO else 1
+    logger.info(
+        f"Iniciando download de {len(links_arquivos)} arquivos direto para o compactado "
+        f"({formato}, {workers} workers)"
+    )
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+    caminho_temporario = caminho_completo.with_name(f"{caminho_completo.name}.tmp")
+    headers = dict(HEADERS_DOWNLOAD)
+    inicio = time.perf_counter()
+    validos, invalidos = [], []
+
+    try:
+        with abrir_escritor_fluxo(caminho_temporario, formato) as escritor:
+            gravacao = _Gravacao(escritor, formato, workers, pasta_destino)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futuros = [
+                    executor.submit(_baixar_membro_com_vaga, nome, url, gravacao, headers)
+                    for nome, url in links_arquivos.items()
+                ]
+                for futuro in concurrent.futures.as_completed(futuros):
+                    resultado = futuro.result()
+                    (validos if resultado["valido"] else invalidos).append(resultado)
+            if VALIDAR_ARQUIVOS and validos:
+                escritor.adicionar_bytes(NOME_MANIFESTO_ARQUIVOS, gerar_manifesto_arquivos(validos, invalidos))
+    except Exception as e:
+        logger.error(f"Erro ao gravar os downloads no compactado: {e}", exc_info=True)
+        caminho_temporario.unlink(missing_ok=True)
+        return [resultado["arquivo"] for resultado in validos], None
+
+    if invalidos:
+        metricas.incrementar("arquivos_invalidos", len(invalidos))
+    if not validos:
+        logger.warning("Nenhum arquivo foi gravado no compactado.")
+        caminho_temporario.unlink(missing_ok=True)
+        return [], None
+
+    os.replace(caminho_temporario, caminho_completo)
+    # Um manifesto da compactação incremental de execuções anteriores não descreve este compactado
+    caminho_manifesto(caminho_completo).unlink(missing_ok=True)
+    logger.info(
+        f"Arquivo compactado criado com sucesso: {caminho_completo} "
+        f"({len(validos)} arquivos, {time.perf_counter() - inicio:.2f} s)"
+    )
+    registrar_metricas_compactacao(
+        [], caminho_completo, inicio, bytes_entrada=gravacao.bytes_entrada, formato=formato
+    )
+    return [resultado["arquivo"] for resultado in validos], str(caminho_completo)
+
+
+class _Gravacao:
+    """Compactado compartilhado pelos downloads; a 'vez' garante um único membro sendo gravado."""
+
+    def __init__(self, escritor, formato, workers, pasta):
+        self.escritor = escritor
+        self.formato = formato
+        self.pasta = pasta
+        self.vez = threading.Lock()
+        self.limite_buffer = max(TAMANHO_CHUNK_DOWNLOAD, MEMORIA_DOWNLOAD_DIRETO // workers)
+        self.bytes_entrada = 0
+
+
+class _MembroEmAndamento:
+    """
+    Estado do download de um arquivo para o compactado: bytes recebidos, SHA-256, início e fim do
+    conteúdo (para a validação) e o buffer usado enquanto outro download tem a vez de gravar.
+    """
+
+    def __init__(self, nome_arquivo, gravacao):
+        self.gravacao = gravacao
+        self.nome_arquivo = nome_arquivo
+        self._zerar()
+
+    def _zerar(self):
+        self.resultado = novo_resultado(self.nome_arquivo)
+        self.tamanho = None
+        # ETag / Last-Modified enviado em If-Range nas retomadas; None quando não há retomada segura
+        self.validador = None
+        self.recebidos = 0
+        self.sha256 = hashlib.sha256()
+        self.buffer = bytearray()
+        self.cauda = b""
+        self.cabecalho_verificado = False
+        # Arquivo temporário usado quando o TAR exige o tamanho e o servidor não o informou
+        self.spool = None
+        self.gravando = False
+
+    def renomear(self, nome_arquivo):
+        self.nome_arquivo = nome_arquivo
+        self.resultado["arquivo"] = nome_arquivo
+
+    def reiniciar(self):
+        """Descarta o que já foi recebido (e o membro parcial no compactado) para recomeçar do byte 0."""
+        if self.gravando:
+            self.gravando = False
+            try:
+                self.gravacao.escritor.descartar_membro()
+            finally:
+                self.gravacao.vez.release()
+        if self.spool is not None:
+            self.spool.close()
+        self._zerar()
+
+    def receber(self, dados):
+        self.sha256.update(dados)
+        self.recebidos += len(dados)
+        self.cauda = (self.cauda + dados[-TAMANHO_CAUDA:])[-TAMANHO_CAUDA:]
+        if self.gravando:
+            self.gravacao.escritor.escrever(dados)
+            return
+        if self.spool is not None:
+            self.spool.write(dados)
+            return
+
+        self.buffer += dados
+        if not self.cabecalho_verificado:
+            if len(self.buffer) < TAMANHO_CABECALHO:
+                return
+            self._verificar_cabecalho()
+        if self.tamanho is None and self.gravacao.escritor.exige_tamanho:
+            # O membro só pode ser gravado no final; acima do limite, o conteúdo vai para o disco
+            self.spool = tempfile.SpooledTemporaryFile(max_size=self.gravacao.limite_buffer)
+            self.spool.write(self.buffer)
+            self.buffer = bytearray()
+            return
+        # Com o buffer cheio, espera a vez (a leitura da resposta para); senão, só tenta obtê-la
+        if self.gravacao.vez.acquire(blocking=len(self.buffer) >= self.gravacao.limite_buffer):
+            self._abrir_membro()
+
+    def _verificar_cabecalho(self):
+        self.cabecalho_verificado = True
+        verificar_cabecalho(bytes(self.buffer[:TAMANHO_CABECALHO]), self.resultado)
+        if self.resultado["erros"]:
+            raise ConteudoInvalidoError(f"'{self.nome_arquivo}': {'; '.join(self.resultado['erros'])}")
+
+    def _abrir_membro(self):
+        """Com a vez já obtida, inicia o membro e grava o que estava no buffer."""
+        self.gravando = True
+        armazenar = self.gravacao.formato == "zip" and deve_armazenar(self.nome_arquivo, dados=self.buffer)
+        self.gravacao.escritor.iniciar_membro(self.nome_arquivo, self.tamanho, armazenar)
+        self.gravacao.escritor.escrever(self.buffer)
+        self.buffer = bytearray()
+
+    def concluir(self):
+        """
+        Confere o conteúdo recebido e fecha o membro no compactado.
+
+        Returns:
+            dict: Resultado no formato de validador.validar_arquivo.
+        """
+        if self.tamanho is not None and self.recebidos != self.tamanho:
+            raise DownloadIncompletoError(f"Recebidos {self.recebidos} de {self.tamanho} bytes de '{self.nome_arquivo}'")
+        if not self.cabecalho_verificado:
+            self._verificar_cabecalho()
+        if self.resultado["tipo"] == "pdf":
+            verificar_cauda_pdf(self.cauda, self.resultado)
+            if self.resultado["erros"]:
+                raise ConteudoInvalidoError(f"'{self.nome_arquivo}': {'; '.join(self.resultado['erros'])}")
+
+        if not self.gravando:
+            self.gravacao.vez.acquire()
+            self.tamanho = self.recebidos
+            if self.spool is None:
+                self._abrir_membro()
+            else:
+                self.gravando = True
+                self.gravacao.escritor.iniciar_membro(self.nome_arquivo, self.tamanho)
+                self.spool.seek(0)
+                for bloco in iter(lambda: self.spool.read(TAMANHO_CHUNK_DOWNLOAD), b""):
+                    self.gravacao.escritor.escrever(bloco)
+        try:
+            self.gravacao.escritor.concluir_membro()
+            self.gravacao.bytes_entrada += self.recebidos
+            self.gravando = False
+        finally:
+            if not self.gravando:
+                self.gravacao.vez.release()
+
+        self.resultado.update({
+            "tamanho": self.recebidos, "sha256": self.sha256.hexdigest(), "valido": True,
+            # Sem o arquivo completo em disco não há leitura da estrutura do PDF
+            "criptografado": None,
+        })
+        return self.resultado
+
+
+def _baixar_membro_com_vaga(nome_arquivo, url, gravacao, headers):
+    """Executa _baixar_membro ocupando uma vaga do limite global MAX_DOWNLOADS_SIMULTANEOS."""
+    with vagas_download.ocupar():
+        return _baixar_membro(nome_arquivo, url, gravacao, headers)
+
+
+def _baixar_membro(nome_arquivo, url, gravacao, headers):
+    """
+    Baixa um arquivo para o compactado, com tentativas em caso de falha (ver baixar_para_compactado).
+
+    Returns:
+        dict: Resultado da verificação do arquivo; "valido" é False se todas as tentativas falharem.
+    """
+    membro = _MembroEmAndamento(nome_arquivo, gravacao)
+    medicao = {"inicio": time.perf_counter(), "bytes": 0}
+    try:
+        for tentativa in range(1, MAX_TENTATIVAS + 1):
+            try:
+                headers_requisicao = dict(headers)
+                if membro.recebidos:
+                    headers_requisicao["Range"] = f"bytes={membro.recebidos}-"
+                    headers_requisicao["If-Range"] = membro.validador
+                    logger.info(f"Retomando '{membro.nome_arquivo}' a partir do byte {membro.recebidos}")
+
+                logger.info(
+                    f"Baixando '{membro.nome_arquivo}' de {url} para o compactado (tentativa {tentativa}/{MAX_TENTATIVAS})"
+                )
+                with obter_sessao().get(url, headers=headers_requisicao, timeout=REQUEST_TIMEOUT, stream=True) as response:
+                    response.raise_for_status()
+
+                    # O servidor ignorou o Range (ou o arquivo mudou, pelo If-Range): recomeça do início
+                    if membro.recebidos and response.status_code != 206:
+                        logger.info(f"Servidor não retomou '{membro.nome_arquivo}'; reiniciando do byte 0.")
+                        membro.reiniciar()
+
+                    if not membro.recebidos:
+                        _preparar_membro(membro, response)
+
+                    for chunk in response.iter_content(chunk_size=TAMANHO_CHUNK_DOWNLOAD):
+                        if chunk:
+                            membro.receber(chunk)
+                            medicao["bytes"] += len(chunk)
+                            metricas.incrementar("bytes_baixados", len(chunk))
+                            limitador_banda.aguardar(len(chunk))
+
+                resultado = membro.concluir()
+                logger.info(f"Download concluído no compactado: {membro.nome_arquivo} ({membro.recebidos} bytes)")
+                metricas.registrar_download(
+                    membro.nome_arquivo, medicao["bytes"], time.perf_counter() - medicao["inicio"], tentativa,
+                    pasta=gravacao.pasta
+                )
+                return resultado
+
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Erro ao baixar '{membro.nome_arquivo}' (tentativa {tentativa}/{MAX_TENTATIVAS}): {e}")
+                erros = [str(e)]
+                # Sem retomada segura, o membro parcial sai do compactado e libera a vez. Com retomada,
+                # a vez é mantida até a próxima tentativa: o membro precisa continuar contíguo.
+                if isinstance(e, (ConteudoInvalidoError, requests.exceptions.HTTPError)) or membro.validador is None:
+                    membro.reiniciar()
+                if tentativa < MAX_TENTATIVAS:
+                    espera = espera_entre_tentativas(tentativa)
+                    logger.info(f"Aguardando {espera:.1f} segundos antes da próxima tentativa.")
+                    time.sleep(espera)
+
+        logger.error(f"Falha após {MAX_TENTATIVAS} tentativas para '{membro.nome_arquivo}'.")
+        metricas.incrementar("downloads_falhos")
+        resultado = novo_resultado(membro.nome_arquivo)
+        resultado["erros"] = erros
+        return resultado
+    finally:
+        # Garante que um membro inacabado não fique no compactado nem com a vez
+        membro.reiniciar()
+
+
+def _preparar_membro(membro, response):
+    """Na primeira resposta de um arquivo: nome final, tamanho informado e validador para retomadas."""
+    if '.' not in membro.nome_arquivo:
+        content_type = response.headers.get('Content-Type', '')
+        extension = mimetypes.guess_extension(content_type.split(';')[0].strip())
+        if extension:
+            membro.renomear(f"{membro.nome_arquivo}{extension}")
+            logger.info(f"Nome do arquivo atualizado para: {membro.nome_arquivo}")
+    membro.tamanho = _tamanho_total(response)
+    if response.headers.get("Accept-Ranges", "").lower() == "bytes":
+        membro.validador = response.headers.get("ETag") or response.headers.get("Last-Modified")
@@ -1,21 +1,38 @@
 import concurrent.futures
+import json
 import mimetypes
 import os
 import time
 from functools import partial
 from pathlib import Path
 import shutil
+import threading
 import requests
 
 from config import (
-    PASTA_DOWNLOADS, SOBRESCREVER_ARQUIVOS, DELAY_ENTRE_REQUESTS,
+    PASTA_DOWNLOADS, SOBRESCREVER_ARQUIVOS,
     REQUEST_TIMEOUT, DOWNLOAD_PARALELO, PASTA_ARQUIVOS, LIMPAR_PASTA_DOWNLOADS,
-    MAX_PARALELO, MAX_TENTATIVAS, DELAY_ENTRE_TENTATIVAS
+    MAX_PARALELO, MAX_TENTATIVAS, TAMANHO_CHUNK_DOWNLOAD,
+    SEGMENTOS_POR_ARQUIVO, TAMANHO_MINIMO_SEGMENTO, MOTOR_DOWNLOAD, USAR_ARMAZENAMENTO
 )
+from armazenamento import armazenamento
+from limitador import espera_entre_tentativas, limitador_banda, vagas_download
 from logger_config import logger
+from metricas import metricas
+from sessao_http import obter_sessao, HEADERS_DOWNLOAD
 
+# Tamanho anunciado pelo servidor (Content-Length / Content-Range) de cada arquivo concluído, pelo
+# caminho completo; usado pela validação para detectar arquivos truncados
+tamanhos_informados = {}
 
-def baixar_arquivos(links_arquivos, pasta_destino=os.path.join(PASTA_DOWNLOADS, PASTA_ARQUIVOS)):
+
+@metricas.medir()
+def baixar_arquivos(
+        links_arquivos,
+        pasta_destino=os.path.join(PASTA_DOWNLOADS, PASTA_ARQUIVOS),
+        ao_concluir=None,
+        pasta_principal=PASTA_DOWNLOADS
+):
     """
     Função principal que baixa arquivos com base na configuração de paralelismo.
     Se LIMPAR_PASTA_DOWNLOADS for True, apaga o conteúdo da pasta principal (PASTA_DOWNLOADS)
@@ -24,6 +41,9 @@ def baixar_arquivos(links_arquivos, pasta_destino=os.path.join(PASTA_DOWNLOADS,
     Args:
         links_arquivos (dict): Dicionário com nomes dos arquivos como chaves e URLs como valores.
         pasta_destino (str): Pasta onde os arquivos serão salvos.
+        ao_concluir (callable, opcional): Chamada com o caminho de cada arquivo assim que seu
+                                          download termina (usada pelo pipeline de compactação).
+        pasta_principal (str): Pasta apagada com LIMPAR_PASTA_DOWNLOADS. Por padrão: PASTA_DOWNLOADS.
 
     Returns:
         list: Lista com os caminhos dos arquivos baixados.
@@ -31,7 +51,7 @@ def baixar_arquivos(links_arquivos, pasta_destino=os.path.join(PASTA_DOWNLOADS,
     logger.info(f"Iniciando download de {len(links_arquivos)} arquivos.")
 
     # Se LIMPAR_PASTA_DOWNLOADS for True, apaga o conteúdo da pasta principal.
-    main_path = Path(PASTA_DOWNLOADS)
+    main_path = Path(pasta_principal)
     if LIMPAR_PASTA_DOWNLOADS:
         if main_path.exists():
             logger.info(f"Limpando a pasta principal: {main_path.resolve()}")
@@ -43,24 +63,23 @@ def baixar_arquivos(links_arquivos, pasta_destino=os.path.join(PASTA_DOWNLOADS,
     destino.mkdir(parents=True, exist_ok=True)
     logger.debug(f"Diretório de destino: {destino.resolve()}")
 
-    # Headers para simular navegador real
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                      "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Accept": "*/*"
-    }
+    headers = dict(HEADERS_DOWNLOAD)
 
     try:
-        if DOWNLOAD_PARALELO:
-            arquivos_baixados = download_paralelo(links_arquivos, str(destino), headers)
+        if DOWNLOAD_PARALELO and MOTOR_DOWNLOAD == "asyncio":
+            # Importado sob demanda: o motor asyncio depende de um cliente HTTP opcional
+            from downloader_async import baixar_arquivos_async
+            arquivos_baixados = baixar_arquivos_async(links_arquivos, str(destino), headers, ao_concluir)
+        elif DOWNLOAD_PARALELO:
+            arquivos_baixados = download_paralelo(links_arquivos, str(destino), headers, ao_concluir)
         else:
             arquivos_baixados = []
             for nome_arquivo, url in links_arquivos.items():
-                caminho_arquivo = download_individual(nome_arquivo, url, str(destino), headers)
+                caminho_arquivo = _download_com_vaga(nome_arquivo, url, str(destino), headers)
                 if caminho_arquivo:
                     arquivos_baixados.append(caminho_arquivo)
-                time.sleep(DELAY_ENTRE_REQUESTS)
+                    if ao_concluir:
+                        ao_concluir(caminho_arquivo)
 
         logger.info(f"Total de arquivos baixados: {len(arquivos_baixados)}")
         return arquivos_baixados
@@ -70,9 +89,24 @@ def baixar_arquivos(links_arquivos, pasta_destino=os.path.join(PASTA_DOWNLOADS,
         raise Exception(f"Falha ao baixar os arquivos: {e}")
 
 
+class DownloadIncompletoError(requests.exceptions.RequestException):
+    """Indica que a conexão terminou antes de o arquivo ser recebido por completo."""
+
+
+@metricas.medir()
 def download_individual(nome_arquivo, url, pasta_destino, headers):
     """
     Baixa um único arquivo a partir da URL, com tentativas em caso de falha.
+    O conteúdo é gravado em '<nome>.part' e só é renomeado para o nome final quando o tamanho
+    recebido confere com o informado pelo servidor. Após uma falha, a próxima tentativa (ou a
+    próxima execução) retoma o download a partir do ponto onde parou, usando o cabeçalho HTTP
+    Range com If-Range: o ETag / Last-Modified da resposta que originou o '.part' fica ao lado
+    dele, e se o arquivo mudou no servidor (ou não há validador) o download recomeça do byte 0.
+    Se SEGMENTOS_POR_ARQUIVO for maior que 1 e o servidor aceitar Range, arquivos grandes são
+    divididos em segmentos baixados simultaneamente (ver _download_segmentado).
+    Com USAR_ARMAZENAMENTO, a URL é revalidada antes e, se não mudou, o arquivo vem do
+    armazenamento local; cada download concluído é registrado nele com os validadores da
+    resposta que produziu seus bytes.
 
     Args:
         nome_arquivo (str): Nome do arquivo a ser salvo.
@@ -84,19 +118,79 @@ def download_individual(nome_arquivo, url, pasta_destino, headers):
         str: Caminho completo do arquivo baixado ou None em caso de falha.
     """
     destino = Path(pasta_destino)
+    if not _dentro_da_pasta(destino, nome_arquivo):
+        logger.error(f"Nome de arquivo '{nome_arquivo}' sai da pasta de destino {destino}; download ignorado.")
+        metricas.incrementar("downloads_falhos")
+        return None
     caminho_arquivo = destino / nome_arquivo
+    caminho_parcial = _caminho_parcial(caminho_arquivo)
+    medicao = {"inicio": time.perf_counter(), "bytes": 0, "tentativas": 0}
 
-    if caminho_arquivo.exists() and not SOBRESCREVER_ARQUIVOS:
+    validacao = None
+    if USAR_ARMAZENAMENTO:
+        validacao = armazenamento.revalidar(url, headers)
+        if validacao["inalterado"]:
+            return _materializar_armazenado(nome_arquivo, url, destino, validacao, medicao)
+    elif caminho_arquivo.exists() and not SOBRESCREVER_ARQUIVOS:
         logger.info(f"Arquivo '{caminho_arquivo.resolve()}' já existe. Pulando download.")
         return str(caminho_arquivo.resolve())
 
+    # O download segmentado exige o nome final já conhecido (com extensão)
+    tentar_segmentado = SEGMENTOS_POR_ARQUIVO > 1 and '.' in nome_arquivo
+
     for tentativa in range(1, MAX_TENTATIVAS + 1):
+        medicao["tentativas"] = tentativa
         try:
+            inicio, validadores = _preparar_retomada(caminho_parcial)
+
+            if tentar_segmentado and not inicio:
+                segmentacao = _tamanho_para_segmentar(url, headers)
+                if segmentacao:
+                    tamanho_total, validadores = segmentacao
+                    logger.info(f"Baixando '{nome_arquivo}' em segmentos (tentativa {tentativa}/{MAX_TENTATIVAS})")
+                    try:
+                        _download_segmentado(nome_arquivo, url, caminho_arquivo, tamanho_total, headers, validadores)
+                    except requests.exceptions.RequestException:
+                        # Nas próximas tentativas, usa um único fluxo com retomada
+                        tentar_segmentado = False
+                        raise
+                    medicao["bytes"] += tamanho_total
+                    medicao["tamanho_informado"] = tamanho_total
+                    medicao["validadores"] = validadores
+                    return _concluir_download(url, caminho_arquivo, validacao, medicao)
+                tentar_segmentado = False
+
+            headers_requisicao = dict(headers)
+            if inicio:
+                headers_requisicao["Range"] = f"bytes={inicio}-"
+                headers_requisicao["If-Range"] = _cabecalho_if_range(validadores)
+                logger.info(f"Retomando '{nome_arquivo}' a partir do byte {inicio}")
+
             logger.info(f"Baixando '{nome_arquivo}' de {url} (tentativa {tentativa}/{MAX_TENTATIVAS})")
-            response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+            response = obter_sessao().get(url, headers=headers_requisicao, timeout=REQUEST_TIMEOUT, stream=True)
+
+            # 416: o arquivo parcial já pode estar completo, ou é inválido para o servidor
+            if response.status_code == 416 and inicio:
+                tamanho_total = _tamanho_total(response)
+                response.close()
+                if tamanho_total == inicio:
+                    os.replace(caminho_parcial, caminho_arquivo)
+                    _descartar_validadores(caminho_parcial)
+                    medicao["tamanho_informado"] = tamanho_total
+                    medicao["validadores"] = validadores
+                    return _concluir_download(url, caminho_arquivo, validacao, medicao)
+                caminho_parcial.unlink()
+                _descartar_validadores(caminho_parcial)
+                raise DownloadIncompletoError(f"Arquivo parcial de '{nome_arquivo}' inválido; reiniciando download.")
+
             response.raise_for_status()
             logger.debug(f"Status HTTP para '{nome_arquivo}': {response.status_code}")
 
+            # O servidor ignorou o Range (ou o arquivo mudou, pelo If-Range): recomeça do início
+            if inicio and response.status_code != 206:
+                logger.info(f"Servidor não retomou '{nome_arquivo}'; reiniciando do byte 0.")
+                inicio = 0
+
             # Se o nome do arquivo não possui extensão, tenta adivinhar com base no Content-Type.
             if '.' not in nome_arquivo:
                 content_type = response.headers.get('Content-Type', '')
@@ -104,31 +198,344 @@ def download_individual(nome_arquivo, url, pasta_destino, headers):
                 if extension:
                     nome_arquivo = f"{nome_arquivo}{extension}"
                     caminho_arquivo = destino / nome_arquivo
+                    novo_parcial = _caminho_parcial(caminho_arquivo)
+                    _mover_parcial(caminho_parcial, novo_parcial)
+                    caminho_parcial = novo_parcial
                     logger.info(f"Nome do arquivo atualizado para: {nome_arquivo}")
-                    if caminho_arquivo.exists() and not SOBRESCREVER_ARQUIVOS:
+                    if caminho_arquivo.exists() and not SOBRESCREVER_ARQUIVOS and validacao is None:
                         logger.info(f"Arquivo '{caminho_arquivo.resolve()}' já existe. Pulando download.")
+                        response.close()
                         return str(caminho_arquivo.resolve())
 
-            # Salva o arquivo em blocos
-            with open(caminho_arquivo, 'wb') as arquivo:
-                for chunk in response.iter_content(chunk_size=8192):
+            tamanho_total = _tamanho_total(response)
+            medicao["tamanho_informado"] = tamanho_total
+            if not inicio:
+                validadores = _gravar_validadores(caminho_parcial, response.headers)
+            medicao["validadores"] = validadores
+
+            # Salva o arquivo em blocos no arquivo parcial
+            with open(caminho_parcial, 'ab' if inicio else 'wb') as arquivo:
+                for chunk in response.iter_content(chunk_size=TAMANHO_CHUNK_DOWNLOAD):
                     if chunk:
                         arquivo.write(chunk)
+                        medicao["bytes"] += len(chunk)
+                        metricas.incrementar("bytes_baixados", len(chunk))
+                        limitador_banda.aguardar(len(chunk))
 
-            logger.info(f"Download concluído: {caminho_arquivo.resolve()}")
-            return str(caminho_arquivo.resolve())
+            tamanho_recebido = caminho_parcial.stat().st_size
+            if tamanho_total is not None and tamanho_recebido != tamanho_total:
+                raise DownloadIncompletoError(
+                    f"Recebidos {tamanho_recebido} de {tamanho_total} bytes de '{nome_arquivo}'"
+                )
+
+            os.replace(caminho_parcial, caminho_arquivo)
+            _descartar_validadores(caminho_parcial)
+            return _concluir_download(url, caminho_arquivo, validacao, medicao)
 
         except requests.exceptions.RequestException as e:
             logger.warning(f"Erro ao baixar '{nome_arquivo}' (tentativa {tentativa}/{MAX_TENTATIVAS}): {e}")
             if tentativa < MAX_TENTATIVAS:
-                logger.info(f"Aguardando {DELAY_ENTRE_TENTATIVAS} segundos antes da próxima tentativa.")
-                time.sleep(DELAY_ENTRE_TENTATIVAS)
+                espera = espera_entre_tentativas(tentativa)
+                logger.info(f"Aguardando {espera:.1f} segundos antes da próxima tentativa.")
+                time.sleep(espera)
             else:
                 logger.error(f"Falha após {MAX_TENTATIVAS} tentativas para '{nome_arquivo}'.")
+                metricas.incrementar("downloads_falhos")
                 return None
 
 
-def download_paralelo(links_arquivos, pasta_destino, headers):
+def _download_com_vaga(nome_arquivo, url, pasta_destino, headers):
+    """Executa download_individual ocupando uma vaga do limite global MAX_DOWNLOADS_SIMULTANEOS."""
+    with vagas_download.ocupar():
+        return download_individual(nome_arquivo, url, pasta_destino, headers)
+
+
+def _materializar_armazenado(nome_arquivo, url, destino, validacao, medicao):
+    """Liga na pasta de destino o conteúdo armazenado de uma URL que não mudou no servidor."""
+    if '.' not in nome_arquivo:
+        extension = mimetypes.guess_extension((validacao["content_type"] or '').split(';')[0].strip())
+        if extension:
+            nome_arquivo = f"{nome_arquivo}{extension}"
+    caminho = armazenamento.materializar(url, destino / nome_arquivo)
+    if validacao["tamanho"] is not None:
+        tamanhos_informados[caminho] = validacao["tamanho"]
+    logger.info(f"'{nome_arquivo}' não mudou no servidor; usando o armazenamento local: {caminho}")
+    metricas.registrar_download(
+        nome_arquivo, 0, time.perf_counter() - medicao["inicio"], medicao["tentativas"], origem="armazenamento",
+        pasta=destino
+    )
+    return caminho
+
+
+def _concluir_download(url, caminho_arquivo, validacao, medicao):
+    """
+    Registra o arquivo baixado no armazenamento (se ativo), nas métricas e em tamanhos_informados
+    e retorna seu caminho completo.
+    """
+    logger.info(f"Download concluído: {caminho_arquivo.resolve()}")
+    if medicao.get("tamanho_informado") is not None:
+        tamanhos_informados[str(caminho_arquivo.resolve())] = medicao["tamanho_informado"]
+    metricas.registrar_download(
+        caminho_arquivo.name, medicao["bytes"], time.perf_counter() - medicao["inicio"], medicao["tentativas"],
+        pasta=caminho_arquivo.parent
+    )
+    if validacao is not None:
+        try:
+            armazenamento.registrar(url, caminho_arquivo, validacao, medicao["validadores"])
+        except OSError as e:
+            logger.warning(f"Não foi possível guardar '{caminho_arquivo.name}' no armazenamento: {e}")
+    return str(caminho_arquivo.resolve())
+
+
+def _tamanho_para_segmentar(url, headers):
+    """
+    Consulta o servidor (HEAD) para decidir se o arquivo pode ser baixado em segmentos.
+    Os segmentos são buscados com If-Range, por isso o servidor também precisa informar um
+    validador (ETag forte ou Last-Modified) que garanta que todos vêm do mesmo arquivo.
+
+    Returns:
+        tuple: (tamanho do arquivo, validadores), se o servidor anunciar 'Accept-Ranges: bytes' e
+               um validador e o arquivo comportar ao menos dois segmentos de TAMANHO_MINIMO_SEGMENTO;
+               caso contrário, None.
+    """
+    response = obter_sessao().head(url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+    response.close()
+    if not response.ok or response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+        logger.debug(f"Servidor não anuncia suporte a Range para {url}; usando um único fluxo.")
+        return None
+
+    content_length = response.headers.get('Content-Length', '')
+    if not content_length.isdigit() or int(content_length) < 2 * TAMANHO_MINIMO_SEGMENTO:
+        return None
+    validadores = _validadores_resposta(response.headers)
+    if _cabecalho_if_range(validadores) is None:
+        logger.debug(f"Servidor não informa ETag / Last-Modified para {url}; usando um único fluxo.")
+        return None
+    return int(content_length), validadores
+
+
+def _download_segmentado(nome_arquivo, url, caminho_arquivo, tamanho_total, headers, validadores):
+    """
+    Baixa um arquivo dividindo-o em intervalos de bytes buscados simultaneamente.
+    Cada segmento envia If-Range com os validadores do HEAD; se o arquivo mudar no meio do
+    download, o servidor responde 200 e o segmento falha em vez de misturar versões.
+    O arquivo temporário é pré-alocado (esparso) com o tamanho total e cada segmento grava
+    seus blocos diretamente na posição correspondente. Cada segmento faz suas próprias
+    tentativas, retomando do último byte gravado.
+
+    Um arquivo segmentado incompleto contém lacunas e, por isso, usa um nome temporário
+    próprio ('<nome>.segmentos'), que nunca é retomado como um '.part' comum.
+
+    Raises:
+        requests.exceptions.RequestException: Se algum segmento falhar após MAX_TENTATIVAS.
+    """
+    caminho_temporario = caminho_arquivo.with_name(f"{caminho_arquivo.name}.segmentos")
+    num_segmentos = min(SEGMENTOS_POR_ARQUIVO, tamanho_total // TAMANHO_MINIMO_SEGMENTO)
+    tamanho_segmento = -(-tamanho_total // num_segmentos)
+    intervalos = [
+        (inicio, min(inicio + tamanho_segmento, tamanho_total) - 1)
+        for inicio in range(0, tamanho_total, tamanho_segmento)
+    ]
+    logger.info(f"Dividindo '{nome_arquivo}' ({tamanho_total} bytes) em {len(intervalos)} segmentos.")
+
+    with open(caminho_temporario, 'wb') as arquivo:
+        arquivo.truncate(tamanho_total)
+
+    headers_segmentos = dict(headers)
+    headers_segmentos["If-Range"] = _cabecalho_if_range(validadores)
+    gravador = _GravadorPosicional(caminho_temporario)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(intervalos)) as executor:
+            futures = [
+                executor.submit(_baixar_segmento, nome_arquivo, url, gravador, inicio, fim, headers_segmentos)
+                for inicio, fim in intervalos
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+    except Exception:
+        gravador.fechar()
+        caminho_temporario.unlink(missing_ok=True)
+        raise
+    gravador.fechar()
+
+    os.replace(caminho_temporario, caminho_arquivo)
+
+
+def _baixar_segmento(nome_arquivo, url, gravador, inicio, fim, headers):
+    """Baixa o intervalo [inicio, fim] de 'url' e grava no arquivo pela posição absoluta."""
+    posicao = inicio
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        try:
+            headers_requisicao = dict(headers)
+            headers_requisicao["Range"] = f"bytes={posicao}-{fim}"
+            response = obter_sessao().get(url, headers=headers_requisicao, timeout=REQUEST_TIMEOUT, stream=True)
+            response.raise_for_status()
+            if response.status_code != 206:
+                response.close()
+                raise DownloadIncompletoError(
+                    f"Servidor não retomou o segmento {inicio}-{fim} de '{nome_arquivo}' (sem Range ou arquivo alterado)"
+                )
+
+            for chunk in response.iter_content(chunk_size=TAMANHO_CHUNK_DOWNLOAD):
+                if chunk:
+                    gravador.gravar(chunk, posicao)
+                    posicao += len(chunk)
+                    metricas.incrementar("bytes_baixados", len(chunk))
+                    limitador_banda.aguardar(len(chunk))
+
+            if posicao != fim + 1:
+                raise DownloadIncompletoError(
+                    f"Segmento {inicio}-{fim} de '{nome_arquivo}' terminou no byte {posicao}"
+                )
+            logger.debug(f"Segmento {inicio}-{fim} de '{nome_arquivo}' concluído")
+            return
+
+        except requests.exceptions.RequestException as e:
+            logger.warning(
+                f"Erro no segmento {inicio}-{fim} de '{nome_arquivo}' (tentativa {tentativa}/{MAX_TENTATIVAS}): {e}"
+            )
+            if tentativa == MAX_TENTATIVAS:
+                raise
+            time.sleep(espera_entre_tentativas(tentativa))
+
+
+class _GravadorPosicional:
+    """
+    Grava blocos em posições absolutas de um arquivo compartilhado entre threads.
+    Usa os.pwrite quando disponível; em plataformas sem pwrite (Windows), serializa seek + write.
+    """
+
+    def __init__(self, caminho):
+        self._fd = os.open(caminho, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+        self._lock = None if hasattr(os, 'pwrite') else threading.Lock()
+
+    def gravar(self, dados, posicao):
+        if self._lock is None:
+            while dados:
+                escritos = os.pwrite(self._fd, dados, posicao)
+                dados = dados[escritos:]
+                posicao += escritos
+            return
+        with self._lock:
+            os.lseek(self._fd, posicao, os.SEEK_SET)
+            while dados:
+                dados = dados[os.write(self._fd, dados):]
+
+    def fechar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _dentro_da_pasta(destino, nome_arquivo):
+    """Indica se 'destino / nome_arquivo' continua dentro de 'destino' (nomes com '..' ou absolutos não)."""
+    destino = destino.resolve()
+    return destino in (destino / nome_arquivo).resolve().parents
+
+
+def _caminho_parcial(caminho_arquivo):
+    """Retorna o caminho do arquivo temporário usado durante o download."""
+    return caminho_arquivo.with_name(f"{caminho_arquivo.name}.part")
+
+
+def _caminho_validadores(caminho_parcial):
+    """Arquivo ao lado do '.part' com o ETag / Last-Modified da resposta que originou seus bytes."""
+    return caminho_parcial.with_name(f"{caminho_parcial.name}.validador")
+
+
+def _validadores_resposta(headers):
+    """Extrai o ETag e o Last-Modified dos cabeçalhos de uma resposta."""
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+
+def _cabecalho_if_range(validadores):
+    """
+    Valor do cabeçalho If-Range para os validadores de um '.part': o ETag, se for forte (o If-Range
+    não aceita ETag fraco), ou o Last-Modified. Retorna None se nenhum servir.
+    """
+    if not validadores:
+        return None
+    etag = validadores.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validadores.get("last_modified")
+
+
+def _gravar_validadores(caminho_parcial, headers):
+    """
+    Grava ao lado do '.part' os validadores da resposta que começa a preenchê-lo (do byte 0), para
+    que uma retomada posterior só aproveite os bytes se o arquivo não tiver mudado no servidor.
+
+    Returns:
+        dict: Validadores da resposta (ver validadores_resposta).
+    """
+    validadores = _validadores_resposta(headers)
+    caminho = _caminho_validadores(caminho_parcial)
+    if _cabecalho_if_range(validadores) is None:
+        caminho.unlink(missing_ok=True)
+        return validadores
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(validadores, arquivo)
+    return validadores
+
+
+def _preparar_retomada(caminho_parcial):
+    """
+    Decide se um '.part' existente pode ser retomado. Só é retomado se houver um validador
+    gravado (enviado em If-Range); sem ele, não há como saber se os bytes ainda correspondem ao
+    arquivo no servidor, e o parcial é apagado.
+
+    Returns:
+        tuple: (byte a partir do qual retomar, validadores do parcial). (0, None) recomeça do início.
+    """
+    caminho = _caminho_validadores(caminho_parcial)
+    if not caminho_parcial.exists():
+        caminho.unlink(missing_ok=True)
+        return 0, None
+    try:
+        with open(caminho, "r", encoding="utf-8") as arquivo:
+            validadores = json.load(arquivo)
+    except (OSError, ValueError):
+        validadores = None
+    if _cabecalho_if_range(validadores) is None:
+        logger.info(f"'{caminho_parcial.name}' sem validador (ETag / Last-Modified); reiniciando do byte 0.")
+        caminho_parcial.unlink()
+        caminho.unlink(missing_ok=True)
+        return 0, None
+    return caminho_parcial.stat().st_size, validadores
+
+
+def _descartar_validadores(caminho_parcial):
+    """Apaga os validadores de um '.part' já concluído ou descartado."""
+    _caminho_validadores(caminho_parcial).unlink(missing_ok=True)
+
+
+def _mover_parcial(caminho_parcial, novo_parcial):
+    """Renomeia um '.part' (ex.: extensão descoberta pelo Content-Type) junto com seus validadores."""
+    if caminho_parcial.exists():
+        os.replace(caminho_parcial, novo_parcial)
+    if _caminho_validadores(caminho_parcial).exists():
+        os.replace(_caminho_validadores(caminho_parcial), _caminho_validadores(novo_parcial))
+
+
+def _tamanho_total(response):
+    """
+    Obtém o tamanho total do arquivo remoto a partir de Content-Range (respostas 206/416)
+    ou Content-Length (respostas 200). Retorna None se o servidor não informar.
+    """
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+
+    content_length = response.headers.get('Content-Length')
+    if response.status_code == 200 and content_length and content_length.isdigit():
+        return int(content_length)
+    return None
+
+
+def download_paralelo(links_arquivos, pasta_destino, headers, ao_concluir=None):
     """
     Realiza o download em paralelo dos arquivos usando threads.
 
@@ -136,6 +543,7 @@ def download_paralelo(links_arquivos, pasta_destino, headers):
         links_arquivos (dict): Dicionário com nomes e URLs.
         pasta_destino (str): Pasta onde os arquivos serão salvos.
         headers (dict): Cabeçalhos HTTP para a requisição.
+        ao_concluir (callable, opcional): Chamada com o caminho de cada arquivo concluído.
 
     Returns:
         list: Lista com os caminhos completos dos arquivos baixados.
@@ -144,7 +552,7 @@ def download_paralelo(links_arquivos, pasta_destino, headers):
     max_workers = min(MAX_PARALELO, len(links_arquivos))
     logger.info(f"Iniciando downloads em paralelo com {max_workers} workers.")
 
-    download_fn = partial(download_individual, pasta_destino=pasta_destino, headers=headers)
+    download_fn = partial(_download_com_vaga, pasta_destino=pasta_destino, headers=headers)
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_nome = {
@@ -157,6 +565,8 @@ def download_paralelo(links_arquivos, pasta_destino, headers):
                 caminho_arquivo = future.result()
                 if caminho_arquivo:
                     arquivos_baixados.append(caminho_arquivo)
+                    if ao_concluir:
+                        ao_concluir(caminho_arquivo)
             except Exception as e:
                 logger.error(f"Erro no download de '{nome_arquivo}': {e}", exc_info=True)
 
@@ -0,0 +1,256 @@
+import asyncio
+import mimetypes
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from config import (
+    SOBRESCREVER_ARQUIVOS, REQUEST_TIMEOUT, MAX_TENTATIVAS,
+    TAMANHO_CHUNK_DOWNLOAD, CLIENTE_HTTP_ASYNC, MAX_CONCORRENCIA_ASYNC, USAR_ARMAZENAMENTO
+)
+from armazenamento import armazenamento
+from downloader import (
+    DownloadIncompletoError, _caminho_parcial, _tamanho_total, _materializar_armazenado, _concluir_download,
+    _preparar_retomada, _cabecalho_if_range, _gravar_validadores, _descartar_validadores, _mover_parcial,
+    _dentro_da_pasta
+)
+from limitador import limitador, limitador_banda, vagas_download, espera_entre_tentativas
+from logger_config import logger
+from metricas import metricas
+
+
+class _Resposta:
+    """Visão mínima de uma resposta HTTP, comum a todos os clientes assíncronos."""
+
+    def __init__(self, status_code, headers, chunks):
+        self.status_code = status_code
+        self.headers = headers
+        self.chunks = chunks
+
+
+class _ClienteAiohttp:
+    """Cliente HTTP assíncrono baseado em aiohttp."""
+
+    def __init__(self):
+        import aiohttp
+        self._aiohttp = aiohttp
+        self.erros = (aiohttp.ClientError, asyncio.TimeoutError)
+        self._sessao = None
+
+    async def __aenter__(self):
+        timeout = self._aiohttp.ClientTimeout(total=None, sock_connect=REQUEST_TIMEOUT, sock_read=REQUEST_TIMEOUT)
+        connector = self._aiohttp.TCPConnector(limit=MAX_CONCORRENCIA_ASYNC)
+        self._sessao = self._aiohttp.ClientSession(timeout=timeout, connector=connector, auto_decompress=False)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._sessao.close()
+
+    @asynccontextmanager
+    async def get(self, url, headers):
+        async with self._sessao.get(url, headers=headers) as response:
+            yield _Resposta(response.status, response.headers, response.content.iter_chunked(TAMANHO_CHUNK_DOWNLOAD))
+
+
+class _ClienteHttpx:
+    """Cliente HTTP assíncrono baseado em httpx."""
+
+    def __init__(self):
+        import httpx
+        self._httpx = httpx
+        self.erros = (httpx.HTTPError,)
+        self._cliente = None
+
+    async def __aenter__(self):
+        limites = self._httpx.Limits(max_connections=MAX_CONCORRENCIA_ASYNC)
+        self._cliente = self._httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limites, follow_redirects=True)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._cliente.aclose()
+
+    @asynccontextmanager
+    async def get(self, url, headers):
+        async with self._cliente.stream("GET", url, headers=headers) as response:
+            yield _Resposta(response.status_code, response.headers, response.aiter_raw(TAMANHO_CHUNK_DOWNLOAD))
+
+
+# Clientes HTTP disponíveis para o motor asyncio (selecionado por CLIENTE_HTTP_ASYNC)
+CLIENTES_HTTP_ASYNC = {
+    "aiohttp": _ClienteAiohttp,
+    "httpx": _ClienteHttpx,
+}
+
+
+def baixar_arquivos_async(links_arquivos, pasta_destino, headers, ao_concluir=None):
+    """
+    Baixa os arquivos usando o motor asyncio, com concorrência limitada por MAX_CONCORRENCIA_ASYNC.
+    Mesmo contrato de download_paralelo: retorna a lista de caminhos baixados com sucesso.
+
+    Args:
+        links_arquivos (dict): Dicionário com nomes e URLs.
+        pasta_destino (str): Pasta onde os arquivos serão salvos.
+        headers (dict): Cabeçalhos HTTP para a requisição.
+        ao_concluir (callable, opcional): Chamada com o caminho de cada arquivo concluído.
+
+    Returns:
+        list: Lista com os caminhos completos dos arquivos baixados.
+    """
+    if CLIENTE_HTTP_ASYNC not in CLIENTES_HTTP_ASYNC:
+        raise ValueError(
+            f"Cliente HTTP assíncrono não suportado: {CLIENTE_HTTP_ASYNC}. "
+            f"Clientes suportados: {', '.join(CLIENTES_HTTP_ASYNC)}"
+        )
+    return asyncio.run(_baixar_todos(links_arquivos, pasta_destino, headers, ao_concluir))
+
+
+async def _baixar_todos(links_arquivos, pasta_destino, headers, ao_concluir):
+    logger.info(
+        f"Iniciando downloads assíncronos ({CLIENTE_HTTP_ASYNC}) com até {MAX_CONCORRENCIA_ASYNC} simultâneos."
+    )
+    semaforo = asyncio.Semaphore(MAX_CONCORRENCIA_ASYNC)
+
+    async with CLIENTES_HTTP_ASYNC[CLIENTE_HTTP_ASYNC]() as cliente:
+        async def baixar_limitado(nome, url):
+            async with semaforo, vagas_download.ocupar_async():
+                caminho = await download_individual_async(cliente, nome, url, pasta_destino, headers)
+            if caminho and ao_concluir:
+                # Executado fora do loop: o consumidor pode bloquear (fila limitada)
+                await asyncio.to_thread(ao_concluir, caminho)
+            return caminho
+
+        nomes = list(links_arquivos)
+        resultados = await asyncio.gather(
+            *(baixar_limitado(nome, links_arquivos[nome]) for nome in nomes),
+            return_exceptions=True
+        )
+
+    arquivos_baixados = []
+    for nome_arquivo, resultado in zip(nomes, resultados):
+        if isinstance(resultado, BaseException):
+            logger.error(f"Erro no download de '{nome_arquivo}': {resultado}", exc_info=resultado)
+        elif resultado:
+            arquivos_baixados.append(resultado)
+    return arquivos_baixados
+
+
+@metricas.medir()
+async def download_individual_async(cliente, nome_arquivo, url, pasta_destino, headers):
+    """
+    Versão assíncrona de download_individual: grava em '<nome>.part', retoma com Range e
+    If-Range após falhas e aguarda entre tentativas sem bloquear o loop de eventos.
+
+    Returns:
+        str: Caminho completo do arquivo baixado ou None em caso de falha.
+    """
+    destino = Path(pasta_destino)
+    if not _dentro_da_pasta(destino, nome_arquivo):
+        logger.error(f"Nome de arquivo '{nome_arquivo}' sai da pasta de destino {destino}; download ignorado.")
+        metricas.incrementar("downloads_falhos")
+        return None
+    caminho_arquivo = destino / nome_arquivo
+    caminho_parcial = _caminho_parcial(caminho_arquivo)
+    medicao = {"inicio": time.perf_counter(), "bytes": 0, "tentativas": 0}
+
+    validacao = None
+    if USAR_ARMAZENAMENTO:
+        # O armazenamento usa a sessão requests e o disco; roda fora do loop de eventos
+        validacao = await asyncio.to_thread(armazenamento.revalidar, url, headers)
+        if validacao["inalterado"]:
+            return await asyncio.to_thread(_materializar_armazenado, nome_arquivo, url, destino, validacao, medicao)
+    elif caminho_arquivo.exists() and not SOBRESCREVER_ARQUIVOS:
+        logger.info(f"Arquivo '{caminho_arquivo.resolve()}' já existe. Pulando download.")
+        return str(caminho_arquivo.resolve())
+
+    erros_recuperaveis = cliente.erros + (DownloadIncompletoError,)
+
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        medicao["tentativas"] = tentativa
+        try:
+            inicio, validadores = _preparar_retomada(caminho_parcial)
+            headers_requisicao = dict(headers)
+            if inicio:
+                headers_requisicao["Range"] = f"bytes={inicio}-"
+                headers_requisicao["If-Range"] = _cabecalho_if_range(validadores)
+                logger.info(f"Retomando '{nome_arquivo}' a partir do byte {inicio}")
+
+            logger.info(f"Baixando '{nome_arquivo}' de {url} (tentativa {tentativa}/{MAX_TENTATIVAS})")
+            # O cliente asyncio não passa pela sessão requests: o limitador é consultado diretamente
+            await asyncio.sleep(limitador.tempo_espera(url))
+            async with cliente.get(url, headers_requisicao) as response:
+                limitador.registrar_resposta(url, response.status_code, response.headers.get("Retry-After"))
+                if response.status_code == 416 and inicio:
+                    if _tamanho_total(response) == inicio:
+                        os.replace(caminho_parcial, caminho_arquivo)
+                        _descartar_validadores(caminho_parcial)
+                        medicao["tamanho_informado"] = inicio
+                        medicao["validadores"] = validadores
+                        return await asyncio.to_thread(_concluir_download, url, caminho_arquivo, validacao, medicao)
+                    caminho_parcial.unlink()
+                    _descartar_validadores(caminho_parcial)
+                    raise DownloadIncompletoError(f"Arquivo parcial de '{nome_arquivo}' inválido; reiniciando download.")
+
+                if response.status_code >= 400:
+                    raise DownloadIncompletoError(f"HTTP {response.status_code} ao baixar '{nome_arquivo}'")
+
+                # O servidor ignorou o Range (ou o arquivo mudou, pelo If-Range): recomeça do início
+                if inicio and response.status_code != 206:
+                    logger.info(f"Servidor não retomou '{nome_arquivo}'; reiniciando do byte 0.")
+                    inicio = 0
+
+                # Se o nome do arquivo não possui extensão, tenta adivinhar com base no Content-Type.
+                if '.' not in nome_arquivo:
+                    content_type = response.headers.get('Content-Type', '')
+                    extension = mimetypes.guess_extension(content_type.split(';')[0].strip())
+                    if extension:
+                        nome_arquivo = f"{nome_arquivo}{extension}"
+                        caminho_arquivo = destino / nome_arquivo
+                        novo_parcial = _caminho_parcial(caminho_arquivo)
+                        _mover_parcial(caminho_parcial, novo_parcial)
+                        caminho_parcial = novo_parcial
+                        logger.info(f"Nome do arquivo atualizado para: {nome_arquivo}")
+                        if caminho_arquivo.exists() and not SOBRESCREVER_ARQUIVOS and validacao is None:
+                            logger.info(f"Arquivo '{caminho_arquivo.resolve()}' já existe. Pulando download.")
+                            return str(caminho_arquivo.resolve())
+
+                tamanho_total = _tamanho_total(response)
+                medicao["tamanho_informado"] = tamanho_total
+                if not inicio:
+                    validadores = _gravar_validadores(caminho_parcial, response.headers)
+                medicao["validadores"] = validadores
+
+                # Blocos de TAMANHO_CHUNK_DOWNLOAD gravados diretamente: a escrita vai para o cache
+                # de páginas do sistema e é curta comparada à espera pela rede.
+                with open(caminho_parcial, 'ab' if inicio else 'wb') as arquivo:
+                    async for chunk in response.chunks:
+                        if chunk:
+                            arquivo.write(chunk)
+                            medicao["bytes"] += len(chunk)
+                            metricas.incrementar("bytes_baixados", len(chunk))
+                            espera = limitador_banda.tempo_espera(len(chunk))
+                            if espera > 0:
+                                await asyncio.sleep(espera)
+
+            tamanho_recebido = caminho_parcial.stat().st_size
+            if tamanho_total is not None and tamanho_recebido != tamanho_total:
+                raise DownloadIncompletoError(
+                    f"Recebidos {tamanho_recebido} de {tamanho_total} bytes de '{nome_arquivo}'"
+                )
+
+            os.replace(caminho_parcial, caminho_arquivo)
+            _descartar_validadores(caminho_parcial)
+            return await asyncio.to_thread(_concluir_download, url, caminho_arquivo, validacao, medicao)
+
+        except erros_recuperaveis as e:
+            if isinstance(e, cliente.erros):
+                limitador.registrar_falha(url)
+            logger.warning(f"Erro ao baixar '{nome_arquivo}' (tentativa {tentativa}/{MAX_TENTATIVAS}): {e}")
+            if tentativa < MAX_TENTATIVAS:
+                espera = espera_entre_tentativas(tentativa)
+                logger.info(f"Aguardando {espera:.1f} segundos antes da próxima tentativa.")
+                await asyncio.sleep(espera)
+            else:
+                logger.error(f"Falha após {MAX_TENTATIVAS} tentativas para '{nome_arquivo}'.")
+                metricas.incrementar("downloads_falhos")
+                return None
@@ -1,46 +1,144 @@
+import re
+
 from logger_config import logger
-from config import ANEXOS_CONFIG
+from metricas import metricas
+from config import ANEXOS_CONFIG, REGRA_PRIORIDADE_LINKS
+
+# Regras aceitas para escolher entre vários links que correspondem ao mesmo anexo
+REGRAS_PRIORIDADE = ["primeiro", "ultimo", "texto"]
+
+
+class ClassificadorLinks:
+    """
+    Versão compilada de ANEXOS_CONFIG para classificar links em uma única passada.
+
+    Todos os padrões são combinados em uma expressão regular usada como pré-filtro: a grande
+    maioria dos links de uma página não contém nenhum padrão e é descartada com uma única busca
+    no texto e uma na URL. Só os links aprovados no pré-filtro são testados contra as expressões
+    de cada anexo.
+    """
+
+    def __init__(self, anexos_config=ANEXOS_CONFIG, regra_prioridade=REGRA_PRIORIDADE_LINKS):
+        todos_padroes = {padrao for config in anexos_config.values() for padrao in config["patterns"]}
+        self._extensoes = tuple({config["required_extension"] for config in anexos_config.values()})
+        self._prefiltro_texto = _compilar_padroes(todos_padroes)
+        self._prefiltro_url = _compilar_padroes(todos_padroes, prefixo="[/_]")
+
+        self.anexos = []
+        for nome_arquivo, config in anexos_config.items():
+            regra = config.get("prioridade", regra_prioridade)
+            if regra not in REGRAS_PRIORIDADE:
+                raise ValueError(
+                    f"Regra de prioridade inválida para {nome_arquivo}: {regra}. "
+                    f"Regras suportadas: {', '.join(REGRAS_PRIORIDADE)}"
+                )
+            self.anexos.append((
+                nome_arquivo,
+                config["required_extension"],
+                _compilar_padroes(config["patterns"]),
+                _compilar_padroes(config["patterns"], prefixo="[/_]"),
+                regra,
+            ))
+
+    def classificar(self, url, texto):
+        """
+        Retorna os anexos aos quais o link corresponde.
+
+        Args:
+            url (str): Endereço do link (href).
+            texto (str): Texto do link, já em minúsculas e sem espaços nas pontas.
+
+        Returns:
+            list: Tuplas (nome_arquivo, encontrado_pelo_texto) na ordem de ANEXOS_CONFIG.
+        """
+        url_minuscula = url.lower()
+        if not url_minuscula.endswith(self._extensoes):
+            return []
 
+        casou_texto = self._prefiltro_texto.search(texto) is not None
+        casou_url = self._prefiltro_url.search(url_minuscula) is not None
+        if not (casou_texto or casou_url):
+            return []
 
-def extrair_links(html_soup):
+        correspondencias = []
+        for nome_arquivo, extensao, regex_texto, regex_url, _ in self.anexos:
+            if not url_minuscula.endswith(extensao):
+                continue
+            pelo_texto = casou_texto and regex_texto.search(texto) is not None
+            if pelo_texto or (casou_url and regex_url.search(url_minuscula) is not None):
+                correspondencias.append((nome_arquivo, pelo_texto))
+        return correspondencias
+
+
+def _compilar_padroes(padroes, prefixo=""):
+    if not padroes:
+        return re.compile(r"(?!)")
+    # Padrões mais longos primeiro, para que a alternância prefira a correspondência mais específica
+    alternancia = "|".join(re.escape(padrao) for padrao in sorted(padroes, key=len, reverse=True))
+    return re.compile(f"{prefixo}(?:{alternancia})")
+
+
+def iterar_ancoras(html_soup):
+    """
+    Percorre os links da página, produzindo pares (href, texto em minúsculas).
+
+    Args:
+        html_soup (BeautifulSoup | list): Objeto BeautifulSoup contendo o HTML da página, ou lista
+            de pares (href, texto) já extraídos pelo parser incremental.
+    """
+    if not hasattr(html_soup, "find_all"):
+        yield from html_soup
+        return
+    for link in html_soup.find_all('a'):
+        url = link.get('href')
+        if url:
+            yield url, link.get_text().lower().strip()
+
+
+@metricas.medir()
+def extrair_links(html_soup, anexos_config=ANEXOS_CONFIG):
     """
     Extrai os links dos anexos I e II a partir do HTML da página da ANS.
+    Quando mais de um link corresponde ao mesmo anexo, a escolha segue REGRA_PRIORIDADE_LINKS
+    (ou a chave "prioridade" do anexo em ANEXOS_CONFIG):
+        - "primeiro": o primeiro link da página (padrão)
+        - "ultimo": o último link da página
+        - "texto": links cujo texto contém o padrão têm preferência sobre os que casam só pela URL
 
     Args:
-        html_soup (BeautifulSoup): Objeto BeautifulSoup contendo o HTML da página.
+        html_soup (BeautifulSoup | list): Objeto BeautifulSoup ou pares (href, texto) da página.
+        anexos_config (dict): Configuração dos anexos. Por padrão: ANEXOS_CONFIG.
 
     Returns:
         dict: Dicionário com os nomes dos arquivos como chaves e URLs como valores.
     """
     logger.info("Iniciando extração dos links dos anexos")
-    links_anexos = {}
     try:
-        todos_links = html_soup.find_all('a')
+        classificador = ClassificadorLinks(anexos_config)
+        regras = {nome: regra for nome, _, _, _, regra in classificador.anexos}
+        # Para cada anexo: (prioridade, url); prioridades maiores substituem as menores
+        escolhidos = {}
 
-        for link in todos_links:
-            url = link.get('href')
-            texto = link.get_text().lower().strip()
+        for posicao, (url, texto) in enumerate(iterar_ancoras(html_soup)):
+            for nome_arquivo, pelo_texto in classificador.classificar(url, texto):
+                regra = regras[nome_arquivo]
+                if regra == "primeiro":
+                    if nome_arquivo in escolhidos:
+                        continue
+                    prioridade = 0
+                elif regra == "ultimo":
+                    prioridade = posicao
+                else:
+                    prioridade = 1 if pelo_texto else 0
 
-            if not url or url in links_anexos:
-                continue
+                if nome_arquivo not in escolhidos or prioridade > escolhidos[nome_arquivo][0]:
+                    escolhidos[nome_arquivo] = (prioridade, url)
 
-            # Iterar sobre a configuração de anexos
-            for nome_arquivo, config in ANEXOS_CONFIG.items():
-                # Verificar se o link já foi encontrado
-                if nome_arquivo in links_anexos:
-                    # Já encontramos este anexo, pular
-                    continue
-
-                # Verificar se a URL termina com a extensão correta
-                if not url.lower().endswith(config["required_extension"]):
-                    continue
-
-                # Verificar os patterns exatos
-                for pattern in config["patterns"]:
-                    if (pattern in texto) or (f"/{pattern}" in url.lower()) or (f"_{pattern}" in url.lower()):
-                        links_anexos[nome_arquivo] = url
-                        logger.info(f"Encontrado link do {nome_arquivo}: {url}")
-                        break
+        links_anexos = {}
+        for nome_arquivo, _, _, _, _ in classificador.anexos:
+            if nome_arquivo in escolhidos:
+                links_anexos[nome_arquivo] = escolhidos[nome_arquivo][1]
+                logger.info(f"Encontrado link do {nome_arquivo}: {links_anexos[nome_arquivo]}")
 
         if not links_anexos:
             logger.warning("Não foram encontrados links para os anexos")
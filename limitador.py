@@ -0,0 +1,250 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from config import (
+    TAXA_INICIAL_REQUISICOES, TAXA_MINIMA_REQUISICOES, TAXA_MAXIMA_REQUISICOES, RAJADA_REQUISICOES,
+    INCREMENTO_TAXA, FATOR_REDUCAO_TAXA, BACKOFF_BASE_TENTATIVAS, BACKOFF_MAXIMO_TENTATIVAS,
+    BANDA_MAXIMA_DOWNLOAD, MAX_DOWNLOADS_SIMULTANEOS
+)
+from logger_config import logger
+from metricas import metricas
+
+# Respostas que indicam sobrecarga do servidor e reduzem a taxa do host
+STATUS_SOBRECARGA = (429, 503)
+
+
+class _BaldeHost:
+    """Estado do balde de fichas de um host."""
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.fichas = float(capacidade)
+        self.ultimo = time.monotonic()
+
+
+class LimitadorTaxa:
+    """
+    Limitador de taxa por host, compartilhado pelo conector, pelo crawler e pelos downloaders.
+
+    Cada host tem um balde de fichas (token bucket) com até RAJADA_REQUISICOES fichas, reabastecido
+    a 'taxa' fichas por segundo. A taxa se adapta às respostas (AIMD): cresce INCREMENTO_TAXA a cada
+    resposta bem-sucedida, até TAXA_MAXIMA_REQUISICOES, e é multiplicada por FATOR_REDUCAO_TAXA em
+    respostas 429/503 e falhas de conexão, até TAXA_MINIMA_REQUISICOES. Um cabeçalho Retry-After
+    bloqueia o host pelo tempo indicado.
+    """
+
+    def __init__(
+            self,
+            taxa_inicial=TAXA_INICIAL_REQUISICOES,
+            taxa_minima=TAXA_MINIMA_REQUISICOES,
+            taxa_maxima=TAXA_MAXIMA_REQUISICOES,
+            capacidade=RAJADA_REQUISICOES
+    ):
+        self.taxa_inicial = taxa_inicial
+        self.taxa_minima = taxa_minima
+        self.taxa_maxima = taxa_maxima
+        self.capacidade = capacidade
+        self._baldes = {}
+        self._lock = threading.Lock()
+        self.tempo_espera_total = 0.0
+        self.reducoes = 0
+
+    def _balde(self, url):
+        host = urlsplit(url).netloc.lower()
+        balde = self._baldes.get(host)
+        if balde is None:
+            balde = self._baldes[host] = _BaldeHost(self.taxa_inicial, self.capacidade)
+        return balde
+
+    def tempo_espera(self, url):
+        """
+        Reserva uma ficha para uma requisição a 'url' e retorna quanto tempo (em segundos) é preciso
+        aguardar antes de enviá-la. Não bloqueia, para poder ser usado também no motor asyncio.
+        """
+        with self._lock:
+            balde = self._balde(url)
+            agora = time.monotonic()
+            if agora > balde.ultimo:
+                balde.fichas = min(self.capacidade, balde.fichas + (agora - balde.ultimo) * balde.taxa)
+                balde.ultimo = agora
+            balde.fichas -= 1
+            # 'ultimo' fica no futuro enquanto o host está bloqueado por Retry-After ou backoff
+            espera = max(0.0, balde.ultimo - agora) + max(0.0, -balde.fichas / balde.taxa)
+            self.tempo_espera_total += espera
+        if espera > 0:
+            metricas.incrementar("espera_limitador_segundos", espera)
+        return espera
+
+    def aguardar(self, url):
+        """Bloqueia até que uma requisição a 'url' seja permitida."""
+        espera = self.tempo_espera(url)
+        if espera > 0:
+            time.sleep(espera)
+
+    def registrar_resposta(self, url, status_code, retry_after=None):
+        """Ajusta a taxa do host conforme o status da resposta e o cabeçalho Retry-After."""
+        if status_code in STATUS_SOBRECARGA:
+            self._reduzir(url, f"HTTP {status_code}", _segundos_retry_after(retry_after))
+        elif status_code < 400:
+            with self._lock:
+                balde = self._balde(url)
+                balde.taxa = min(self.taxa_maxima, balde.taxa + INCREMENTO_TAXA)
+
+    def registrar_falha(self, url):
+        """Trata uma falha de conexão ou timeout como sinal de sobrecarga do host."""
+        self._reduzir(url, "falha de conexão")
+
+    def _reduzir(self, url, motivo, bloqueio=None):
+        with self._lock:
+            balde = self._balde(url)
+            balde.taxa = max(self.taxa_minima, balde.taxa * FATOR_REDUCAO_TAXA)
+            # Descarta a rajada acumulada e bloqueia o host pelo Retry-After ou por um intervalo da nova taxa
+            balde.fichas = min(balde.fichas, 0.0)
+            bloqueio = bloqueio if bloqueio is not None else 1 / balde.taxa
+            balde.ultimo = max(balde.ultimo, time.monotonic() + bloqueio)
+            self.reducoes += 1
+            taxa = balde.taxa
+        metricas.incrementar("reducoes_taxa")
+        logger.warning(
+            f"{motivo} em {urlsplit(url).netloc}: taxa reduzida para {taxa:.2f} req/s, "
+            f"host bloqueado por {bloqueio:.1f} s"
+        )
+
+    def taxas(self):
+        """Retorna a taxa atual (req/s) de cada host."""
+        with self._lock:
+            return {host: balde.taxa for host, balde in self._baldes.items()}
+
+    def registrar_estatisticas(self):
+        """Registra no log a taxa final por host e o tempo total de espera imposto pelo limitador."""
+        for host, taxa in self.taxas().items():
+            logger.info(f"Limitador de taxa para {host}: {taxa:.2f} req/s ao final")
+        logger.info(
+            f"Limitador de taxa: {self.tempo_espera_total:.2f} s de espera acumulada, {self.reducoes} redução(ões)"
+        )
+
+
+class LimitadorBanda:
+    """
+    Limite global de banda dos downloads, somando todas as conexões do processo.
+
+    Balde de fichas em bytes, reabastecido a 'taxa' bytes por segundo, com capacidade de um
+    segundo de transferência. Um bloco maior que as fichas disponíveis deixa o saldo negativo:
+    quem o recebeu (e quem vier depois) aguarda até a dívida ser paga, de modo que a média fica
+    na taxa mesmo com blocos grandes. Com taxa None, não limita.
+    """
+
+    def __init__(self, taxa=BANDA_MAXIMA_DOWNLOAD):
+        self._lock = threading.Lock()
+        self.tempo_espera_total = 0.0
+        self.definir_taxa(taxa)
+
+    def definir_taxa(self, taxa):
+        """Altera o limite (em bytes por segundo; None desativa)."""
+        with self._lock:
+            self.taxa = taxa
+            self._fichas = float(taxa or 0)
+            self._ultimo = time.monotonic()
+
+    def tempo_espera(self, quantidade):
+        """
+        Desconta 'quantidade' bytes já recebidos e retorna quanto tempo (em segundos) é preciso
+        aguardar antes de continuar lendo. Não bloqueia, para poder ser usado também no motor asyncio.
+        """
+        if not self.taxa:
+            return 0.0
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.taxa, self._fichas + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            self._fichas -= quantidade
+            espera = max(0.0, -self._fichas / self.taxa)
+            self.tempo_espera_total += espera
+        if espera > 0:
+            metricas.incrementar("espera_banda_segundos", espera)
+        return espera
+
+    def aguardar(self, quantidade):
+        """Desconta 'quantidade' bytes e bloqueia enquanto a banda estiver acima do limite."""
+        espera = self.tempo_espera(quantidade)
+        if espera > 0:
+            time.sleep(espera)
+
+
+class VagasDownload:
+    """
+    Limite global de arquivos sendo baixados ao mesmo tempo no processo, somado sobre todos os
+    downloaders (threads, asyncio, download direto para o compactado) e todos os alvos de um lote.
+    Cada arquivo ocupa uma vaga, mesmo quando baixado em vários segmentos. Com limite None, não limita.
+    """
+
+    # Intervalo entre verificações de vaga livre no motor asyncio (em segundos)
+    INTERVALO_ASYNC = 0.05
+
+    def __init__(self, limite=MAX_DOWNLOADS_SIMULTANEOS):
+        self.definir_limite(limite)
+
+    def definir_limite(self, limite):
+        """Altera o limite; downloads em andamento liberam a vaga do limite em que entraram."""
+        self.limite = limite
+        self._semaforo = threading.BoundedSemaphore(limite) if limite else None
+
+    @contextlib.contextmanager
+    def ocupar(self):
+        semaforo = self._semaforo
+        if semaforo is None:
+            yield
+            return
+        semaforo.acquire()
+        try:
+            yield
+        finally:
+            semaforo.release()
+
+    @contextlib.asynccontextmanager
+    async def ocupar_async(self):
+        """Versão para o motor asyncio: aguarda a vaga sem bloquear o loop de eventos."""
+        semaforo = self._semaforo
+        if semaforo is None:
+            yield
+            return
+        while not semaforo.acquire(blocking=False):
+            await asyncio.sleep(self.INTERVALO_ASYNC)
+        try:
+            yield
+        finally:
+            semaforo.release()
+
+
+def espera_entre_tentativas(tentativa):
+    """
+    Backoff exponencial com jitter completo: um valor aleatório entre 0 e
+    BACKOFF_BASE_TENTATIVAS * 2^(tentativa - 1), limitado a BACKOFF_MAXIMO_TENTATIVAS.
+    """
+    espera = random.uniform(0, min(BACKOFF_MAXIMO_TENTATIVAS, BACKOFF_BASE_TENTATIVAS * 2 ** (tentativa - 1)))
+    metricas.incrementar("tentativas_repetidas")
+    metricas.incrementar("espera_tentativas_segundos", espera)
+    return espera
+
+
+def _segundos_retry_after(valor):
+    """Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos; None se ausente ou inválido."""
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+limitador = LimitadorTaxa()
+limitador_banda = LimitadorBanda()
+vagas_download = VagasDownload()
@@ -0,0 +1,293 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from compressor import SUPPORTED_FORMATS
+from config import (
+    ANEXOS_CONFIG, REGRA_PRIORIDADE_LINKS, PASTA_DOWNLOADS, FORMATO_COMPACTACAO, NOME_ARQUIVO_COMPACTADO,
+    MODO_CRAWLER, PROFUNDIDADE_MAXIMA_CRAWLER, MAX_PAGINAS_CRAWLER, MAX_ALVOS_SIMULTANEOS,
+    CAMINHO_RELATORIO_LOTE, CAMINHO_METRICAS_PROMETHEUS
+)
+from crawler import rastrear_anexos
+from extractor import REGRAS_PRIORIDADE
+from limitador import limitador, limitador_banda, vagas_download
+from logger_config import logger
+from metricas import metricas
+from scraper import baixar_validar_compactar
+from sessao_http import registrar_estatisticas_conexoes, estatisticas_conexoes
+from siteConnector import obter_links_site
+
+# Chaves aceitas em cada alvo do manifesto (e no bloco "padrao", aplicado a todos os alvos)
+CHAVES_ALVO = [
+    "nome", "url", "anexos", "regra_prioridade", "pasta", "formato", "nome_compactado",
+    "crawler", "prefixos", "profundidade_maxima", "max_paginas"
+]
+
+# Chaves aceitas no nível principal do manifesto
+CHAVES_MANIFESTO = ["alvos", "padrao", "max_alvos_simultaneos", "max_downloads_simultaneos", "banda_maxima"]
+
+
+def carregar_manifesto_lote(caminho):
+    """
+    Lê e valida um manifesto de lote em JSON ou YAML (pela extensão .yaml / .yml; requer o PyYAML,
+    instalado à parte).
+
+    Formato:
+        {
+            "max_alvos_simultaneos": 4,          # opcional; padrão MAX_ALVOS_SIMULTANEOS
+            "max_downloads_simultaneos": 8,      # opcional; padrão MAX_DOWNLOADS_SIMULTANEOS
+            "banda_maxima": 10485760,            # opcional, em bytes/s; padrão BANDA_MAXIMA_DOWNLOAD
+            "padrao": {"formato": "tar.gz"},     # opcional; valores aplicados a todos os alvos
+            "alvos": [
+                {
+                    "nome": "rol",               # obrigatório e único
+                    "url": "https://...",        # obrigatório: página inicial do alvo
+                    "anexos": {...},             # mesmo formato de ANEXOS_CONFIG; padrão ANEXOS_CONFIG
+                    "regra_prioridade": "texto", # padrão REGRA_PRIORIDADE_LINKS
+                    "pasta": "downloads/rol",    # padrão PASTA_DOWNLOADS/<nome>; sem aninhar com outro alvo
+                    "formato": "zip",            # padrão FORMATO_COMPACTACAO
+                    "nome_compactado": "anexos", # padrão NOME_ARQUIVO_COMPACTADO
+                    "crawler": false,            # padrão MODO_CRAWLER
+                    "prefixos": ["https://..."], # crawler: padrão [url]
+                    "profundidade_maxima": 2,    # crawler: padrão PROFUNDIDADE_MAXIMA_CRAWLER
+                    "max_paginas": 100           # crawler: padrão MAX_PAGINAS_CRAWLER
+                }
+            ]
+        }
+
+    Returns:
+        dict: Manifesto com os alvos completos (todas as chaves de CHAVES_ALVO preenchidas).
+
+    Raises:
+        ValueError: Se o manifesto for inválido.
+    """
+    caminho = Path(caminho)
+    texto = caminho.read_text(encoding="utf-8")
+    if caminho.suffix.lower() in (".yaml", ".yml"):
+        try:
+            # Importado sob demanda: o PyYAML só é necessário para manifestos em YAML
+            import yaml
+        except ImportError:
+            logger.error("Manifesto em YAML requer o PyYAML (pip install pyyaml); use JSON ou instale o pacote.")
+            raise
+        dados = yaml.safe_load(texto)
+    else:
+        dados = json.loads(texto)
+
+    if not isinstance(dados, dict):
+        raise ValueError("O manifesto deve ser um objeto com a lista 'alvos'.")
+    _verificar_chaves(dados, CHAVES_MANIFESTO, "manifesto")
+    alvos = dados.get("alvos")
+    if not isinstance(alvos, list) or not alvos:
+        raise ValueError("O manifesto deve ter uma lista 'alvos' não vazia.")
+    padrao = dados.get("padrao") or {}
+    _verificar_chaves(padrao, CHAVES_ALVO, "padrao")
+
+    manifesto = {
+        "max_alvos_simultaneos": _inteiro_positivo(dados, "max_alvos_simultaneos", MAX_ALVOS_SIMULTANEOS),
+        "max_downloads_simultaneos": _inteiro_positivo(dados, "max_downloads_simultaneos", vagas_download.limite),
+        "banda_maxima": _inteiro_positivo(dados, "banda_maxima", limitador_banda.taxa),
+        "alvos": [],
+    }
+    nomes, pastas = set(), set()
+    for posicao, alvo in enumerate(alvos, 1):
+        if not isinstance(alvo, dict):
+            raise ValueError(f"Alvo {posicao} do manifesto não é um objeto.")
+        alvo = _completar_alvo({**padrao, **alvo}, posicao)
+        if alvo["nome"] in nomes:
+            raise ValueError(f"Nome de alvo repetido no manifesto: {alvo['nome']}")
+        pasta = Path(alvo["pasta"]).resolve()
+        if pasta in pastas:
+            raise ValueError(f"Pasta repetida no manifesto (alvo {alvo['nome']}): {pasta}")
+        # Os alvos rodam ao mesmo tempo: com LIMPAR_PASTA_DOWNLOADS, limpar uma pasta que contém a de
+        # outro alvo apagaria os arquivos em andamento dele
+        for outra in pastas:
+            if outra in pasta.parents or pasta in outra.parents:
+                raise ValueError(
+                    f"Pasta do alvo {alvo['nome']} ({pasta}) está dentro da pasta de outro alvo, ou a contém: {outra}"
+                )
+        nomes.add(alvo["nome"])
+        pastas.add(pasta)
+        manifesto["alvos"].append(alvo)
+    return manifesto
+
+
+def _completar_alvo(alvo, posicao):
+    """Valida um alvo e preenche as chaves ausentes com os padrões de config.py."""
+    _verificar_chaves(alvo, CHAVES_ALVO, f"alvo {posicao}")
+    nome = alvo.get("nome")
+    if not isinstance(nome, str) or not nome.strip() or Path(nome).name != nome:
+        raise ValueError(f"Alvo {posicao}: 'nome' é obrigatório e não pode conter separadores de pasta.")
+    url = alvo.get("url")
+    if not isinstance(url, str) or urlsplit(url).scheme not in ("http", "https"):
+        raise ValueError(f"Alvo {nome}: 'url' deve ser um endereço http(s).")
+
+    formato = alvo.get("formato", FORMATO_COMPACTACAO)
+    if formato not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Alvo {nome}: formato de compactação não suportado: {formato}. "
+            f"Formatos suportados: {', '.join(SUPPORTED_FORMATS)}"
+        )
+    regra = alvo.get("regra_prioridade", REGRA_PRIORIDADE_LINKS)
+    if regra not in REGRAS_PRIORIDADE:
+        raise ValueError(
+            f"Alvo {nome}: regra de prioridade inválida: {regra}. Regras suportadas: {', '.join(REGRAS_PRIORIDADE)}"
+        )
+    if not isinstance(alvo.get("pasta", ""), str) or not isinstance(alvo.get("nome_compactado", ""), str):
+        raise ValueError(f"Alvo {nome}: 'pasta' e 'nome_compactado' devem ser textos.")
+    if not isinstance(alvo.get("prefixos", []), list):
+        raise ValueError(f"Alvo {nome}: 'prefixos' deve ser uma lista de endereços.")
+    anexos = alvo.get("anexos", ANEXOS_CONFIG)
+    if not isinstance(anexos, dict) or not anexos:
+        raise ValueError(f"Alvo {nome}: 'anexos' deve ser um objeto no formato de ANEXOS_CONFIG.")
+    for nome_arquivo, config in anexos.items():
+        if (not isinstance(config, dict) or not isinstance(config.get("patterns"), list)
+                or not isinstance(config.get("required_extension"), str)):
+            raise ValueError(f"Alvo {nome}: anexo {nome_arquivo} precisa de 'patterns' (lista) e 'required_extension'.")
+
+    return {
+        "nome": nome,
+        "url": url,
+        # A regra do alvo vale para os anexos que não definem a própria "prioridade"
+        "anexos": {nome_arquivo: {"prioridade": regra, **config} for nome_arquivo, config in anexos.items()},
+        "regra_prioridade": regra,
+        "pasta": alvo.get("pasta", os.path.join(PASTA_DOWNLOADS, nome)),
+        "formato": formato,
+        "nome_compactado": alvo.get("nome_compactado", NOME_ARQUIVO_COMPACTADO),
+        "crawler": bool(alvo.get("crawler", MODO_CRAWLER)),
+        "prefixos": alvo.get("prefixos", [url]),
+        "profundidade_maxima": _inteiro_positivo(alvo, "profundidade_maxima", PROFUNDIDADE_MAXIMA_CRAWLER, minimo=0),
+        "max_paginas": _inteiro_positivo(alvo, "max_paginas", MAX_PAGINAS_CRAWLER),
+    }
+
+
+def _verificar_chaves(dados, aceitas, onde):
+    desconhecidas = sorted(set(dados) - set(aceitas))
+    if desconhecidas:
+        raise ValueError(f"Chave(s) desconhecida(s) em {onde}: {', '.join(desconhecidas)}")
+
+
+def _inteiro_positivo(dados, chave, padrao, minimo=1):
+    if chave not in dados:
+        return padrao
+    valor = dados[chave]
+    if valor is not None and (not isinstance(valor, int) or isinstance(valor, bool) or valor < minimo):
+        raise ValueError(f"'{chave}' deve ser um inteiro maior ou igual a {minimo}: {valor!r}")
+    return valor
+
+
+def executar_alvo(alvo):
+    """
+    Executa o fluxo completo de um alvo: busca dos links (página ou crawler), download, validação
+    e compactação, com a pasta, os anexos e o compactado do próprio alvo. Os erros são registrados
+    no resultado, sem interromper os demais alvos do lote.
+
+    Returns:
+        dict: Resultado do alvo, com o campo "status" ("sucesso", "sem_arquivos" ou "erro: <mensagem>").
+    """
+    nome = alvo["nome"]
+    inicio = time.perf_counter()
+    resultado = {"nome": nome, "url": alvo["url"], "links": 0, "arquivos": [], "compactado": None}
+    logger.info(f"[{nome}] Iniciando alvo {alvo['url']}")
+    try:
+        if alvo["crawler"]:
+            links = rastrear_anexos(
+                alvo["url"], alvo["prefixos"], alvo["profundidade_maxima"], alvo["max_paginas"], alvo["anexos"]
+            )
+        else:
+            links = obter_links_site(alvo["url"], alvo["anexos"])
+        resultado["links"] = len(links)
+        arquivos, compactado = baixar_validar_compactar(
+            links, alvo["pasta"], alvo["formato"], alvo["nome_compactado"]
+        ) if links else ([], None)
+        resultado["arquivos"] = [Path(arquivo).name for arquivo in arquivos]
+        resultado["compactado"] = compactado
+        resultado["status"] = "sucesso" if arquivos and compactado else "sem_arquivos"
+    except Exception as e:
+        logger.error(f"[{nome}] Erro na execução do alvo: {e}")
+        resultado["status"] = f"erro: {e}"
+    resultado["duracao_s"] = time.perf_counter() - inicio
+    logger.info(f"[{nome}] Alvo concluído ({resultado['status']}) em {resultado['duracao_s']:.2f} s")
+    return resultado
+
+
+def executar_lote(manifesto, caminho_relatorio=CAMINHO_RELATORIO_LOTE):
+    """
+    Executa os alvos do manifesto (ver carregar_manifesto_lote) em paralelo, até
+    max_alvos_simultaneos de cada vez, no mesmo processo.
+
+    Todos os alvos compartilham a sessão HTTP (conexões keep-alive e limitador de taxa por host),
+    os pools de validação e de compactação, o cache da página e o armazenamento de downloads. O
+    orçamento global de downloads (max_downloads_simultaneos e banda_maxima do manifesto) vale para
+    a soma dos alvos e é restaurado ao final.
+
+    Returns:
+        dict: Relatório de métricas do lote, com o resultado de cada alvo em "alvos" e o campo
+        "status" ("sucesso" se todos os alvos tiveram sucesso, "parcial" ou "falha").
+    """
+    metricas.reiniciar()
+    alvos = manifesto["alvos"]
+    for alvo in alvos:
+        # Arquivos de mesmo nome em alvos diferentes ficam em entradas separadas das métricas
+        metricas.associar_alvo(alvo["nome"], alvo["pasta"])
+    banda_anterior, limite_anterior = limitador_banda.taxa, vagas_download.limite
+    limitador_banda.definir_taxa(manifesto["banda_maxima"])
+    vagas_download.definir_limite(manifesto["max_downloads_simultaneos"])
+    logger.info(
+        f"Iniciando lote com {len(alvos)} alvo(s): até {manifesto['max_alvos_simultaneos']} simultâneos, "
+        f"downloads simultâneos {manifesto['max_downloads_simultaneos'] or 'sem limite'}, "
+        f"banda {manifesto['banda_maxima'] or 'sem limite'}"
+        + (" bytes/s" if manifesto["banda_maxima"] else "")
+    )
+    try:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(manifesto["max_alvos_simultaneos"], len(alvos)), thread_name_prefix="alvo"
+        ) as executor:
+            resultados = list(executor.map(executar_alvo, alvos))
+    finally:
+        limitador_banda.definir_taxa(banda_anterior)
+        vagas_download.definir_limite(limite_anterior)
+
+    sucessos = sum(resultado["status"] == "sucesso" for resultado in resultados)
+    status = "sucesso" if sucessos == len(resultados) else "parcial" if sucessos else "falha"
+    logger.info(f"Lote concluído ({status}): {sucessos} de {len(resultados)} alvo(s) com sucesso")
+    registrar_estatisticas_conexoes()
+    limitador.registrar_estatisticas()
+
+    extras = {
+        "status": status,
+        "alvos": resultados,
+        "conexoes": estatisticas_conexoes(),
+        "taxas_limitador": limitador.taxas(),
+        "espera_banda_s": limitador_banda.tempo_espera_total,
+    }
+    if caminho_relatorio:
+        try:
+            return metricas.salvar_relatorio(caminho_relatorio, CAMINHO_METRICAS_PROMETHEUS, extras=extras)
+        except OSError as e:
+            logger.error(f"Não foi possível salvar o relatório do lote: {e}")
+    return metricas.relatorio(extras)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa vários alvos de scraping descritos em um manifesto JSON/YAML.")
+    parser.add_argument("manifesto", help="Caminho do manifesto (.json, .yaml ou .yml)")
+    parser.add_argument("--relatorio", default=CAMINHO_RELATORIO_LOTE, help="Caminho do relatório JSON do lote")
+    args = parser.parse_args()
+
+    try:
+        manifesto = carregar_manifesto_lote(args.manifesto)
+    except Exception as e:
+        logger.critical(f"Não foi possível carregar o manifesto {args.manifesto}: {e}")
+        sys.exit(2)
+    relatorio = executar_lote(manifesto, args.relatorio)
+    sys.exit(0 if relatorio["status"] == "sucesso" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from logger_config import logger
+
+# Tamanho dos blocos lidos ao calcular o SHA-256 dos arquivos
+_TAMANHO_LEITURA_HASH = 1024 * 1024
+
+
+def caminho_manifesto(caminho_compactado):
+    """Retorna o caminho do manifesto gravado ao lado do arquivo compactado."""
+    caminho_compactado = Path(caminho_compactado)
+    return caminho_compactado.with_name(f"{caminho_compactado.name}.manifest.json")
+
+
+def carregar_manifesto(caminho_compactado):
+    """
+    Lê o manifesto associado a um arquivo compactado.
+
+    Returns:
+        dict: Manifesto no formato {"formato": str, "arquivos": {arcname: {...}}}, ou None se não existir.
+    """
+    caminho = caminho_manifesto(caminho_compactado)
+    if not caminho.exists():
+        return None
+    try:
+        with open(caminho, "r", encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Manifesto inválido em {caminho}: {e}")
+        return None
+
+
+def salvar_manifesto(caminho_compactado, manifesto):
+    """Grava o manifesto ao lado do arquivo compactado."""
+    caminho = caminho_manifesto(caminho_compactado)
+    temporario = caminho.with_name(f"{caminho.name}.tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def gerar_manifesto(arquivos, pasta_origem, formato, anterior=None):
+    """
+    Monta o manifesto (caminho relativo, tamanho, mtime e SHA-256) dos arquivos a compactar.
+    O SHA-256 só é recalculado quando tamanho ou mtime diferem do manifesto anterior.
+
+    Args:
+        arquivos (list): Caminhos dos arquivos.
+        pasta_origem (str | Path): Pasta base para os caminhos relativos.
+        formato (str): Formato de compactação.
+        anterior (dict, opcional): Manifesto da execução anterior.
+
+    Returns:
+        dict: Novo manifesto.
+    """
+    pasta_origem = Path(pasta_origem)
+    entradas_anteriores = (anterior or {}).get("arquivos", {})
+    entradas = {}
+    for arquivo in arquivos:
+        caminho = Path(arquivo)
+        arcname = caminho.relative_to(pasta_origem).as_posix()
+        stat = caminho.stat()
+        entrada_anterior = entradas_anteriores.get(arcname)
+        if (entrada_anterior and entrada_anterior["tamanho"] == stat.st_size
+                and entrada_anterior["mtime_ns"] == stat.st_mtime_ns):
+            sha256 = entrada_anterior["sha256"]
+        else:
+            sha256 = _sha256_arquivo(caminho)
+        entradas[arcname] = {"tamanho": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    return {"formato": formato, "arquivos": entradas}
+
+
+def membros_inalterados(anterior, atual):
+    """
+    Retorna o conjunto de caminhos relativos cujo conteúdo (SHA-256) não mudou entre os manifestos.
+    """
+    if not anterior or anterior.get("formato") != atual.get("formato"):
+        return set()
+    antigos = anterior.get("arquivos", {})
+    return {
+        arcname for arcname, entrada in atual["arquivos"].items()
+        if arcname in antigos and antigos[arcname]["sha256"] == entrada["sha256"]
+    }
+
+
+def manifestos_equivalentes(anterior, atual):
+    """True se os dois manifestos descrevem o mesmo formato e o mesmo conjunto de conteúdos."""
+    if not anterior:
+        return False
+    return set(anterior.get("arquivos", {})) == set(atual["arquivos"]) and \
+        membros_inalterados(anterior, atual) == set(atual["arquivos"])
+
+
+def _sha256_arquivo(caminho):
+    sha256 = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(_TAMANHO_LEITURA_HASH), b""):
+            sha256.update(bloco)
+    return sha256.hexdigest()
@@ -0,0 +1,261 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from logger_config import logger
+
+# Prefixo dos nomes das métricas no formato texto do Prometheus
+PREFIXO_PROMETHEUS = "scraper"
+
+
+class Metricas:
+    """
+    Coletor de métricas de uma execução: tempo de parede e de CPU por etapa, contadores
+    (bytes, tentativas, esperas), throughput por arquivo e taxa de compressão.
+
+    O tempo de CPU é o do processo (time.process_time) durante a etapa, incluindo as threads de
+    trabalho que ela dispara; etapas simultâneas (pipeline, downloads paralelos) contam o mesmo
+    tempo de CPU mais de uma vez.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Descarta tudo o que foi coletado e recomeça a contagem do tempo total."""
+        with self._lock:
+            self.inicio = time.time()
+            self._inicio_relogio = time.perf_counter()
+            self.etapas = {}
+            self.contadores = {}
+            self.downloads = {}
+            self.compactacoes = []
+            self._pastas_alvos = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        """Mede o tempo de parede e de CPU do bloco e acumula na etapa 'nome'."""
+        inicio_parede = time.perf_counter()
+        inicio_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            parede = time.perf_counter() - inicio_parede
+            cpu = time.process_time() - inicio_cpu
+            with self._lock:
+                dados = self.etapas.setdefault(
+                    nome, {"chamadas": 0, "tempo_parede_s": 0.0, "tempo_cpu_s": 0.0, "tempo_parede_max_s": 0.0}
+                )
+                dados["chamadas"] += 1
+                dados["tempo_parede_s"] += parede
+                dados["tempo_cpu_s"] += cpu
+                dados["tempo_parede_max_s"] = max(dados["tempo_parede_max_s"], parede)
+
+    def medir(self, nome=None):
+        """Decorador que mede cada chamada da função (síncrona ou assíncrona) como uma etapa."""
+        def decorador(funcao):
+            nome_etapa = nome or funcao.__name__
+
+            if inspect.iscoroutinefunction(funcao):
+                @functools.wraps(funcao)
+                async def envoltorio_async(*args, **kwargs):
+                    with self.etapa(nome_etapa):
+                        return await funcao(*args, **kwargs)
+                return envoltorio_async
+
+            @functools.wraps(funcao)
+            def envoltorio(*args, **kwargs):
+                with self.etapa(nome_etapa):
+                    return funcao(*args, **kwargs)
+            return envoltorio
+        return decorador
+
+    def incrementar(self, nome, valor=1):
+        """Soma 'valor' ao contador 'nome'."""
+        with self._lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    def associar_alvo(self, nome_alvo, pasta):
+        """
+        Associa a pasta de um alvo do lote ao seu nome: downloads gravados nela (ou em subpastas)
+        passam a ser registrados como '<alvo>/<arquivo>', sem colidir com arquivos de mesmo nome
+        de outros alvos executados ao mesmo tempo.
+        """
+        with self._lock:
+            self._pastas_alvos[Path(pasta).resolve()] = nome_alvo
+
+    def registrar_download(self, nome_arquivo, bytes_transferidos, segundos, tentativas, origem="rede", pasta=None):
+        """
+        Registra o resultado do download de um arquivo.
+
+        Args:
+            nome_arquivo (str): Nome do arquivo.
+            bytes_transferidos (int): Bytes recebidos pela rede nesta execução.
+            segundos (float): Duração do download, incluindo tentativas e esperas.
+            tentativas (int): Número de tentativas usadas.
+            origem (str): "rede" ou "armazenamento" (conteúdo reaproveitado sem download).
+            pasta (str, opcional): Pasta de destino do download, usada para identificar o alvo (ver associar_alvo).
+        """
+        with self._lock:
+            alvo = self._alvo_da_pasta(pasta)
+            dados = {
+                "bytes": bytes_transferidos,
+                "segundos": segundos,
+                "mb_por_segundo": _mb_por_segundo(bytes_transferidos, segundos),
+                "tentativas": tentativas,
+                "origem": origem,
+            }
+            if alvo is None:
+                self.downloads[nome_arquivo] = dados
+            else:
+                self.downloads[f"{alvo}/{nome_arquivo}"] = {"alvo": alvo, "arquivo": nome_arquivo, **dados}
+
+    def _alvo_da_pasta(self, pasta):
+        if pasta is None or not self._pastas_alvos:
+            return None
+        pasta = Path(pasta).resolve()
+        for candidata in (pasta, *pasta.parents):
+            if candidata in self._pastas_alvos:
+                return self._pastas_alvos[candidata]
+        return None
+
+    def registrar_compactacao(self, formato, bytes_entrada, bytes_saida, segundos, pasta=None):
+        """
+        Registra uma compactação: tamanhos de entrada e saída e duração. 'pasta' (onde o compactado
+        foi gravado) identifica o alvo do lote, como em registrar_download.
+        """
+        with self._lock:
+            alvo = self._alvo_da_pasta(pasta)
+            dados = {"alvo": alvo} if alvo is not None else {}
+            dados.update({
+                "formato": formato,
+                "bytes_entrada": bytes_entrada,
+                "bytes_saida": bytes_saida,
+                "razao": bytes_saida / bytes_entrada if bytes_entrada else None,
+                "segundos": segundos,
+                "mb_por_segundo": _mb_por_segundo(bytes_entrada, segundos),
+            })
+            self.compactacoes.append(dados)
+
+    def relatorio(self, extras=None):
+        """
+        Monta o relatório da execução.
+
+        Args:
+            extras (dict, opcional): Informações adicionais incluídas no relatório (ex.: conexões).
+
+        Returns:
+            dict: Relatório serializável em JSON.
+        """
+        with self._lock:
+            relatorio = {
+                "inicio": self.inicio,
+                "duracao_s": time.perf_counter() - self._inicio_relogio,
+                "etapas": {nome: dict(dados) for nome, dados in self.etapas.items()},
+                "contadores": dict(self.contadores),
+                "downloads": {nome: dict(dados) for nome, dados in self.downloads.items()},
+                "compactacoes": [dict(dados) for dados in self.compactacoes],
+            }
+        relatorio.update(extras or {})
+        return relatorio
+
+    def formato_prometheus(self, relatorio=None):
+        """Converte o relatório para o formato texto do Prometheus (ex.: textfile collector do node_exporter)."""
+        relatorio = relatorio or self.relatorio()
+        linhas = []
+
+        def metrica(nome, descricao, amostras):
+            nome = f"{PREFIXO_PROMETHEUS}_{nome}"
+            linhas.append(f"# HELP {nome} {descricao}")
+            linhas.append(f"# TYPE {nome} gauge")
+            for rotulos, valor in amostras:
+                if valor is None:
+                    continue
+                texto_rotulos = ",".join(f'{chave}="{_escapar_rotulo(v)}"' for chave, v in rotulos.items())
+                linhas.append(f"{nome}{{{texto_rotulos}}} {valor}" if texto_rotulos else f"{nome} {valor}")
+
+        metrica("duracao_segundos", "Duração total da execução", [({}, relatorio["duracao_s"])])
+        etapas = relatorio["etapas"]
+        for campo, nome_metrica, descricao in (
+                ("chamadas", "chamadas", "Número de chamadas da etapa"),
+                ("tempo_parede_s", "tempo_parede_segundos", "Tempo de parede acumulado da etapa"),
+                ("tempo_cpu_s", "tempo_cpu_segundos", "Tempo de CPU do processo durante a etapa"),
+                ("tempo_parede_max_s", "tempo_parede_max_segundos", "Maior tempo de parede de uma chamada da etapa"),
+        ):
+            metrica(
+                f"etapa_{nome_metrica}", descricao,
+                [({"etapa": nome}, dados[campo]) for nome, dados in etapas.items()]
+            )
+        for nome, valor in relatorio["contadores"].items():
+            metrica(nome, f"Contador {nome}", [({}, valor)])
+        downloads = relatorio["downloads"]
+        for campo, descricao in (
+                ("bytes", "Bytes recebidos pela rede por arquivo"),
+                ("segundos", "Duração do download por arquivo (s)"),
+                ("mb_por_segundo", "Throughput do download por arquivo (MB/s)"),
+                ("tentativas", "Tentativas usadas por arquivo"),
+        ):
+            metrica(
+                f"download_{campo}", descricao,
+                [(_rotulos_download(nome, dados), dados[campo]) for nome, dados in downloads.items()]
+            )
+        compactacoes = relatorio["compactacoes"]
+        for campo, descricao in (
+                ("bytes_entrada", "Bytes de entrada da compactação"),
+                ("bytes_saida", "Bytes do arquivo compactado"),
+                ("razao", "Razão entre os tamanhos compactado e original"),
+                ("mb_por_segundo", "Velocidade da compactação (MB/s de entrada)"),
+        ):
+            metrica(
+                f"compactacao_{campo}", descricao,
+                [(_rotulos_compactacao(dados), dados[campo]) for dados in compactacoes]
+            )
+        return "\n".join(linhas) + "\n"
+
+    def salvar_relatorio(self, caminho_json, caminho_prometheus=None, extras=None):
+        """Grava o relatório em JSON e, opcionalmente, no formato texto do Prometheus."""
+        relatorio = self.relatorio(extras)
+        _gravar_atomico(caminho_json, json.dumps(relatorio, ensure_ascii=False, indent=2))
+        logger.info(f"Relatório de métricas salvo em {Path(caminho_json).resolve()}")
+        if caminho_prometheus:
+            _gravar_atomico(caminho_prometheus, self.formato_prometheus(relatorio))
+            logger.info(f"Métricas no formato Prometheus salvas em {Path(caminho_prometheus).resolve()}")
+        return relatorio
+
+
+def _mb_por_segundo(quantidade_bytes, segundos):
+    return quantidade_bytes / (1024 * 1024) / segundos if segundos > 0 else None
+
+
+def _rotulos_download(nome, dados):
+    if "alvo" in dados:
+        return {"alvo": dados["alvo"], "arquivo": dados["arquivo"], "origem": dados["origem"]}
+    return {"arquivo": nome, "origem": dados["origem"]}
+
+
+def _rotulos_compactacao(dados):
+    if "alvo" in dados:
+        return {"alvo": dados["alvo"], "formato": dados["formato"]}
+    return {"formato": dados["formato"]}
+
+
+def _escapar_rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _gravar_atomico(caminho, conteudo):
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(f"{caminho.name}.tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+metricas = Metricas()
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from compressor import SUPPORTED_FORMATS, abrir_escritor, registrar_metricas_compactacao
+from config import (
+    PASTA_DOWNLOADS, PASTA_ARQUIVOS, PASTA_INVALIDOS, FORMATO_COMPACTACAO, NOME_ARQUIVO_COMPACTADO,
+    SOBRESCREVER_COMPACTACAO, TAMANHO_FILA_COMPACTACAO, VALIDAR_ARQUIVOS, NOME_MANIFESTO_ARQUIVOS
+)
+from downloader import baixar_arquivos, tamanhos_informados
+from logger_config import logger
+from metricas import metricas
+from validador import submeter_validacao, validar_downloads
+
+
+@metricas.medir()
+def baixar_e_compactar(
+        links_arquivos,
+        pasta_arquivos=os.path.join(PASTA_DOWNLOADS, PASTA_ARQUIVOS),
+        pasta_destino=PASTA_DOWNLOADS,
+        formato=FORMATO_COMPACTACAO,
+        nome_compactado=NOME_ARQUIVO_COMPACTADO
+):
+    """
+    Baixa os arquivos e os adiciona ao arquivo compactado à medida que cada download termina.
+    Os caminhos concluídos passam por uma fila limitada (TAMANHO_FILA_COMPACTACAO) até uma thread
+    de compactação, de modo que a compactação ocorre em paralelo com os downloads restantes.
+
+    Diferente de compactar_arquivos, somente os arquivos desta execução entram no compactado.
+    Com VALIDAR_ARQUIVOS, cada arquivo é enviado ao pool de validação assim que baixado e só entra
+    no compactado se for válido; os inválidos baixados de novo e o manifesto dos arquivos entram
+    no final.
+
+    Args:
+        links_arquivos (dict): Dicionário com nomes dos arquivos como chaves e URLs como valores.
+        pasta_arquivos (str): Pasta onde os arquivos serão salvos.
+        pasta_destino (str): Pasta onde o arquivo compactado será salvo.
+        formato (str): Formato de compactação. Por padrão: FORMATO_COMPACTACAO.
+        nome_compactado (str): Nome base do arquivo compactado. Por padrão: NOME_ARQUIVO_COMPACTADO.
+
+    Returns:
+        tuple: (lista de arquivos baixados, caminho do arquivo compactado ou None em caso de erro).
+    """
+    if formato not in SUPPORTED_FORMATS:
+        logger.error(
+            f"Formato de compactação não suportado: {formato}. "
+            f"Formatos suportados: {', '.join(SUPPORTED_FORMATS)}"
+        )
+        return baixar_arquivos(links_arquivos, pasta_arquivos, pasta_principal=pasta_destino), None
+
+    pasta_destino = Path(pasta_destino).resolve()
+    caminho_completo = pasta_destino / f"{nome_compactado}.{formato}"
+
+    if caminho_completo.exists() and not SOBRESCREVER_COMPACTACAO:
+        logger.info(f"Arquivo {caminho_completo} já existe e não será sobrescrito.")
+        return baixar_arquivos(links_arquivos, pasta_arquivos, pasta_principal=pasta_destino), str(caminho_completo)
+
+    # O compactado é montado em um arquivo temporário e só substitui o final se tudo der certo
+    caminho_temporario = caminho_completo.with_name(f"{caminho_completo.name}.tmp")
+    fila = queue.Queue(maxsize=TAMANHO_FILA_COMPACTACAO)
+    estado = {"adicionados": [], "erro": None}
+    validacoes = {}
+
+    def compactar_da_fila():
+        escritor = None
+        pasta_base = Path(pasta_arquivos).resolve()
+        while True:
+            item = fila.get()
+            if item is None:
+                break
+            # Após um erro, continua consumindo para não bloquear os downloads
+            if estado["erro"] is not None:
+                continue
+            caminho, validacao = item
+            try:
+                # A validação roda no pool de processos; aqui só se espera pelo resultado
+                if validacao is not None and not validacao.result()["valido"]:
+                    continue
+                # Aberto só no primeiro arquivo, depois de uma eventual limpeza de PASTA_DOWNLOADS
+                if escritor is None:
+                    pasta_destino.mkdir(parents=True, exist_ok=True)
+                    escritor = abrir_escritor(caminho_temporario, formato)
+                caminho = Path(caminho).resolve()
+                escritor.adicionar(caminho, caminho.relative_to(pasta_base))
+                estado["adicionados"].append(caminho)
+            except Exception as e:
+                estado["erro"] = e
+
+        if escritor is not None:
+            try:
+                escritor.fechar()
+            except Exception as e:
+                estado["erro"] = estado["erro"] or e
+
+    logger.info(f"Iniciando download com compactação em pipeline ({formato})")
+    inicio = time.perf_counter()
+    consumidor = threading.Thread(target=compactar_da_fila, name="compactacao", daemon=True)
+    consumidor.start()
+
+    def ao_concluir(caminho):
+        validacao = None
+        if VALIDAR_ARQUIVOS:
+            validacao = validacoes[caminho] = submeter_validacao(caminho, tamanhos_informados.get(caminho))
+        fila.put((caminho, validacao))
+
+    try:
+        arquivos_baixados = baixar_arquivos(
+            links_arquivos, pasta_arquivos, ao_concluir=ao_concluir, pasta_principal=pasta_destino
+        )
+        if VALIDAR_ARQUIVOS:
+            # Os inválidos são baixados de novo aqui; os que passarem e o manifesto entram no final
+            resultados = {caminho: validacao.result() for caminho, validacao in validacoes.items()}
+            validos = validar_downloads(
+                links_arquivos, arquivos_baixados, pasta_arquivos, resultados, pasta_destino / PASTA_INVALIDOS
+            )
+            for caminho in validos:
+                if not resultados.get(caminho, {}).get("valido"):
+                    fila.put((caminho, None))
+            fila.put((str(Path(pasta_arquivos, NOME_MANIFESTO_ARQUIVOS).resolve()), None))
+            arquivos_baixados = validos
+    finally:
+        fila.put(None)
+        consumidor.join()
+
+    if estado["erro"] is not None:
+        logger.error(f"Erro ao compactar arquivos no pipeline: {estado['erro']}", exc_info=estado["erro"])
+        caminho_temporario.unlink(missing_ok=True)
+        return arquivos_baixados, None
+
+    if not estado["adicionados"]:
+        logger.warning("Nenhum arquivo foi adicionado ao compactado.")
+        caminho_temporario.unlink(missing_ok=True)
+        return arquivos_baixados, None
+
+    os.replace(caminho_temporario, caminho_completo)
+    logger.info(
+        f"Arquivo compactado criado com sucesso: {caminho_completo} "
+        f"({len(estado['adicionados'])} arquivos, {time.perf_counter() - inicio:.2f} s)"
+    )
+    # No pipeline a duração inclui os downloads, que acontecem ao mesmo tempo que a compactação
+    registrar_metricas_compactacao(estado["adicionados"], caminho_completo, inicio, formato=formato)
+    return arquivos_baixados, str(caminho_completo)
@@ -1,21 +1,104 @@
+import os
 import sys
+import time
 
 from compressor import compactar_arquivos
+from config import (
+    PIPELINE_COMPACTACAO, MODO_CRAWLER, SALVAR_RELATORIO_METRICAS, CAMINHO_RELATORIO_METRICAS,
+    CAMINHO_METRICAS_PROMETHEUS, VALIDAR_ARQUIVOS, DOWNLOAD_DIRETO_COMPACTADO, PASTA_DOWNLOADS,
+    PASTA_ARQUIVOS, PASTA_INVALIDOS, FORMATO_COMPACTACAO, NOME_ARQUIVO_COMPACTADO
+)
+from crawler import rastrear_anexos
+from download_compactado import baixar_para_compactado
 from downloader import baixar_arquivos
-from extractor import extrair_links
+from limitador import limitador
 from logger_config import logger
-from siteConnector import entrar_site
+from metricas import metricas
+from pipeline import baixar_e_compactar
+from sessao_http import registrar_estatisticas_conexoes, estatisticas_conexoes
+from siteConnector import obter_links_site
+from validador import validar_downloads
 
-# Em scraper.py - adicionar try/except na execução principal
-if __name__ == "__main__":
+
+def baixar_validar_compactar(
+        links,
+        pasta_downloads=PASTA_DOWNLOADS,
+        formato=FORMATO_COMPACTACAO,
+        nome_compactado=NOME_ARQUIVO_COMPACTADO
+):
+    """
+    Baixa, valida e compacta os arquivos de 'links' no modo configurado: direto para o compactado
+    (DOWNLOAD_DIRETO_COMPACTADO), em pipeline (PIPELINE_COMPACTACAO) ou em etapas sequenciais.
+
+    Args:
+        links (dict): Dicionário com nomes dos arquivos como chaves e URLs como valores.
+        pasta_downloads (str): Pasta base: os arquivos ficam em PASTA_ARQUIVOS dentro dela e o
+            compactado na própria pasta. Por padrão: PASTA_DOWNLOADS.
+        formato (str): Formato de compactação. Por padrão: FORMATO_COMPACTACAO.
+        nome_compactado (str): Nome base do arquivo compactado. Por padrão: NOME_ARQUIVO_COMPACTADO.
+
+    Returns:
+        tuple: (lista de arquivos baixados, caminho do arquivo compactado ou None).
+    """
+    pasta_arquivos = os.path.join(pasta_downloads, PASTA_ARQUIVOS)
+    if DOWNLOAD_DIRETO_COMPACTADO:
+        return baixar_para_compactado(links, pasta_downloads, formato, nome_compactado)
+    if PIPELINE_COMPACTACAO:
+        return baixar_e_compactar(links, pasta_arquivos, pasta_downloads, formato, nome_compactado)
+
+    arquivos_baixados = baixar_arquivos(links, pasta_arquivos, pasta_principal=pasta_downloads)
+    if arquivos_baixados and VALIDAR_ARQUIVOS:
+        arquivos_baixados = validar_downloads(
+            links, arquivos_baixados, pasta_arquivos, pasta_invalidos=os.path.join(pasta_downloads, PASTA_INVALIDOS)
+        )
+    if not arquivos_baixados:
+        return arquivos_baixados, None
+    return arquivos_baixados, compactar_arquivos(pasta_arquivos, pasta_downloads, formato, nome_compactado)
+
+
+def executar_pipeline():
+    """
+    Executa uma vez o fluxo completo: busca dos links (página ou crawler), download,
+    validação e compactação.
+
+    Pode ser chamada várias vezes no mesmo processo (ver servico.py): a sessão HTTP, os caches, o
+    limitador de taxa e o pool de compactação são reaproveitados, e as métricas são reiniciadas a
+    cada execução.
+
+    Returns:
+        dict: Relatório de métricas da execução, com o campo "status" ("sucesso", "sem_arquivos"
+        ou "erro: <mensagem>").
+    """
+    metricas.reiniciar()
     try:
-        pagina_html = entrar_site()
-        links = extrair_links(pagina_html)
-        arquivos_baixados = baixar_arquivos(links)
-        if arquivos_baixados:
-            compactar_arquivos()
-        else:
+        inicio = time.perf_counter()
+        links = rastrear_anexos() if MODO_CRAWLER else obter_links_site()
+        arquivos_baixados, _ = baixar_validar_compactar(links)
+        if not arquivos_baixados:
             logger.error("Nenhum arquivo foi baixado. Compactação cancelada.")
+        modo = "direto" if DOWNLOAD_DIRETO_COMPACTADO else "pipeline" if PIPELINE_COMPACTACAO else "sequencial"
+        logger.info(f"Tempo total de execução ({modo}): {time.perf_counter() - inicio:.2f} s")
+        registrar_estatisticas_conexoes()
+        limitador.registrar_estatisticas()
+        status = "sucesso" if arquivos_baixados else "sem_arquivos"
     except Exception as e:
         logger.critical(f"Erro crítico na execução do script: {e}")
+        status = f"erro: {e}"
+
+    extras = {
+        "status": status,
+        "conexoes": estatisticas_conexoes(),
+        "taxas_limitador": limitador.taxas(),
+    }
+    if SALVAR_RELATORIO_METRICAS:
+        try:
+            return metricas.salvar_relatorio(CAMINHO_RELATORIO_METRICAS, CAMINHO_METRICAS_PROMETHEUS, extras=extras)
+        except OSError as e:
+            logger.error(f"Não foi possível salvar o relatório de métricas: {e}")
+    return metricas.relatorio(extras)
+
+
+if __name__ == "__main__":
+    relatorio = executar_pipeline()
+    if relatorio["status"].startswith("erro"):
         sys.exit(1)
@@ -0,0 +1,222 @@
+import argparse
+import http.server
+import json
+import signal
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from config import INTERVALO_SERVICO, EXECUTAR_AO_INICIAR, HOST_SERVICO, PORTA_SERVICO
+from logger_config import logger
+from metricas import metricas
+from scraper import executar_pipeline
+
+
+class ServicoScraper:
+    """
+    Mantém o scraper em um processo de longa duração e executa o fluxo completo a cada
+    'intervalo' segundos e/ou quando acionado (disparar). As execuções nunca se sobrepõem.
+
+    Entre uma execução e outra continuam em memória os módulos já importados, a configuração, a
+    sessão HTTP (com as conexões keep-alive), o índice do armazenamento de downloads, o estado
+    do limitador de taxa e o pool de compactação.
+    """
+
+    def __init__(self, intervalo=INTERVALO_SERVICO, executar_ao_iniciar=EXECUTAR_AO_INICIAR):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._gatilho = threading.Event()
+        self._parar = threading.Event()
+        self._origem_gatilho = None
+        self.executando = False
+        self.execucoes = 0
+        self.ultima_execucao = None
+        self.ultimo_relatorio = None
+        self.proxima_execucao = time.time() if executar_ao_iniciar else self._proxima_agendada()
+
+    def _proxima_agendada(self):
+        return time.time() + self.intervalo if self.intervalo else None
+
+    def disparar(self, origem="gatilho"):
+        """
+        Pede uma execução imediata.
+
+        Returns:
+            bool: False se já há uma execução em andamento ou pendente (o pedido é ignorado).
+        """
+        with self._lock:
+            if self.executando or self._gatilho.is_set():
+                return False
+            self._origem_gatilho = origem
+            self._gatilho.set()
+        logger.info(f"Execução solicitada ({origem}).")
+        return True
+
+    def executar(self):
+        """Laço principal: aguarda o próximo horário agendado ou um gatilho e executa o fluxo."""
+        logger.info(
+            "Serviço iniciado: "
+            + (f"execução a cada {self.intervalo:g} s" if self.intervalo else "execução apenas sob demanda")
+        )
+        while not self._parar.is_set():
+            with self._lock:
+                proxima = self.proxima_execucao
+            espera = None if proxima is None else max(0.0, proxima - time.time())
+            acionado = self._gatilho.wait(espera)
+            if self._parar.is_set():
+                break
+            with self._lock:
+                origem = self._origem_gatilho if acionado else "agendamento"
+                self._gatilho.clear()
+                self.executando = True
+            try:
+                self._executar_uma_vez(origem)
+            finally:
+                with self._lock:
+                    self.executando = False
+                    self.proxima_execucao = self._proxima_agendada()
+        logger.info("Serviço encerrado.")
+
+    def _executar_uma_vez(self, origem):
+        logger.info(f"Iniciando execução #{self.execucoes + 1} ({origem})")
+        inicio = time.time()
+        try:
+            relatorio = executar_pipeline()
+        except Exception as e:
+            # executar_pipeline já trata os erros do fluxo; isto cobre falhas inesperadas fora dele
+            logger.critical(f"Falha inesperada na execução: {e}", exc_info=True)
+            relatorio = metricas.relatorio({"status": f"erro: {e}"})
+        with self._lock:
+            self.execucoes += 1
+            self.ultimo_relatorio = relatorio
+            self.ultima_execucao = {
+                "origem": origem,
+                "inicio": inicio,
+                "duracao_s": relatorio.get("duracao_s"),
+                "status": relatorio.get("status"),
+                "arquivos": len(relatorio.get("downloads", {})),
+            }
+        logger.info(f"Execução #{self.execucoes} concluída: {relatorio.get('status')}")
+
+    def estado(self):
+        """Retorna um resumo serializável em JSON do estado do serviço."""
+        with self._lock:
+            return {
+                "executando": self.executando,
+                "execucoes": self.execucoes,
+                "intervalo_s": self.intervalo,
+                "proxima_execucao": self.proxima_execucao,
+                "ultima_execucao": self.ultima_execucao,
+            }
+
+    def metricas_prometheus(self):
+        """Métricas da última execução no formato texto do Prometheus, ou None se ainda não houve execução."""
+        with self._lock:
+            relatorio = self.ultimo_relatorio
+        return metricas.formato_prometheus(relatorio) if relatorio else None
+
+    def parar(self):
+        self._parar.set()
+        self._gatilho.set()
+
+
+def criar_servidor_http(servico, host=HOST_SERVICO, porta=PORTA_SERVICO):
+    """
+    Cria o gatilho HTTP do serviço:
+        POST /executar  -> solicita uma execução (202, ou 409 se já houver uma em andamento)
+        GET  /estado    -> estado do serviço e resumo da última execução (JSON)
+        GET  /metricas  -> métricas da última execução no formato do Prometheus
+    """
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, formato, *args):
+            logger.debug(f"Gatilho HTTP: {self.address_string()} {formato % args}")
+
+        def do_POST(self):
+            if self.path != "/executar":
+                self._responder(404, {"erro": "rota não encontrada"})
+            elif servico.disparar(f"http {self.client_address[0]}"):
+                self._responder(202, {"aceito": True})
+            else:
+                self._responder(409, {"aceito": False, "motivo": "execução já em andamento"})
+
+        def do_GET(self):
+            if self.path == "/estado":
+                self._responder(200, servico.estado())
+            elif self.path == "/metricas":
+                texto = servico.metricas_prometheus()
+                if texto is None:
+                    self._responder(404, {"erro": "nenhuma execução concluída"})
+                else:
+                    self._enviar(200, texto.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                self._responder(404, {"erro": "rota não encontrada"})
+
+        def _responder(self, status, dados):
+            self._enviar(status, json.dumps(dados, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+        def _enviar(self, status, corpo, tipo):
+            self.send_response(status)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    servidor = http.server.ThreadingHTTPServer((host, porta), Handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def _requisitar(metodo, rota, host=HOST_SERVICO, porta=PORTA_SERVICO):
+    """Envia uma requisição ao serviço em execução e retorna (status, corpo)."""
+    requisicao = urllib.request.Request(f"http://{host}:{porta}{rota}", method=metodo)
+    try:
+        with urllib.request.urlopen(requisicao, timeout=10) as resposta:
+            return resposta.status, resposta.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço do scraper da ANS (agendamento + gatilho HTTP local).")
+    acoes = parser.add_mutually_exclusive_group()
+    acoes.add_argument("--disparar", action="store_true", help="Solicita uma execução ao serviço em andamento")
+    acoes.add_argument("--estado", action="store_true", help="Mostra o estado do serviço em andamento")
+    parser.add_argument("--porta", type=int, default=PORTA_SERVICO, help="Porta do gatilho HTTP")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_SERVICO,
+                        help="Intervalo entre execuções (s); 0 executa só sob demanda")
+    parser.add_argument("--sem-execucao-inicial", action="store_true", help="Não executa ao iniciar")
+    args = parser.parse_args()
+
+    if args.disparar or args.estado:
+        try:
+            status, corpo = _requisitar("POST", "/executar", porta=args.porta) if args.disparar \
+                else _requisitar("GET", "/estado", porta=args.porta)
+        except urllib.error.URLError as e:
+            logger.error(f"Serviço não encontrado em {HOST_SERVICO}:{args.porta}: {e.reason}")
+            sys.exit(1)
+        print(corpo)
+        sys.exit(0 if status < 400 else 1)
+
+    servico = ServicoScraper(args.intervalo or None, EXECUTAR_AO_INICIAR and not args.sem_execucao_inicial)
+    servidor = criar_servidor_http(servico, porta=args.porta)
+    threading.Thread(target=servidor.serve_forever, name="gatilho-http", daemon=True).start()
+    logger.info(f"Gatilho HTTP em http://{HOST_SERVICO}:{servidor.server_address[1]} (POST /executar, GET /estado, GET /metricas)")
+
+    def encerrar(sinal, _quadro):
+        logger.info(f"Sinal {signal.Signals(sinal).name} recebido; encerrando após a execução em andamento.")
+        servico.parar()
+
+    signal.signal(signal.SIGINT, encerrar)
+    signal.signal(signal.SIGTERM, encerrar)
+    try:
+        servico.executar()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import TAMANHO_POOL_CONEXOES, TENTATIVAS_TRANSPORTE, BACKOFF_TRANSPORTE
+from limitador import limitador, STATUS_SOBRECARGA
+from logger_config import logger
+from metricas import metricas
+
+# Headers para simular um navegador real, comuns a todas as requisições
+HEADERS_NAVEGADOR = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+# Headers específicos para o acesso à página HTML
+HEADERS_PAGINA = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8"
+}
+
+# Headers específicos para o download de arquivos
+HEADERS_DOWNLOAD = {
+    "Accept": "*/*",
+    # Sem compressão de transporte, para que os tamanhos e o Range se refiram aos bytes do arquivo
+    "Accept-Encoding": "identity"
+}
+
+_sessao = None
+_lock_sessao = threading.Lock()
+
+
+def obter_sessao():
+    """
+    Retorna a sessão HTTP compartilhada pelo conector e pelo downloader.
+    A sessão mantém conexões keep-alive em um pool por host, de modo que requisições
+    sucessivas ao mesmo servidor reutilizam a conexão TCP/TLS já estabelecida.
+
+    Returns:
+        requests.Session: Sessão criada na primeira chamada e reutilizada nas seguintes.
+    """
+    global _sessao
+    with _lock_sessao:
+        if _sessao is None:
+            _sessao = _criar_sessao()
+        return _sessao
+
+
+class _AdaptadorLimitado(HTTPAdapter):
+    """
+    HTTPAdapter que passa cada requisição pelo limitador de taxa do host e informa a ele o
+    resultado. Respostas 429/503 são repetidas aqui (até TENTATIVAS_TRANSPORTE vezes), depois
+    da espera imposta pelo limitador (Retry-After ou backoff do host).
+    """
+
+    def send(self, request, **kwargs):
+        for tentativa in range(TENTATIVAS_TRANSPORTE + 1):
+            limitador.aguardar(request.url)
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                limitador.registrar_falha(request.url)
+                raise
+            limitador.registrar_resposta(request.url, response.status_code, response.headers.get("Retry-After"))
+            if response.status_code not in STATUS_SOBRECARGA or tentativa == TENTATIVAS_TRANSPORTE:
+                return response
+            logger.info(f"HTTP {response.status_code} em {request.url}; repetindo após a espera do limitador.")
+            metricas.incrementar("repeticoes_sobrecarga")
+            response.close()
+
+
+def _criar_sessao():
+    """
+    Cria a sessão com pool de conexões dimensionado, limitador de taxa por host e tentativas
+    no nível de transporte.
+    """
+    retry = Retry(
+        total=TENTATIVAS_TRANSPORTE,
+        backoff_factor=BACKOFF_TRANSPORTE,
+        # 429 e 503 ficam com o adaptador, para que o limitador reduza a taxa do host
+        status_forcelist=(502, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+    adapter = _AdaptadorLimitado(
+        pool_connections=10,
+        pool_maxsize=TAMANHO_POOL_CONEXOES,
+        max_retries=retry,
+    )
+
+    sessao = requests.Session()
+    sessao.headers.update(HEADERS_NAVEGADOR)
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+    logger.debug(f"Sessão HTTP criada com pool de {TAMANHO_POOL_CONEXOES} conexões por host.")
+    return sessao
+
+
+def estatisticas_conexoes():
+    """
+    Coleta, por host, quantas conexões foram abertas e quantas requisições foram feitas.
+
+    Returns:
+        dict: {host: {"conexoes": int, "requisicoes": int, "reutilizacoes": int}}
+    """
+    if _sessao is None:
+        return {}
+
+    estatisticas = {}
+    for adapter in set(_sessao.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for chave in pools.keys():
+            pool = pools.get(chave)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            dados = estatisticas.setdefault(host, {"conexoes": 0, "requisicoes": 0, "reutilizacoes": 0})
+            dados["conexoes"] += pool.num_connections
+            dados["requisicoes"] += pool.num_requests
+            dados["reutilizacoes"] = max(dados["requisicoes"] - dados["conexoes"], 0)
+    return estatisticas
+
+
+def registrar_estatisticas_conexoes():
+    """Registra no log as estatísticas de reutilização de conexões por host."""
+    for host, dados in estatisticas_conexoes().items():
+        logger.info(
+            f"Conexões com {host}: {dados['conexoes']} aberta(s), {dados['requisicoes']} requisição(ões), "
+            f"{dados['reutilizacoes']} reutilização(ões)"
+        )
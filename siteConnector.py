@@ -1,45 +1,230 @@
 import time
 import requests
-from bs4 import BeautifulSoup
 
-from config import URL_BASE_ANS, REQUEST_TIMEOUT, DELAY_ENTRE_REQUESTS
+from cache_pagina import cache_pagina, assinatura_config
+from config import URL_BASE_ANS, REQUEST_TIMEOUT, USAR_CACHE_PAGINA, ANEXOS_CONFIG, \
+    REGRA_PRIORIDADE_LINKS, MODO_PARSE_HTML, TAMANHO_CHUNK_HTML
+from extractor import extrair_links
 from logger_config import logger
+from metricas import metricas
+from sessao_http import obter_sessao, HEADERS_PAGINA
 
+# Modos aceitos em MODO_PARSE_HTML
+MODOS_PARSE_HTML = ["completo", "ancoras", "incremental"]
 
-def entrar_site():
+
+@metricas.medir()
+def entrar_site(url=URL_BASE_ANS):
     """
     Acessa o site da ANS de atualização do rol de procedimentos.
 
+    Args:
+        url (str): Endereço da página. Por padrão: URL_BASE_ANS.
+
+    Returns:
+        BeautifulSoup | list: Objeto com o HTML da página para análise posterior (apenas as tags <a>
+        no modo "ancoras"), ou lista de pares (href, texto) no modo "incremental".
+    """
+    pagina, _ = _carregar_pagina(url)
+    return pagina
+
+
+@metricas.medir()
+def obter_links_site(url=URL_BASE_ANS, anexos_config=ANEXOS_CONFIG):
+    """
+    Acessa a página da ANS e retorna os links dos anexos.
+    Se USAR_CACHE_PAGINA estiver ativo e o servidor responder 304 (Not Modified), os links já
+    extraídos na execução anterior são reutilizados sem novo parse do HTML.
+
+    Args:
+        url (str): Endereço da página. Por padrão: URL_BASE_ANS.
+        anexos_config (dict): Configuração dos anexos. Por padrão: ANEXOS_CONFIG.
+
     Returns:
-        BeautifulSoup: Objeto com o HTML da página para análise posterior.
+        dict: Dicionário com os nomes dos arquivos como chaves e URLs como valores.
+    """
+    assinatura = assinatura_config([anexos_config, REGRA_PRIORIDADE_LINKS])
+    pagina, links_em_cache = _carregar_pagina(url, assinatura_links=assinatura)
+    if links_em_cache is not None:
+        return links_em_cache
+
+    links = extrair_links(pagina, anexos_config)
+    if USAR_CACHE_PAGINA:
+        cache_pagina.salvar_links(url, links, assinatura)
+    return links
+
+
+def analisar_html(conteudo, modo=MODO_PARSE_HTML, charset=None):
+    """
+    Analisa o HTML já carregado conforme o modo de parse.
+
+    Args:
+        conteudo (bytes): Corpo da página.
+        modo (str): "completo", "ancoras" ou "incremental". Por padrão: MODO_PARSE_HTML.
+        charset (str, opcional): Codificação informada pelo servidor.
+
+    Returns:
+        BeautifulSoup | list: Árvore da página ou pares (href, texto) no modo "incremental".
+    """
+    # bs4 e lxml são importados só pelo modo em uso (o modo "incremental" não carrega o bs4)
+    if modo in ("completo", "ancoras"):
+        from bs4 import BeautifulSoup, SoupStrainer
+    if modo == "completo":
+        return BeautifulSoup(conteudo, 'lxml', from_encoding=charset)
+    if modo == "ancoras":
+        return BeautifulSoup(conteudo, 'lxml', from_encoding=charset, parse_only=SoupStrainer('a'))
+    if modo == "incremental":
+        leitor = LeitorAncorasIncremental(charset)
+        for inicio in range(0, len(conteudo), TAMANHO_CHUNK_HTML):
+            leitor.alimentar(conteudo[inicio:inicio + TAMANHO_CHUNK_HTML])
+        return leitor.finalizar()
+    raise ValueError(f"Modo de parse inválido: {modo}. Modos suportados: {', '.join(MODOS_PARSE_HTML)}")
+
+
+class LeitorAncorasIncremental:
+    """
+    Extrai pares (href, texto) de um HTML recebido em partes, com o parser incremental do lxml.
+
+    Os elementos são descartados assim que fecham (exceto enquanto há um <a> aberto, cujo texto
+    ainda está sendo acumulado), de modo que a árvore completa da página nunca fica em memória.
     """
 
-    # Headers para simular um navegador real
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8"
-    }
+    def __init__(self, charset=None):
+        from lxml import etree
+        self._parser = etree.HTMLPullParser(events=("start", "end"), encoding=charset)
+        self._ancoras_abertas = 0
+        self.ancoras = []
+
+    def alimentar(self, dados):
+        """Entrega mais um bloco do HTML ao parser e processa os elementos já concluídos."""
+        self._parser.feed(dados)
+        self._processar_eventos()
+
+    def finalizar(self):
+        """Encerra o parse e retorna a lista de pares (href, texto em minúsculas)."""
+        self._parser.close()
+        self._processar_eventos()
+        return self.ancoras
+
+    def _processar_eventos(self):
+        for evento, elemento in self._parser.read_events():
+            if elemento.tag == "a":
+                if evento == "start":
+                    self._ancoras_abertas += 1
+                    continue
+                self._ancoras_abertas -= 1
+                href = elemento.get("href")
+                if href:
+                    self.ancoras.append((href, "".join(elemento.itertext()).lower().strip()))
+            if evento == "end" and not self._ancoras_abertas:
+                # Libera o elemento e os irmãos anteriores, já processados
+                elemento.clear(keep_tail=True)
+                pai = elemento.getparent()
+                if pai is not None:
+                    while elemento.getprevious() is not None:
+                        del pai[0]
+
+
+def _charset(response):
+    """Codificação declarada no Content-Type, ou None para deixar o parser detectar pelo HTML."""
+    for parametro in response.headers.get("Content-Type", "").split(";")[1:]:
+        chave, _, valor = parametro.partition("=")
+        if chave.strip().lower() == "charset":
+            return valor.strip().strip("\"'") or None
+    return None
+
+
+def _carregar_pagina(url, assinatura_links=None):
+    """
+    Faz a requisição da página, usando GET condicional quando há uma versão em cache, e analisa o
+    HTML conforme MODO_PARSE_HTML. No modo "incremental" o parser é alimentado diretamente pelo
+    fluxo da resposta; o corpo só é acumulado se precisar ser gravado no cache.
+
+    Args:
+        url (str): Endereço da página.
+        assinatura_links (str, opcional): Se informada e a página não tiver mudado (304), os links
+            em cache extraídos com essa mesma assinatura são retornados sem novo parse.
+
+    Returns:
+        tuple: (pagina, links_em_cache). Um dos dois é None.
+    """
+    headers = dict(HEADERS_PAGINA)
+    entrada = cache_pagina.obter(url) if USAR_CACHE_PAGINA else None
+    headers.update(cache_pagina.cabecalhos_condicionais(entrada))
 
     try:
-        logger.info(f"Acessando o site da ANS: {URL_BASE_ANS}")
-        response = requests.get(URL_BASE_ANS, headers=headers, timeout=REQUEST_TIMEOUT)
+        logger.info(f"Acessando o site da ANS: {url}")
+        response = obter_sessao().get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
 
-        # Verifica se a requisição foi bem-sucedida
-        response.raise_for_status()
+        with response:
+            # Verifica se a requisição foi bem-sucedida
+            response.raise_for_status()
 
-        # Pequeno delay para não sobrecarregar o servidor
-        time.sleep(DELAY_ENTRE_REQUESTS)
+            if response.status_code == 304 and entrada:
+                logger.info("Site acessado com sucesso (Status: 304); usando a versão em cache.")
+                cache_pagina.registrar_hit()
+                cache_pagina.renovar(url, entrada)
+                if (assinatura_links is not None and entrada.get("links") is not None
+                        and entrada.get("assinatura_links") == assinatura_links):
+                    logger.info("Página não modificada; reutilizando links extraídos anteriormente.")
+                    return None, entrada["links"]
+                return _analisar_medindo(cache_pagina.ler_html(url), entrada.get("charset")), None
 
-        # Verifica se o conteúdo retornado não está vazio
-        if not response.text.strip():
-            logger.error("O conteúdo retornado está vazio.")
-            raise Exception("Conteúdo vazio retornado pelo site da ANS.")
+            charset = _charset(response)
+            if MODO_PARSE_HTML != "incremental":
+                conteudo = response.content
+                # Verifica se o conteúdo retornado não está vazio
+                if not conteudo.strip():
+                    logger.error("O conteúdo retornado está vazio.")
+                    raise Exception("Conteúdo vazio retornado pelo site da ANS.")
+                logger.info("Site acessado com sucesso (Status: %s)", response.status_code)
+                metricas.incrementar("bytes_pagina", len(conteudo))
+                _salvar_cache(url, response, conteudo, charset)
+                return _analisar_medindo(conteudo, charset), None
 
-        logger.info("Site acessado com sucesso (Status: %s)", response.status_code)
-        soup = BeautifulSoup(response.text, 'lxml')
-        return soup
+            inicio = time.perf_counter()
+            leitor = LeitorAncorasIncremental(charset)
+            conteudo = bytearray() if USAR_CACHE_PAGINA else None
+            recebidos = 0
+            for bloco in response.iter_content(chunk_size=TAMANHO_CHUNK_HTML):
+                leitor.alimentar(bloco)
+                recebidos += len(bloco)
+                if conteudo is not None:
+                    conteudo += bloco
+            if not recebidos:
+                logger.error("O conteúdo retornado está vazio.")
+                raise Exception("Conteúdo vazio retornado pelo site da ANS.")
+            ancoras = leitor.finalizar()
+            metricas.incrementar("bytes_pagina", recebidos)
+            logger.info(
+                f"Site acessado com sucesso (Status: {response.status_code}); {len(ancoras)} links lidos "
+                f"incrementalmente em {time.perf_counter() - inicio:.3f} s"
+            )
+            if conteudo is not None:
+                _salvar_cache(url, response, bytes(conteudo), charset)
+            return ancoras, None
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Erro ao acessar o site: {e}")
         raise Exception(f"Falha ao acessar o site da ANS: {e}")
+
+
+def _analisar_medindo(conteudo, charset):
+    inicio = time.perf_counter()
+    with metricas.etapa("analisar_html"):
+        pagina = analisar_html(conteudo, MODO_PARSE_HTML, charset)
+    logger.info(f"HTML analisado no modo '{MODO_PARSE_HTML}' em {time.perf_counter() - inicio:.3f} s")
+    return pagina
+
+
+def _salvar_cache(url, response, conteudo, charset):
+    if not USAR_CACHE_PAGINA:
+        return
+    cache_pagina.registrar_miss()
+    cache_pagina.salvar(
+        url,
+        conteudo,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        charset=charset,
+    )
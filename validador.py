@@ -0,0 +1,473 @@
+import concurrent.futures
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+
+from config import (
+    PASTA_DOWNLOADS, PASTA_ARQUIVOS, WORKERS_VALIDACAO, REDOWNLOADS_VALIDACAO, PASTA_INVALIDOS,
+    NOME_MANIFESTO_ARQUIVOS, USAR_ARMAZENAMENTO
+)
+from logger_config import logger
+from metricas import metricas
+
+# Os workers da validação são processos iniciados com "spawn", que importam este módulo: as
+# dependências pesadas (requests, downloader) são importadas só dentro das funções do processo principal.
+
+# Trechos lidos do início e do fim do arquivo para localizar cabeçalho, %%EOF e startxref
+TAMANHO_CABECALHO = 1024
+TAMANHO_CAUDA = 2048
+
+# Máximo de entradas da tabela xref conferidas contra o objeto para onde apontam
+_AMOSTRAS_XREF = 64
+
+# Chaves do dicionário /Info extraídas como metadados
+CHAVES_METADADOS = ["Title", "Author", "Subject", "Keywords", "Creator", "Producer", "CreationDate", "ModDate"]
+
+_RE_VERSAO = re.compile(rb"%PDF-(\d+\.\d+)")
+_RE_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_RE_SUBSECAO_XREF = re.compile(rb"\s*(\d+)\s+(\d+)\s*[\r\n]+")
+_RE_ENTRADA_XREF = re.compile(rb"(\d{10})\s(\d{5})\s([nf])")
+_RE_OBJETO = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_RE_PAGES = re.compile(rb"/Type\s*/Pages\b")
+_RE_PAGE = re.compile(rb"/Type\s*/Page\b")
+_RE_COUNT = re.compile(rb"/Count\s+(\d+)")
+_RE_REFERENCIA_INFO = re.compile(rb"/Info\s+(\d+)\s+(\d+)\s+R")
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def validar_arquivo(caminho, tamanho_esperado=None):
+    """
+    Valida um arquivo baixado e extrai metadados leves. Executada nos processos do pool.
+
+    Para PDFs confere o cabeçalho %PDF-, o marcador %%EOF, o startxref e a tabela xref (ou a
+    presença do fluxo xref), amostrando entradas da tabela contra os objetos para onde apontam,
+    e obtém versão, número de páginas, criptografia e os campos do dicionário /Info. Em qualquer
+    arquivo, detecta páginas HTML no lugar do conteúdo esperado e confere o tamanho com o
+    informado pelo servidor.
+
+    Args:
+        caminho (str): Caminho do arquivo.
+        tamanho_esperado (int, opcional): Tamanho anunciado pelo servidor (Content-Length).
+
+    Returns:
+        dict: {"arquivo", "tamanho", "sha256", "tipo", "valido", "erros", "versao_pdf", "paginas",
+        "criptografado", "metadados"}.
+    """
+    caminho = Path(caminho)
+    resultado = novo_resultado(caminho.name)
+    erros = resultado["erros"]
+    try:
+        with open(caminho, "rb") as arquivo:
+            tamanho = os.fstat(arquivo.fileno()).st_size
+            resultado["tamanho"] = tamanho
+            if tamanho_esperado is not None and tamanho != tamanho_esperado:
+                erros.append(f"tamanho {tamanho} difere do informado pelo servidor ({tamanho_esperado})")
+            if tamanho == 0:
+                erros.append("arquivo vazio")
+                resultado["sha256"] = hashlib.sha256().hexdigest()
+                return resultado
+
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                resultado["sha256"] = hashlib.sha256(mapa).hexdigest()
+                inicio_pdf = verificar_cabecalho(mapa[:TAMANHO_CABECALHO], resultado)
+                if inicio_pdf is not None:
+                    _validar_pdf(mapa, inicio_pdf, resultado)
+    except (OSError, ValueError) as e:
+        erros.append(f"erro ao ler o arquivo: {e}")
+
+    resultado["valido"] = not erros
+    return resultado
+
+
+def novo_resultado(nome_arquivo):
+    """Resultado de validação inicial (ainda sem nenhuma verificação) para o arquivo 'nome_arquivo'."""
+    return {
+        "arquivo": nome_arquivo, "tamanho": 0, "sha256": None, "tipo": "outro", "valido": False, "erros": [],
+        "versao_pdf": None, "paginas": None, "criptografado": False, "metadados": {},
+    }
+
+
+def verificar_cabecalho(cabecalho, resultado):
+    """
+    Identifica o tipo do conteúdo pelos primeiros TAMANHO_CABECALHO bytes e preenche "tipo" e
+    "versao_pdf" em 'resultado', registrando como erro páginas HTML no lugar do arquivo e PDFs
+    sem o cabeçalho %PDF-.
+
+    Returns:
+        int: Posição do %PDF- no cabeçalho, ou None se o conteúdo não for PDF.
+    """
+    sufixo = Path(resultado["arquivo"]).suffix.lower()
+    inicio_pdf = cabecalho.find(b"%PDF-")
+    if inicio_pdf >= 0:
+        resultado["tipo"] = "pdf"
+        versao = _RE_VERSAO.match(cabecalho, inicio_pdf)
+        resultado["versao_pdf"] = versao.group(1).decode("ascii") if versao else None
+        return inicio_pdf
+    if _parece_html(cabecalho):
+        resultado["tipo"] = "html"
+        if sufixo not in (".html", ".htm"):
+            resultado["erros"].append("conteúdo HTML (provável página de erro) no lugar do arquivo")
+    elif sufixo == ".pdf":
+        resultado["erros"].append("cabeçalho %PDF- ausente")
+    return None
+
+
+def verificar_cauda_pdf(cauda, resultado):
+    """Registra em 'resultado' a falta do marcador %%EOF nos últimos TAMANHO_CAUDA bytes de um PDF."""
+    if b"%%EOF" not in cauda[-TAMANHO_CAUDA:]:
+        resultado["erros"].append("marcador %%EOF ausente (arquivo truncado?)")
+
+
+def _parece_html(cabecalho):
+    inicio = cabecalho.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    return inicio.startswith((b"<!doctype html", b"<html", b"<head", b"<body")) or b"<html" in inicio[:512]
+
+
+def _validar_pdf(mapa, inicio_pdf, resultado):
+    erros = resultado["erros"]
+    tamanho = len(mapa)
+    cauda = mapa[max(0, tamanho - TAMANHO_CAUDA):]
+    verificar_cauda_pdf(cauda, resultado)
+    startxref = None
+    for startxref in _RE_STARTXREF.finditer(cauda):
+        pass
+    if startxref is None:
+        erros.append("startxref ausente")
+        trailer = b""
+    else:
+        # Os deslocamentos contam a partir do %PDF-, que pode não estar no byte 0
+        deslocamento = int(startxref.group(1)) + inicio_pdf
+        trailer = _validar_xref(mapa, deslocamento, inicio_pdf, erros)
+
+    resultado["criptografado"] = b"/Encrypt" in trailer
+    resultado["paginas"] = _contar_paginas(mapa)
+    if resultado["paginas"] == 0:
+        erros.append("PDF sem páginas")
+    referencia_info = _RE_REFERENCIA_INFO.search(trailer)
+    if referencia_info and not resultado["criptografado"]:
+        resultado["metadados"] = _ler_metadados(mapa, referencia_info.group(1), referencia_info.group(2))
+
+
+def _validar_xref(mapa, deslocamento, inicio_pdf, erros):
+    """Confere a tabela (ou o fluxo) xref apontada por startxref e retorna o dicionário do trailer."""
+    tamanho = len(mapa)
+    if deslocamento >= tamanho:
+        erros.append(f"startxref aponta para fora do arquivo ({deslocamento})")
+        return b""
+
+    if mapa[deslocamento:deslocamento + 4] == b"xref":
+        posicao = deslocamento + 4
+        em_uso = []
+        while True:
+            subsecao = _RE_SUBSECAO_XREF.match(mapa, posicao)
+            if not subsecao:
+                break
+            primeiro, quantidade = int(subsecao.group(1)), int(subsecao.group(2))
+            posicao = subsecao.end()
+            # Cada entrada ocupa exatamente 20 bytes
+            entradas = _RE_ENTRADA_XREF.findall(mapa[posicao:posicao + 20 * quantidade])
+            if len(entradas) != quantidade:
+                erros.append(f"tabela xref malformada na subseção {primeiro} {quantidade}")
+                return b""
+            em_uso.extend(
+                (primeiro + indice, int(offset)) for indice, (offset, _, tipo) in enumerate(entradas) if tipo == b"n"
+            )
+            posicao += 20 * quantidade
+
+        fora = [numero for numero, offset in em_uso if offset + inicio_pdf >= tamanho]
+        if fora:
+            erros.append(f"{len(fora)} entrada(s) da tabela xref apontam para fora do arquivo")
+        passo = max(1, len(em_uso) // _AMOSTRAS_XREF)
+        for numero, offset in em_uso[::passo]:
+            objeto = _RE_OBJETO.match(mapa, offset + inicio_pdf)
+            if offset + inicio_pdf < tamanho and (not objeto or int(objeto.group(1)) != numero):
+                erros.append(f"entrada xref do objeto {numero} não aponta para o objeto")
+                break
+
+        fim_trailer = mapa.find(b"startxref", posicao)
+        inicio_trailer = mapa.find(b"trailer", posicao, fim_trailer if fim_trailer >= 0 else tamanho)
+        if inicio_trailer < 0:
+            erros.append("trailer ausente após a tabela xref")
+            return b""
+        return mapa[inicio_trailer:fim_trailer]
+
+    # PDF 1.5+: xref em um fluxo (objeto /Type /XRef), cujo dicionário faz o papel do trailer
+    objeto = _RE_OBJETO.match(mapa, deslocamento)
+    if objeto:
+        fim_dicionario = mapa.find(b"stream", objeto.end(), objeto.end() + 4096)
+        dicionario = mapa[objeto.end():fim_dicionario if fim_dicionario >= 0 else objeto.end() + 4096]
+        if b"/XRef" in dicionario:
+            return dicionario
+    erros.append("startxref não aponta para uma tabela ou fluxo xref")
+    return b""
+
+
+def _contar_paginas(mapa):
+    """
+    Número de páginas pelo maior /Count dos nós /Pages (a raiz da árvore); sem nós visíveis
+    (objetos dentro de fluxos comprimidos), conta os objetos /Type /Page. None se nada for encontrado.
+    """
+    maior = None
+    for pages in _RE_PAGES.finditer(mapa):
+        inicio = mapa.rfind(b"obj", max(0, pages.start() - 65536), pages.start())
+        fim = mapa.find(b"endobj", pages.end(), pages.end() + 65536)
+        trecho = mapa[inicio if inicio >= 0 else pages.start():fim if fim >= 0 else pages.end() + 4096]
+        for contagem in _RE_COUNT.finditer(trecho):
+            maior = max(maior or 0, int(contagem.group(1)))
+    if maior is not None:
+        return maior
+    paginas = sum(1 for _ in _RE_PAGE.finditer(mapa))
+    return paginas or None
+
+
+def _ler_metadados(mapa, numero, geracao):
+    """Lê os campos de texto do dicionário /Info (objeto 'numero geracao obj'), se ele não estiver comprimido."""
+    objeto = re.search(rb"(?<![0-9])" + numero + rb"\s+" + geracao + rb"\s+obj\b", mapa)
+    if not objeto:
+        return {}
+    fim = mapa.find(b"endobj", objeto.end(), objeto.end() + 65536)
+    dicionario = mapa[objeto.end():fim if fim >= 0 else objeto.end() + 4096]
+    metadados = {}
+    for chave in CHAVES_METADADOS:
+        posicao = re.search(rb"/" + chave.encode("ascii") + rb"\s*([(<])", dicionario)
+        if posicao:
+            valor = _ler_string_pdf(dicionario, posicao.start(1))
+            if valor:
+                metadados[chave] = valor
+    return metadados
+
+
+def _ler_string_pdf(dados, inicio):
+    """Decodifica uma string PDF literal '(...)' ou hexadecimal '<...>' que começa em dados[inicio]."""
+    if dados[inicio:inicio + 1] == b"<":
+        fim = dados.find(b">", inicio)
+        hexadecimal = re.sub(rb"\s", b"", dados[inicio + 1:fim if fim >= 0 else len(dados)])
+        bruto = bytes.fromhex((hexadecimal + b"0" * (len(hexadecimal) % 2)).decode("ascii", "ignore"))
+    else:
+        bruto = bytearray()
+        nivel = 0
+        posicao = inicio + 1
+        escapes = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+        while posicao < len(dados):
+            caractere = dados[posicao:posicao + 1]
+            if caractere == b"\\":
+                seguinte = dados[posicao + 1:posicao + 2]
+                octal = re.match(rb"[0-7]{1,3}", dados[posicao + 1:posicao + 4])
+                if octal:
+                    bruto.append(int(octal.group(0), 8) & 0xFF)
+                    posicao += 1 + len(octal.group(0))
+                    continue
+                bruto += escapes.get(seguinte, seguinte if seguinte not in (b"\r", b"\n") else b"")
+                posicao += 2
+                continue
+            if caractere == b"(":
+                nivel += 1
+            elif caractere == b")":
+                if nivel == 0:
+                    break
+                nivel -= 1
+            bruto += caractere
+            posicao += 1
+        bruto = bytes(bruto)
+    if bruto.startswith(b"\xfe\xff"):
+        return bruto[2:].decode("utf-16-be", "replace").strip()
+    return bruto.decode("latin-1").strip()
+
+
+def obter_pool_validacao():
+    """
+    Retorna o pool de processos compartilhado pela validação. Os processos são criados sob demanda
+    (até WORKERS_VALIDACAO) e reaproveitados entre execuções; usam "spawn" para não herdar as
+    threads e locks do processo principal.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: Pool criado na primeira chamada.
+    """
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            workers = WORKERS_VALIDACAO or os.cpu_count() or 1
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.debug(f"Pool de validação criado com até {workers} processos.")
+        return _pool
+
+
+def submeter_validacao(caminho, tamanho_esperado=None):
+    """Envia um arquivo para validação no pool e retorna o Future com o resultado de validar_arquivo."""
+    return obter_pool_validacao().submit(validar_arquivo, str(caminho), tamanho_esperado)
+
+
+def validar_arquivos(caminhos, tamanhos_esperados=None):
+    """
+    Valida vários arquivos em paralelo no pool de processos.
+
+    Args:
+        caminhos (list): Caminhos dos arquivos.
+        tamanhos_esperados (dict, opcional): Tamanho informado pelo servidor para cada caminho.
+
+    Returns:
+        dict: Caminho -> resultado de validar_arquivo.
+    """
+    caminhos = [str(caminho) for caminho in caminhos]
+    if not caminhos:
+        return {}
+    tamanhos_esperados = tamanhos_esperados or {}
+    workers = WORKERS_VALIDACAO or os.cpu_count() or 1
+    resultados = obter_pool_validacao().map(
+        validar_arquivo, caminhos, [tamanhos_esperados.get(caminho) for caminho in caminhos],
+        chunksize=max(1, len(caminhos) // (4 * workers))
+    )
+    return dict(zip(caminhos, resultados))
+
+
+@metricas.medir()
+def validar_downloads(
+        links_arquivos,
+        arquivos_baixados,
+        pasta_arquivos=os.path.join(PASTA_DOWNLOADS, PASTA_ARQUIVOS),
+        resultados=None,
+        pasta_invalidos=os.path.join(PASTA_DOWNLOADS, PASTA_INVALIDOS)
+):
+    """
+    Valida os arquivos baixados, baixa de novo os inválidos (até REDOWNLOADS_VALIDACAO vezes) e grava
+    o manifesto dos arquivos (NOME_MANIFESTO_ARQUIVOS) em pasta_arquivos, para que entre no compactado.
+    Arquivos que continuam inválidos são movidos para pasta_invalidos.
+
+    Args:
+        links_arquivos (dict): Nomes dos arquivos -> URLs, como passados a baixar_arquivos.
+        arquivos_baixados (list): Caminhos retornados por baixar_arquivos.
+        pasta_arquivos (str): Pasta dos arquivos baixados.
+        resultados (dict, opcional): Resultados de validação já obtidos (caminho -> resultado).
+        pasta_invalidos (str): Pasta dos arquivos que continuam inválidos.
+                               Por padrão: os.path.join(PASTA_DOWNLOADS, PASTA_INVALIDOS)
+
+    Returns:
+        list: Caminhos dos arquivos válidos (incluindo os baixados de novo).
+    """
+    from downloader import download_paralelo, tamanhos_informados
+    from sessao_http import HEADERS_DOWNLOAD
+
+    pasta = Path(pasta_arquivos).resolve()
+    urls = _urls_por_caminho(links_arquivos, arquivos_baixados)
+    resultados = dict(resultados or {})
+    pendentes = [caminho for caminho in arquivos_baixados if caminho not in resultados]
+    resultados.update(validar_arquivos(pendentes, tamanhos_informados))
+
+    validos = [caminho for caminho in arquivos_baixados if resultados[caminho]["valido"]]
+    invalidos = [caminho for caminho in arquivos_baixados if not resultados[caminho]["valido"]]
+    descartados = []
+    for rodada in range(1, REDOWNLOADS_VALIDACAO + 1):
+        links_rebaixar = {}
+        for caminho in invalidos:
+            logger.warning(f"Arquivo inválido '{Path(caminho).name}': {'; '.join(resultados[caminho]['erros'])}")
+            url = urls.get(caminho)
+            if url is None:
+                descartados.append(caminho)
+                continue
+            _esquecer(caminho, url, tamanhos_informados)
+            links_rebaixar[Path(caminho).name] = url
+        if not links_rebaixar:
+            invalidos = []
+            break
+
+        logger.info(f"Baixando novamente {len(links_rebaixar)} arquivo(s) inválido(s) (rodada {rodada}/{REDOWNLOADS_VALIDACAO})")
+        metricas.incrementar("arquivos_rebaixados", len(links_rebaixar))
+        novos = download_paralelo(links_rebaixar, str(pasta), dict(HEADERS_DOWNLOAD))
+        urls.update(_urls_por_caminho(links_rebaixar, novos))
+        resultados.update(validar_arquivos(novos, tamanhos_informados))
+        validos.extend(caminho for caminho in novos if resultados[caminho]["valido"])
+        invalidos = [caminho for caminho in novos if not resultados[caminho]["valido"]]
+
+    for caminho in descartados + invalidos:
+        if caminho in invalidos:
+            logger.warning(f"Arquivo inválido '{Path(caminho).name}': {'; '.join(resultados[caminho]['erros'])}")
+        _mover_para_invalidos(caminho, pasta_invalidos)
+    if descartados or invalidos:
+        metricas.incrementar("arquivos_invalidos", len(descartados) + len(invalidos))
+        logger.error(
+            f"{len(descartados) + len(invalidos)} arquivo(s) continuam inválidos e foram movidos para "
+            f"{Path(pasta_invalidos).resolve()}"
+        )
+
+    salvar_manifesto_arquivos(
+        [resultados[caminho] for caminho in validos],
+        [resultados[caminho] for caminho in descartados + invalidos],
+        pasta
+    )
+    logger.info(f"Validação concluída: {len(validos)} arquivo(s) válido(s), {len(descartados) + len(invalidos)} inválido(s)")
+    return validos
+
+
+def salvar_manifesto_arquivos(validos, invalidos, pasta_arquivos=os.path.join(PASTA_DOWNLOADS, PASTA_ARQUIVOS)):
+    """
+    Grava o manifesto dos arquivos em pasta_arquivos. O conteúdo é determinístico (sem datas da
+    execução, entradas e chaves ordenadas): a mesma coleção de arquivos gera o mesmo manifesto.
+
+    Returns:
+        Path: Caminho do manifesto.
+    """
+    caminho = Path(pasta_arquivos) / NOME_MANIFESTO_ARQUIVOS
+    temporario = caminho.with_name(f".{caminho.name}.tmp")
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(gerar_manifesto_arquivos(validos, invalidos))
+    os.replace(temporario, caminho)
+    logger.info(f"Manifesto dos arquivos salvo em {caminho.resolve()}")
+    return caminho
+
+
+def gerar_manifesto_arquivos(validos, invalidos):
+    """
+    Conteúdo (JSON em UTF-8) do manifesto dos arquivos, a partir dos resultados de validação.
+
+    Returns:
+        bytes: Manifesto serializado.
+    """
+    manifesto = {
+        "arquivos": {resultado["arquivo"]: _entrada_manifesto(resultado) for resultado in validos},
+        "invalidos": {resultado["arquivo"]: _entrada_manifesto(resultado) for resultado in invalidos},
+    }
+    return (json.dumps(manifesto, ensure_ascii=False, indent=2, sort_keys=True) + "\n").encode("utf-8")
+
+
+def _entrada_manifesto(resultado):
+    return {chave: valor for chave, valor in resultado.items() if chave != "arquivo"}
+
+
+def _urls_por_caminho(links_arquivos, caminhos):
+    """Associa cada caminho baixado à sua URL (o downloader pode ter acrescentado a extensão ao nome)."""
+    urls = {}
+    for caminho in caminhos:
+        nome = Path(caminho).name
+        for nome_link, url in links_arquivos.items():
+            if nome == nome_link or ('.' not in nome_link and Path(nome).stem == nome_link):
+                urls[caminho] = url
+                break
+    return urls
+
+
+def _esquecer(caminho, url, tamanhos_informados):
+    """Apaga o arquivo inválido e a associação da URL no armazenamento, para que seja baixado de novo."""
+    if USAR_ARMAZENAMENTO:
+        from armazenamento import armazenamento
+        armazenamento.descartar(url)
+    tamanhos_informados.pop(caminho, None)
+    Path(caminho).unlink(missing_ok=True)
+
+
+def _mover_para_invalidos(caminho, pasta_invalidos):
+    pasta = Path(pasta_invalidos)
+    pasta.mkdir(parents=True, exist_ok=True)
+    try:
+        shutil.move(caminho, pasta / Path(caminho).name)
+    except FileNotFoundError:
+        pass